@@ -0,0 +1,111 @@
+from typing import Iterator, List
+try:
+    from .utils.instrumentation import peak_rss_mb
+except ImportError:
+    from utils.instrumentation import peak_rss_mb
+
+# Padded tokens per model call the tuning starts from, and its ceiling
+INITIAL_BATCH_TOKENS = 1024
+MAX_BATCH_TOKENS = 32768
+
+def token_budget_batches(lengths: List[int], budget, sequences_per_text: int = 1, overhead: int = 0) -> Iterator[List[int]]:
+    """
+    Group texts into length-sorted batches whose padded size fits a token budget
+    Args:
+        lengths: Token length of each text
+        budget: Padded tokens per batch, an int or a callable returning the current
+                budget (read before each batch, so it can be tuned on the fly)
+        sequences_per_text: Model input sequences per text (e.g. one per zero-shot label)
+        overhead: Tokens added to every sequence (special tokens, zero-shot hypothesis)
+    Returns:
+        iterator: Batches of indices into lengths; a text larger than the budget is batched alone
+    """
+    current_budget = budget if callable(budget) else (lambda: budget)
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batch = []
+    limit = current_budget()
+    for i in order:
+        # Sorted lengths: the padded length of a batch is its last text's
+        padded = (len(batch) + 1) * sequences_per_text * (lengths[i] + overhead)
+        if batch and padded > limit:
+            yield batch
+            batch = []
+            limit = current_budget()
+        batch.append(i)
+    if batch:
+        yield batch
+
+def padded_tokens(lengths: List[int], sequences_per_text: int = 1, overhead: int = 0) -> int:
+    """Tokens of a batch once padded to its longest text"""
+    return len(lengths) * sequences_per_text * (max(lengths) + overhead) if lengths else 0
+
+class TokenBudgetTuner:
+    """
+    Token budget (padded tokens per model call) of one model, tuned on the
+    first batches of real work: the budget doubles while the padded-token
+    throughput keeps improving by at least min_gain, and stops growing at
+    max_tokens or once peak memory has grown by more than max_memory_mb since
+    tuning began. A budget that turns out slower than the previous one is
+    rolled back. With a fixed budget, nothing is tuned.
+    """
+    def __init__(self,
+                 fixed_tokens: int = None,
+                 initial_tokens: int = INITIAL_BATCH_TOKENS,
+                 max_tokens: int = MAX_BATCH_TOKENS,
+                 min_gain: float = 0.05,
+                 max_memory_mb: float = 1024,
+                 batches_per_step: int = 2):
+        self.budget = fixed_tokens or initial_tokens
+        self.tuned = fixed_tokens is not None
+        self.max_tokens = max_tokens
+        self.min_gain = min_gain
+        self.max_memory_mb = max_memory_mb
+        self.batches_per_step = batches_per_step
+        # (budget, padded tokens per second) of each completed step
+        self.history = []
+        self._step_tokens = 0
+        self._step_seconds = 0.0
+        self._step_batches = 0
+        self._start_rss = None
+
+    def observe(self, padded: int, seconds: float):
+        """
+        Record a model call and adjust the budget
+        Args:
+            padded: Padded tokens of the call (see padded_tokens)
+            seconds: Wall time of the call
+        """
+        if self.tuned:
+            return
+        if self._start_rss is None:
+            self._start_rss = peak_rss_mb()
+
+        # Calls much smaller than the budget (e.g. the last one) say little about it
+        if padded < self.budget / 2:
+            return
+        self._step_tokens += padded
+        self._step_seconds += seconds
+        self._step_batches += 1
+        if self._step_batches < self.batches_per_step:
+            return
+
+        throughput = self._step_tokens / max(self._step_seconds, 1e-9)
+        self.history.append((self.budget, throughput))
+        self._step_tokens, self._step_seconds, self._step_batches = 0, 0.0, 0
+
+        if len(self.history) > 1:
+            previous_budget, previous_throughput = self.history[-2]
+            if throughput < previous_throughput:
+                self.budget = previous_budget
+                self.tuned = True
+                return
+            if throughput < previous_throughput * (1 + self.min_gain):
+                self.tuned = True
+                return
+
+        rss = peak_rss_mb()
+        memory_ok = rss is None or self._start_rss is None or rss - self._start_rss <= self.max_memory_mb
+        if self.budget * 2 > self.max_tokens or not memory_ok:
+            self.tuned = True
+            return
+        self.budget *= 2
@@ -1,6 +1,50 @@
 import pandas as pd
 from pathlib import Path
+from typing import Iterator, List
 import json
+import multiprocessing
+try:
+    # Optional faster JSON decoder
+    import orjson
+except ImportError:
+    orjson = None
+
+# Number of chat summaries per block handed to a decoding process
+PARSE_BLOCK_SIZE = 10000
+
+def _loads(text: str):
+    """Decode JSON with orjson when available, falling back to the stdlib"""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except ValueError:
+            # orjson is stricter (NaN, huge integers...), let json decide
+            pass
+    return json.loads(text)
+
+def _strip_phase_extras(summary_dict):
+    """Remove tips and documents from each phase of a decoded chat summary"""
+    for phase in summary_dict:
+        if isinstance(summary_dict[phase], dict):
+            summary_dict[phase].pop('tips', None)
+            summary_dict[phase].pop('documents', None)
+    return summary_dict
+
+def _decode_chat_summary(summary_str: str) -> dict:
+    """Decode one raw chat summary and remove tips and documents"""
+    if not isinstance(summary_str, str):
+        return {}
+    
+    try:
+        summary_dict = _loads(summary_str)
+        # Remove tips and documents from each phase
+        return _strip_phase_extras(summary_dict)
+    except json.JSONDecodeError:
+        return {}
+
+def _parse_block(values: List) -> List:
+    """Decode a block of raw chat summaries (worker function of the bulk parse)"""
+    return [_decode_chat_summary(value) for value in values]
 
 class DataLoader:
     def __init__(self, data_path: str = "data/"):
@@ -40,11 +84,54 @@ class DataLoader:
         
         return df
 
-    def clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
+    def iter_data_chunks(self, chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Stream the dataset in chunks across all data files in the data directory
+        Args:
+            chunksize: Maximum number of rows per chunk
+        Returns:
+            Iterator[pd.DataFrame]: Raw data chunks, file by file
+        """
+        data_files = sorted(
+            list(self.data_path.glob('*.csv')) +
+            list(self.data_path.glob('*.jsonl')) +
+            list(self.data_path.glob('*.json'))
+        )
+        
+        if not data_files:
+            raise FileNotFoundError(f"No data files found in {self.data_path}")
+        
+        for file_path in data_files:
+            print(f"\nStreaming {file_path} in chunks of {chunksize} rows")
+            if file_path.suffix == '.csv':
+                yield from pd.read_csv(file_path, chunksize=chunksize)
+            elif file_path.suffix == '.jsonl':
+                yield from pd.read_json(file_path, lines=True, chunksize=chunksize)
+            else:
+                # A JSON array cannot be parsed incrementally, split it after loading
+                df = pd.read_json(file_path)
+                for start in range(0, len(df), chunksize):
+                    yield df.iloc[start:start+chunksize]
+    
+    def iter_clean_chunks(self, chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Stream cleaned data chunks
+        Note: missing locations and time_to_diagnosis are filled with the
+        median of their chunk rather than of the whole dataset
+        Args:
+            chunksize: Maximum number of rows per chunk
+        Returns:
+            Iterator[pd.DataFrame]: Cleaned data chunks
+        """
+        for chunk in self.iter_data_chunks(chunksize):
+            yield self.clean_data(chunk)
+    
+    def clean_data(self, df: pd.DataFrame, n_jobs: int = 1) -> pd.DataFrame:
         """
         Clean and normalize the dataset
         Args:
             df: Raw dataframe
+            n_jobs: Number of processes decoding chat summaries (large inputs only)
         Returns:
             pd.DataFrame: Cleaned dataframe
         """
@@ -101,8 +188,8 @@ class DataLoader:
         
         # Clean chat_summary_per_phase
         if 'chat_summary_per_phase' in cleaned_df.columns:
-            cleaned_df['chat_summary_per_phase'] = cleaned_df['chat_summary_per_phase'].apply(
-                self._clean_chat_summary
+            cleaned_df['chat_summary_per_phase'] = self._parse_chat_summaries(
+                cleaned_df['chat_summary_per_phase'], n_jobs
             )
         
         # Convert date columns to datetime
@@ -122,18 +209,27 @@ class DataLoader:
         
         return cleaned_df
     
+    def _parse_chat_summaries(self, summaries: pd.Series, n_jobs: int = 1) -> pd.Series:
+        """
+        Decode the whole chat_summary_per_phase column in bulk
+        Args:
+            summaries: Raw chat summary JSON strings
+            n_jobs: Number of processes sharing the blocks
+        Returns:
+            pd.Series: Cleaned chat summary dictionaries, same index
+        """
+        values = summaries.tolist()
+        blocks = [values[i:i+PARSE_BLOCK_SIZE] for i in range(0, len(values), PARSE_BLOCK_SIZE)]
+        
+        if n_jobs > 1 and len(blocks) > 1:
+            with multiprocessing.get_context('spawn').Pool(min(n_jobs, len(blocks))) as pool:
+                parsed_blocks = pool.map(_parse_block, blocks)
+        else:
+            parsed_blocks = [_parse_block(block) for block in blocks]
+        
+        parsed = [summary for block in parsed_blocks for summary in block]
+        return pd.Series(parsed, index=summaries.index, dtype=object)
+    
     def _clean_chat_summary(self, summary_str: str) -> dict:
         """Clean chat summary by removing tips and documents"""
-        if not isinstance(summary_str, str):
-            return {}
-        
-        try:
-            summary_dict = json.loads(summary_str)
-            # Remove tips and documents from each phase
-            for phase in summary_dict:
-                if isinstance(summary_dict[phase], dict):
-                    summary_dict[phase].pop('tips', None)
-                    summary_dict[phase].pop('documents', None)
-            return summary_dict
-        except json.JSONDecodeError:
-            return {} 
\ No newline at end of file
+        return _decode_chat_summary(summary_str)
\ No newline at end of file
@@ -0,0 +1,139 @@
+import argparse
+import platform
+from typing import Dict, List, Tuple
+try:
+    # Try relative import first (for when used as a package)
+    from .nlp_analyzer import NLPAnalyzer, SENTIMENT_MODEL, SENTIMENT_REVISION, ZERO_SHOT_MODEL, ZERO_SHOT_REVISION
+    from .model_registry import get_pipeline, export_path, DEFAULT_EXPORT_DIR
+except ImportError:
+    # Fallback to absolute import (for when run directly)
+    from nlp_analyzer import NLPAnalyzer, SENTIMENT_MODEL, SENTIMENT_REVISION, ZERO_SHOT_MODEL, ZERO_SHOT_REVISION
+    from model_registry import get_pipeline, export_path, DEFAULT_EXPORT_DIR
+
+# (pipeline task, model, revision) of every model used by NLPAnalyzer
+PINNED_MODELS = [
+    ("sentiment-analysis", SENTIMENT_MODEL, SENTIMENT_REVISION),
+    ("zero-shot-classification", ZERO_SHOT_MODEL, ZERO_SHOT_REVISION)
+]
+
+# Phase texts the accelerated backends are compared on
+PARITY_TEXTS = [
+    "Patient felt very worried about symptoms",
+    "Doctor confirmed diagnosis, patient considered options",
+    "Treatment going well, regular monitoring shows progress",
+    "Severe headaches and fatigue for several weeks before the first visit",
+    "The referral took months and the patient felt ignored",
+    "Started new medication, some nausea as a side effect",
+    "Follow-up review planned to reassess the therapy",
+    "Daily life is much better, back to work part time",
+    "No information provided",
+    "Patient was anxious and could not sleep after the diagnosis"
+]
+
+def export_models(export_dir: str = DEFAULT_EXPORT_DIR,
+                  models: List[Tuple[str, str, str]] = None,
+                  quantize: bool = True):
+    """
+    Export pinned models to ONNX Runtime graphs, for offline loading
+    Args:
+        export_dir: Root directory of the exports
+        models: (task, model, revision) to export (default: PINNED_MODELS)
+        quantize: Also write a dynamically int8-quantized graph of each model
+    """
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    for _, model_name, revision in models or PINNED_MODELS:
+        path = export_path(model_name, revision, export_dir)
+        print(f"Exporting {model_name}@{revision} to {path}")
+        model = ORTModelForSequenceClassification.from_pretrained(model_name, revision=revision, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+        model.save_pretrained(path)
+        tokenizer.save_pretrained(path)
+
+        if quantize:
+            quantized_path = export_path(model_name, revision, export_dir, quantized=True)
+            print(f"Quantizing {model_name}@{revision} to {quantized_path}")
+            if platform.machine().lower() in ('arm64', 'aarch64'):
+                config = AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+            else:
+                config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+            ORTQuantizer.from_pretrained(model).quantize(save_dir=quantized_path, quantization_config=config)
+            tokenizer.save_pretrained(quantized_path)
+
+def _label_scores(task: str, classifier, texts: List[str], topics: List[str]) -> List[Dict]:
+    """Score of every label for every text, as {label: score} dicts"""
+    if task == "sentiment-analysis":
+        outputs = classifier(texts, top_k=None)
+        return [{entry['label']: entry['score'] for entry in output} for output in outputs]
+
+    outputs = classifier(texts, candidate_labels=topics, multi_label=True)
+    if isinstance(outputs, dict):
+        outputs = [outputs]
+    return [dict(zip(output['labels'], output['scores'])) for output in outputs]
+
+def check_parity(backend: str,
+                 export_dir: str = DEFAULT_EXPORT_DIR,
+                 texts: List[str] = None,
+                 models: List[Tuple[str, str, str]] = None) -> Dict:
+    """
+    Compare an inference backend with full-precision PyTorch
+    Args:
+        backend: Inference backend to check, see model_registry.INFERENCE_BACKENDS
+        export_dir: Root directory of the ONNX exports
+        texts: Texts to compare on (default: PARITY_TEXTS)
+        models: (task, model, revision) to compare (default: PINNED_MODELS)
+    Returns:
+        dict: Per task, share of texts with the same top label and largest
+              absolute score difference over all labels
+    """
+    texts = texts or PARITY_TEXTS
+    topics = NLPAnalyzer().topics
+    report = {}
+
+    for task, model_name, revision in models or PINNED_MODELS:
+        reference = _label_scores(task, get_pipeline(task, model_name, revision), texts, topics)
+        candidate = _label_scores(task, get_pipeline(task, model_name, revision, backend, export_dir), texts, topics)
+
+        same_label = 0
+        max_diff = 0.0
+        for expected, actual in zip(reference, candidate):
+            same_label += max(expected, key=expected.get) == max(actual, key=actual.get)
+            max_diff = max(max_diff, max(abs(expected[label] - actual[label]) for label in expected))
+
+        report[task] = {
+            'label_agreement': same_label / len(texts),
+            'max_score_diff': max_diff
+        }
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the NLP models to ONNX and check backend parity")
+    parser.add_argument('--output', default=DEFAULT_EXPORT_DIR, help="Export directory")
+    parser.add_argument('--no-quantize', action='store_true', help="Only export full-precision graphs")
+    parser.add_argument('--skip-export', action='store_true', help="Only run the parity check")
+    parser.add_argument(
+        '--check',
+        nargs='*',
+        default=None,
+        help="Backends to compare with PyTorch (default: the exported ones)"
+    )
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        export_models(args.output, quantize=not args.no_quantize)
+
+    backends = args.check
+    if backends is None:
+        backends = ['onnx'] if args.no_quantize else ['onnx', 'onnx-int8']
+
+    for backend in backends:
+        print(f"\nParity of '{backend}' with 'torch':")
+        for task, result in check_parity(backend, args.output).items():
+            print(f"  {task}: {result['label_agreement']:.0%} same top label, "
+                  f"max score difference {result['max_score_diff']:.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Tuple
+import pandas as pd
+
+class IncrementalStore:
+    """
+    Per-patient analysis results of the previous run, keyed by a fingerprint
+    of each patient's chat_summary_per_phase. NLP and completeness results
+    depend only on that column, so an unchanged fingerprint means the stored
+    results can be reused as-is.
+    """
+    def __init__(self, path: str = "outputs/patient_results.json"):
+        self.path = Path(path)
+
+    @staticmethod
+    def fingerprint(chat_summary: Dict) -> str:
+        """Stable hash of a patient's chat summary"""
+        serialized = json.dumps(chat_summary, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    def load(self, signature: Dict) -> Dict:
+        """
+        Load stored per-patient results
+        Args:
+            signature: Current analysis settings; results stored under other
+                       settings (models, topics...) are discarded
+        Returns:
+            dict: Mapping of fingerprint to {'nlp': ..., 'completeness': ...}
+        """
+        if not self.path.exists():
+            return {}
+
+        with open(self.path) as f:
+            stored = json.load(f)
+
+        if stored.get('signature') != signature:
+            print("Analysis settings changed since the previous run, recomputing all patients")
+            return {}
+        return stored.get('patients', {})
+
+    def save(self, signature: Dict, patients: Dict):
+        """Store per-patient results for the next run"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump({'signature': signature, 'patients': patients}, f)
+
+
+def analyze_incrementally(clean_data: pd.DataFrame,
+                          nlp_analyzer,
+                          metrics_calc,
+                          store: IncrementalStore) -> Tuple[Dict, Dict]:
+    """
+    Analyze only new or changed patients and re-aggregate from stored partials
+    Args:
+        clean_data: Cleaned patient data
+        nlp_analyzer: NLPAnalyzer instance
+        metrics_calc: MetricsCalculator instance
+        store: Store holding the previous run's per-patient results
+    Returns:
+        tuple: (text analysis, completeness metrics) for the whole dataset
+    """
+    summaries = list(clean_data['chat_summary_per_phase'])
+    fingerprints = [IncrementalStore.fingerprint(summary) for summary in summaries]
+
+    signature = nlp_analyzer.analysis_signature()
+    patients = store.load(signature)
+
+    # Unique new or changed journeys, in dataset order
+    pending = {}
+    for fingerprint, summary in zip(fingerprints, summaries):
+        if fingerprint not in patients and fingerprint not in pending:
+            pending[fingerprint] = summary
+
+    print(f"\nIncremental analysis: {len(summaries) - len(pending)} patients reused, "
+          f"{len(pending)} new or changed")
+
+    if pending:
+        nlp_results = nlp_analyzer.analyze_patient_summaries(list(pending.values()))
+        for (fingerprint, summary), nlp_result in zip(pending.items(), nlp_results):
+            patients[fingerprint] = {
+                'nlp': nlp_result,
+                'completeness': metrics_calc._calculate_single_patient_completeness(summary)
+            }
+
+    # Only keep patients still present in the dataset
+    current = {fingerprint: patients[fingerprint] for fingerprint in fingerprints}
+    store.save(signature, current)
+
+    rows: List[Dict] = [current[fingerprint] for fingerprint in fingerprints]
+    text_analysis = nlp_analyzer.aggregate_patient_results([row['nlp'] for row in rows])
+    completeness = metrics_calc.aggregate_completeness([row['completeness'] for row in rows])
+    return text_analysis, completeness
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List
+
+class InferenceCache:
+    """
+    Persistent, content-addressed cache of model outputs backed by SQLite.
+    Keys are hashes of the text together with everything that can change the
+    output (model name, pinned revision, labels...), so entries never go stale.
+    """
+    def __init__(self, path: str = "outputs/inference_cache.sqlite", max_entries: int = 200000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+        # Worker processes of the sharded mode may share the same file. The
+        # inference service uses the cache from its inference thread only
+        self.connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS inference_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access INTEGER NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON inference_cache (last_access)"
+        )
+        self.connection.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self._clock = 0
+
+    @staticmethod
+    def make_key(text: str, *identity: str) -> str:
+        """
+        Build a cache key
+        Args:
+            text: Model input text
+            identity: Model name, revision and any other output-defining parameter
+        Returns:
+            str: Hex SHA-256 digest
+        """
+        digest = hashlib.sha256()
+        for part in identity:
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict:
+        """
+        Look up several keys at once
+        Args:
+            keys: Cache keys
+        Returns:
+            dict: Cached values for the keys that were found
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay below SQLite's bound parameter limit
+        for i in range(0, len(unique_keys), 500):
+            chunk = unique_keys[i:i+500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT key, value FROM inference_cache WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, value in rows:
+                found[key] = json.loads(value)
+
+        if found:
+            now = self._now()
+            self.connection.executemany(
+                "UPDATE inference_cache SET last_access = ? WHERE key = ?",
+                [(now, key) for key in found]
+            )
+            self.connection.commit()
+
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def contains_many(self, keys: List[str]) -> set:
+        """
+        Keys that are cached, without counting a lookup or refreshing their last access
+        Args:
+            keys: Cache keys
+        Returns:
+            set: The keys that were found
+        """
+        found = set()
+        unique_keys = list(dict.fromkeys(keys))
+        for i in range(0, len(unique_keys), 500):
+            chunk = unique_keys[i:i+500]
+            placeholders = ','.join('?' * len(chunk))
+            found.update(key for (key,) in self.connection.execute(
+                f"SELECT key FROM inference_cache WHERE key IN ({placeholders})", chunk
+            ))
+        return found
+
+    def set_many(self, entries: Dict):
+        """
+        Store several values and evict the least recently used entries
+        beyond max_entries
+        Args:
+            entries: Mapping of cache key to JSON-serializable value
+        """
+        if not entries:
+            return
+
+        now = self._now()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO inference_cache (key, value, last_access) VALUES (?, ?, ?)",
+            [(key, json.dumps(value), now) for key, value in entries.items()]
+        )
+
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self.connection.execute(
+                "DELETE FROM inference_cache WHERE key IN ("
+                "SELECT key FROM inference_cache ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+        self.connection.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss statistics for this session"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self)
+        }
+
+    def _now(self) -> int:
+        """Strictly increasing access timestamp (ns) for LRU ordering"""
+        self._clock = max(time.time_ns(), self._clock + 1)
+        return self._clock
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM inference_cache").fetchone()[0]
@@ -0,0 +1,387 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+try:
+    # Try relative import first (for when used as a package)
+    from .nlp_analyzer import NLPAnalyzer
+    from .metrics_calculator import MetricsCalculator
+    from .data_loader import _strip_phase_extras
+    from .model_registry import INFERENCE_BACKENDS
+except ImportError:
+    # Fallback to absolute import (for when run directly)
+    from nlp_analyzer import NLPAnalyzer
+    from metrics_calculator import MetricsCalculator
+    from data_loader import _strip_phase_extras
+    from model_registry import INFERENCE_BACKENDS
+
+# HTTP status lines of the responses the service sends
+HTTP_STATUS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error'
+}
+
+# Largest accepted request body
+MAX_BODY_BYTES = 1 << 20
+
+logger = logging.getLogger('patient_journey_analysis')
+
+class MicroBatcher:
+    """
+    Coalesces concurrent asyncio requests into batches. A batch is dispatched
+    once max_batch_size items are waiting or max_wait_ms after its first item
+    arrived, and is processed in a dedicated executor thread so the event loop
+    keeps accepting requests (which form the next batch) meanwhile.
+    """
+    def __init__(self,
+                 process_batch: Callable[[List], List],
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 10.0):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # One thread: batches run one after the other, on the same models
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference')
+        self.stats = {'requests': 0, 'batches': 0, 'busy_seconds': 0.0, 'largest_batch': 0}
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        """Start dispatching batches (needs a running event loop)"""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def submit(self, item):
+        """
+        Process one item as part of a batch
+        Args:
+            item: Input of process_batch
+        Returns:
+            Output of process_batch for this item
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def close(self):
+        """Stop dispatching and shut the executor thread down"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self.executor.shutdown(wait=True)
+
+    async def run_in_executor(self, function: Callable, *args):
+        """Run a function in the inference thread, e.g. to load the models before serving"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def _next_batch(self) -> List[Tuple]:
+        """Wait for a first item, then gather more until the batch is full or max_wait has passed"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Requests that arrived while waiting for the timeout are free riders
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _dispatch(self):
+        """Form and process batches forever"""
+        while True:
+            batch = await self._next_batch()
+            # Requests whose client went away are not processed
+            batch = [(item, future) for item, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                outputs = await self.run_in_executor(self.process_batch, [item for item, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            finally:
+                self.stats['busy_seconds'] += time.perf_counter() - start
+                self.stats['batches'] += 1
+                self.stats['requests'] += len(batch)
+                self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+
+            for (_, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+
+
+class InferenceService:
+    """
+    Local HTTP service scoring patient journeys as they arrive.
+    POST /analyze with a chat_summary_per_phase (object or JSON string, as in
+    the dataset), either as the body or under a "chat_summary_per_phase" key,
+    returns that journey's {'sentiment', 'topics', 'completeness'} per phase.
+    Concurrent requests are micro-batched (see MicroBatcher) into one
+    NLPAnalyzer call. GET /health and GET /stats report readiness and
+    batching/inference counters.
+    """
+    def __init__(self,
+                 analyzer: NLPAnalyzer = None,
+                 metrics_calc: MetricsCalculator = None,
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 10.0):
+        self.analyzer = analyzer or NLPAnalyzer(progress=False)
+        self.metrics_calc = metrics_calc or MetricsCalculator()
+        self.batcher = MicroBatcher(self.analyze_batch, max_batch_size, max_wait_ms)
+        self.ready = False
+        self._server = None
+
+    def analyze_batch(self, summaries: List[Dict]) -> List[Dict]:
+        """
+        Analyze journeys in one NLPAnalyzer call (runs in the inference thread)
+        Args:
+            summaries: Cleaned chat summaries, one per journey
+        Returns:
+            list: Per-phase sentiment, topics and completeness of each journey
+        """
+        nlp_results = self.analyzer.analyze_patient_summaries(summaries)
+        return [
+            {**nlp_result, 'completeness': self.metrics_calc._calculate_single_patient_completeness(summary)}
+            for summary, nlp_result in zip(summaries, nlp_results)
+        ]
+
+    @staticmethod
+    def parse_summary(chat_summary) -> Dict:
+        """
+        Validate one journey before it is queued for analysis
+        Args:
+            chat_summary: chat_summary_per_phase as a dict or a raw JSON string encoding one
+        Returns:
+            dict: The summary without tips and documents
+        Raises:
+            ValueError: If the summary is not an object
+        """
+        if isinstance(chat_summary, str):
+            # The dataset's form: the object serialized as a JSON string
+            try:
+                chat_summary = json.loads(chat_summary)
+            except ValueError:
+                raise ValueError("chat_summary_per_phase string is not valid JSON")
+        if not isinstance(chat_summary, dict):
+            raise ValueError("chat_summary_per_phase must be an object or a JSON string encoding one")
+        return _strip_phase_extras(chat_summary)
+
+    async def analyze(self, chat_summary) -> Dict:
+        """
+        Analyze one journey as part of the next micro-batch
+        Args:
+            chat_summary: chat_summary_per_phase as a dict or a raw JSON string encoding one
+        Returns:
+            dict: {'sentiment', 'topics', 'completeness'} of the journey
+        Raises:
+            ValueError: If the summary is not an object
+        """
+        return await self.batcher.submit(self.parse_summary(chat_summary))
+
+    def stats(self) -> Dict:
+        """Batching and inference counters"""
+        batches = self.batcher.stats['batches']
+        return {
+            'batcher': {
+                **self.batcher.stats,
+                'mean_batch_size': self.batcher.stats['requests'] / batches if batches else 0.0,
+                'max_batch_size': self.batcher.max_batch_size,
+                'max_wait_ms': self.batcher.max_wait * 1000
+            },
+            'nlp': self.analyzer.metrics()
+        }
+
+    async def warm_up(self):
+        """Load the models before serving, so the first requests are not slowed down"""
+        await self.batcher.run_in_executor(
+            self.analyze_batch, [{'diagnosis': 'Doctor confirmed the diagnosis, patient considered options'}]
+        )
+        self.ready = True
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8000):
+        """
+        Start listening
+        Args:
+            host: Interface to bind
+            port: TCP port (0: any free port, see self.port)
+        """
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stop listening and shut the inference thread down"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.batcher.close()
+        self.analyzer.close()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve the HTTP/1.1 requests of one (keep-alive) connection"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ValueError as error:
+                    # Malformed request: the rest of the stream cannot be framed
+                    self._write_response(writer, 400, {'error': str(error)}, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self._route(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """
+        Read one HTTP request
+        Returns:
+            tuple: (method, path, lowercased headers, body or None if too large),
+                   None once the client is done
+        Raises:
+            ValueError: If the request line or Content-Length is malformed
+        """
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise ValueError(f"Malformed request line {request_line.strip()[:100]!r}")
+        method, path, _ = parts
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        content_length = headers.get('content-length', '0')
+        if not content_length.isdigit():
+            raise ValueError(f"Invalid Content-Length {content_length[:100]!r}")
+        length = int(content_length)
+        if length > MAX_BODY_BYTES:
+            # Not read: answered with 413, then the connection is closed
+            headers['connection'] = 'close'
+            return method, path, headers, None
+        body = await reader.readexactly(length) if length else b''
+        return method, path, headers, body
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        """Dispatch a request, returning (status, JSON payload)"""
+        if path == '/health':
+            return 200, {'status': 'ready' if self.ready else 'loading'}
+        if path == '/stats':
+            # The counters include the inference cache's, which is only used from the inference thread
+            return 200, await self.batcher.run_in_executor(self.stats)
+        if path != '/analyze':
+            return 404, {'error': f"Unknown path {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST /analyze"}
+        if body is None:
+            return 413, {'error': f"Request body larger than {MAX_BODY_BYTES} bytes"}
+
+        # Only an invalid body is the client's error
+        try:
+            payload = json.loads(body)
+            if isinstance(payload, dict) and 'chat_summary_per_phase' in payload:
+                payload = payload['chat_summary_per_phase']
+            summary = self.parse_summary(payload)
+        except ValueError as error:
+            return 400, {'error': str(error)}
+
+        # Any failure of the analysis itself, ValueError included, is the service's
+        try:
+            return 200, await self.batcher.submit(summary)
+        except Exception as error:
+            logger.exception("Analysis of a journey failed")
+            return 500, {'error': f"Analysis failed: {error}"}
+
+    def _write_response(self, writer: asyncio.StreamWriter, status: int, payload: Dict, keep_alive: bool):
+        """Write a JSON response"""
+        body = json.dumps(payload).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status} {HTTP_STATUS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+
+
+async def serve(service: InferenceService, host: str, port: int):
+    """Serve until interrupted, /health reporting 'loading' until the models are warm"""
+    await service.start(host, port)
+    print(f"Loading models, listening on http://{host}:{service.port}")
+    await service.warm_up()
+    print(f"Serving on http://{host}:{service.port} "
+          f"(micro-batches of up to {service.batcher.max_batch_size} journeys, "
+          f"{service.batcher.max_wait * 1000:g} ms max wait)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Patient journey inference service")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to bind")
+    parser.add_argument('--port', type=int, default=8000, help="TCP port")
+    parser.add_argument('--max-batch-size', type=int, default=32, help="Most journeys per micro-batch")
+    parser.add_argument('--max-wait-ms', type=float, default=10.0,
+                        help="Longest wait for more journeys after the first of a batch arrived")
+    parser.add_argument('--inference-backend', choices=INFERENCE_BACKENDS, default='torch', help="CPU inference engine")
+    parser.add_argument('--cache-path', default=None, help="Optional inference cache shared with batch runs")
+    parser.add_argument('--token-cache-path', default=None, help="Optional token cache shared with batch runs")
+    args = parser.parse_args()
+
+    analyzer = NLPAnalyzer(
+        cache_path=args.cache_path,
+        token_cache_path=args.token_cache_path,
+        inference_backend=args.inference_backend,
+        progress=False
+    )
+    service = InferenceService(analyzer, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        print("Stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import re
+from typing import Dict, FrozenSet, List, Tuple
+import pandas as pd
+
+class KeywordMatcher:
+    """
+    Case-insensitive substring matcher for named groups of keywords.
+    Each text is lowercased once and every distinct keyword is looked up once,
+    whichever groups it belongs to; the resulting hit set answers all group
+    queries for that text. The *_series methods answer the same queries for a
+    whole column of texts with vectorized string operations.
+    """
+    def __init__(self, groups: Dict[str, List[str]]):
+        self.groups = {
+            name: frozenset(keyword.lower() for keyword in keywords)
+            for name, keywords in groups.items()
+        }
+        # Distinct keywords, scanned in a fixed order
+        self.keywords = tuple(sorted(set().union(*self.groups.values()))) if self.groups else ()
+        self._scan_lists = {}
+        self._patterns = {}
+
+    def find(self, text: str, groups: Tuple[str, ...] = None) -> FrozenSet[str]:
+        """
+        Find every keyword contained in a text
+        Args:
+            text: Text to scan
+            groups: Only scan for the keywords of these groups (default: all)
+        Returns:
+            frozenset: Lowercased keywords found in the text
+        """
+        if not text:
+            return frozenset()
+
+        keywords = self._scan_list(groups)
+        lowered = text.lower()
+        return frozenset(keyword for keyword in keywords if keyword in lowered)
+
+    def _scan_list(self, groups: Tuple[str, ...] = None) -> Tuple[str, ...]:
+        """Distinct keywords of the given groups, computed once per combination"""
+        if groups is None:
+            return self.keywords
+        if groups not in self._scan_lists:
+            wanted = set().union(*(self.groups.get(group, ()) for group in groups))
+            self._scan_lists[groups] = tuple(keyword for keyword in self.keywords if keyword in wanted)
+        return self._scan_lists[groups]
+
+    def in_group(self, hits: FrozenSet[str], group: str) -> bool:
+        """True if any keyword of the group is among the hits"""
+        return not hits.isdisjoint(self.groups.get(group, ()))
+
+    def count(self, hits: FrozenSet[str], group: str) -> int:
+        """Number of distinct keywords of the group among the hits"""
+        return len(hits & self.groups.get(group, frozenset()))
+
+    def matches(self, text: str, group: str) -> bool:
+        """True if the text contains any keyword of the group"""
+        return self.in_group(self.find(text, (group,)), group)
+
+    def contains_series(self, texts: pd.Series, group: str) -> pd.Series:
+        """
+        Columnar matches(): whether each text contains any keyword of the group
+        Args:
+            texts: Series of texts (non-string values never match)
+            group: Keyword group
+        Returns:
+            pd.Series: Boolean per text
+        """
+        if not self.groups.get(group):
+            return pd.Series(False, index=texts.index)
+        return texts.str.lower().str.contains(self._pattern(group), na=False).astype(bool)
+
+    def count_series(self, texts: pd.Series, group: str) -> pd.Series:
+        """
+        Columnar count(find()): number of distinct keywords of the group in each text
+        Args:
+            texts: Series of texts (non-string values count 0)
+            group: Keyword group
+        Returns:
+            pd.Series: Integer count per text
+        """
+        counts = pd.Series(0, index=texts.index)
+        lowered = texts.str.lower()
+        for keyword in self._scan_list((group,)):
+            counts += lowered.str.contains(keyword, regex=False, na=False).astype(int)
+        return counts
+
+    def _pattern(self, group: str) -> re.Pattern:
+        """Alternation of the group's keywords, compiled once per group"""
+        if group not in self._patterns:
+            self._patterns[group] = re.compile('|'.join(re.escape(keyword) for keyword in self._scan_list((group,))))
+        return self._patterns[group]
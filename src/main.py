@@ -1,40 +1,259 @@
 from data_loader import DataLoader
-from nlp_analyzer import NLPAnalyzer
+from nlp_analyzer import NLPAnalyzer, DERIVED_PHASE_SCOPES
 from metrics_calculator import MetricsCalculator
-from results_visualizer import ResultsVisualizer
+from results_visualizer import ResultsVisualizer, RESULTS_FORMATS, DEFAULT_PLOT_FORMATS
+from incremental import IncrementalStore, analyze_incrementally
+from phase_results import PhaseResults
+from model_registry import INFERENCE_BACKENDS, DEFAULT_EXPORT_DIR
+from text_chunker import CHUNK_AGGREGATIONS
+from utils.instrumentation import Instrumentation, DEFAULT_METRICS_PATH
+from utils.profiling import StageProfiler, DEFAULT_PROFILE_DIR
+from utils.logging_config import setup_logging
 from pathlib import Path
+import argparse
 
-def main():
-    # Initialize components
-    data_loader = DataLoader()
-    nlp_analyzer = NLPAnalyzer()
-    metrics_calc = MetricsCalculator()
-    visualizer = ResultsVisualizer()
+def batch_tokens_arg(value: str):
+    """--batch-tokens value: 'auto' or a positive number of tokens"""
+    if value == 'auto':
+        return value
+    try:
+        tokens = int(value)
+    except ValueError:
+        tokens = 0
+    if tokens < 1:
+        raise argparse.ArgumentTypeError(f"expected 'auto' or a positive number of tokens, got {value!r}")
+    return tokens
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Patient journey analysis")
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help="Only analyze new or changed patients, reusing outputs/patient_results.json"
+    )
+    parser.add_argument(
+        '--chunksize',
+        type=int,
+        default=None,
+        help="Stream all files in data/ in chunks of this many rows instead of loading one file in memory"
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help="Number of worker processes for NLP analysis, each loading the models once"
+    )
+    parser.add_argument(
+        '--torch-threads',
+        type=int,
+        default=None,
+        help="Torch intra-op threads per worker (default: CPU cores / workers)"
+    )
+    parser.add_argument(
+        '--batch-tokens',
+        type=batch_tokens_arg,
+        default='auto',
+        help="Padded tokens per model call: a number, or 'auto' to tune it on the first batches"
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=None,
+        help="Fixed number of texts per model call instead of token budget batches"
+    )
+    parser.add_argument(
+        '--inference-backend',
+        choices=INFERENCE_BACKENDS,
+        default='torch',
+        help="CPU inference engine; the onnx backends need `python src/export_models.py` first"
+    )
+    parser.add_argument(
+        '--chunk-aggregation',
+        choices=CHUNK_AGGREGATIONS,
+        default='mean',
+        help="How the window scores of texts longer than the model input are combined"
+    )
+    parser.add_argument(
+        '--derived-phase-scope',
+        choices=DERIVED_PHASE_SCOPES,
+        default='sentences',
+        help="Analyze the keyword-derived phases (decision, reevaluation) on the sentences "
+             "mentioning their keywords or on the whole parent text (no extra inference)"
+    )
+    parser.add_argument(
+        '--export-dir',
+        default=DEFAULT_EXPORT_DIR,
+        help="Directory of the ONNX exports"
+    )
+    parser.add_argument(
+        '--results-format',
+        choices=RESULTS_FORMATS,
+        default='columnar',
+        help="Raw results format: columnar outputs/analysis_results/ or the legacy analysis_results.json"
+    )
+    parser.add_argument(
+        '--plot-formats',
+        nargs='+',
+        default=DEFAULT_PLOT_FORMATS,
+        help="Image formats of the figures, e.g. png svg pdf"
+    )
+    parser.add_argument(
+        '--no-plots',
+        action='store_true',
+        help="Only save the raw results, skip the figures"
+    )
+    parser.add_argument(
+        '--plot-workers',
+        type=int,
+        default=1,
+        help="Number of processes rendering the figures concurrently"
+    )
+    parser.add_argument(
+        '--metrics-path',
+        default=DEFAULT_METRICS_PATH,
+        help="Where the run metrics JSON (stage timings, model latency, cache, memory) is written"
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help="Profile every stage (cProfile, plus the PyTorch profiler around model calls); "
+             "with --workers > 1 only the main process is profiled"
+    )
+    parser.add_argument(
+        '--profile-dir',
+        default=DEFAULT_PROFILE_DIR,
+        help="Directory of the --profile artifacts"
+    )
+    args = parser.parse_args()
+    if args.incremental and args.chunksize:
+        parser.error("--incremental and --chunksize cannot be combined")
+    return args
+
+def run_streaming(data_loader, nlp_analyzer, metrics_calc, chunksize: int, instrumentation: Instrumentation):
+    """
+    Clean, analyze and score the dataset chunk by chunk
+    Returns:
+        tuple: (text analysis, completeness metrics) for the whole dataset
+    """
+    output_path = Path("outputs/cleaned_dataset.csv")
+    chunk_results = []
+    patient_completeness = []
+    chunks = data_loader.iter_clean_chunks(chunksize)
+    
+    while True:
+        # Chunks are read and cleaned lazily, on next()
+        with instrumentation.stage('load_and_clean'):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        
+        # Save cleaned dataset, one chunk at a time
+        first = not chunk_results
+        with instrumentation.stage('save_cleaned'):
+            chunk.to_csv(output_path, index=False, mode='w' if first else 'a', header=first)
+        
+        # Keep only the compact arrays of each chunk's NLP results
+        with instrumentation.stage('pretokenize'):
+            nlp_analyzer.pretokenize(list(chunk['chat_summary_per_phase']))
+        with instrumentation.stage('nlp_analysis', torch_ops=True):
+            chunk_results.append(nlp_analyzer.analyze_phase_results(list(chunk['chat_summary_per_phase'])))
+        with instrumentation.stage('completeness'):
+            patient_completeness.extend(metrics_calc.calculate_patient_completeness(chunk))
     
+    print(f"\nCleaned dataset saved to {output_path}")
+    nlp_analyzer.print_stats()
+    
+    text_analysis = PhaseResults.concatenate(chunk_results)
+    completeness_scores = metrics_calc.aggregate_completeness(patient_completeness)
+    return text_analysis, completeness_scores
+
+def run_in_memory(data_loader, nlp_analyzer, metrics_calc, incremental: bool, instrumentation: Instrumentation):
+    """
+    Load and clean the first data file, then analyze and score it
+    Returns:
+        tuple: (text analysis, completeness metrics)
+    """
     # Load and clean data
-    raw_data = data_loader.load_data()
-    clean_data = data_loader.clean_data(raw_data)
+    with instrumentation.stage('load_data'):
+        raw_data = data_loader.load_data()
+    with instrumentation.stage('clean_data'):
+        clean_data = data_loader.clean_data(raw_data)
     
     # Save cleaned dataset
     output_path = Path("outputs/cleaned_dataset.csv")
-    clean_data.to_csv(output_path, index=False)
+    with instrumentation.stage('save_cleaned'):
+        clean_data.to_csv(output_path, index=False)
     print(f"\nCleaned dataset saved to {output_path}")
 
-    # Analyze text data
-    print("Performing NLP analysis...")
-    text_analysis = nlp_analyzer.analyze_chat_summaries(clean_data['chat_summary_per_phase'])
+    if incremental:
+        # Analyze the day's delta and re-aggregate from stored per-patient results
+        with instrumentation.stage('incremental_analysis', torch_ops=True):
+            text_analysis, completeness_scores = analyze_incrementally(
+                clean_data, nlp_analyzer, metrics_calc, IncrementalStore()
+            )
+        nlp_analyzer.print_stats()
+    else:
+        # Analyze text data
+        print("Performing NLP analysis...")
+        with instrumentation.stage('pretokenize'):
+            nlp_analyzer.pretokenize(list(clean_data['chat_summary_per_phase']))
+        with instrumentation.stage('nlp_analysis', torch_ops=True):
+            text_analysis = nlp_analyzer.analyze_chat_summaries(clean_data['chat_summary_per_phase'])
 
-    # Calculate metrics
-    completeness_scores = metrics_calc.calculate_phase_completeness(clean_data)
+        # Calculate metrics
+        with instrumentation.stage('completeness'):
+            completeness_scores = metrics_calc.calculate_phase_completeness(clean_data)
+    
+    return text_analysis, completeness_scores
 
-    # Visualize and save results
-    visualizer.visualize_and_save_results(
-        text_analysis['sentiment_per_phase'],
-        text_analysis['topics_per_phase'],
-        completeness_scores
+def main():
+    args = parse_args()
+    profiler = StageProfiler(args.profile_dir) if args.profile else None
+    instrumentation = Instrumentation(setup_logging(), profiler)
+
+    # Initialize components
+    data_loader = DataLoader()
+    nlp_analyzer = NLPAnalyzer(
+        batch_size=args.batch_size,
+        batch_tokens=args.batch_tokens,
+        cache_path="outputs/inference_cache.sqlite",
+        token_cache_path="outputs/token_cache",
+        n_workers=args.workers,
+        torch_threads=args.torch_threads,
+        inference_backend=args.inference_backend,
+        export_dir=args.export_dir,
+        chunk_aggregation=args.chunk_aggregation,
+        derived_phase_scope=args.derived_phase_scope,
+        label_model_calls=args.profile
+    )
+    metrics_calc = MetricsCalculator()
+    visualizer = ResultsVisualizer(
+        results_format=args.results_format,
+        plot_formats=[] if args.no_plots else args.plot_formats,
+        n_jobs=args.plot_workers
     )
     
+    if args.chunksize:
+        # Stream the data directory without loading it all in memory
+        text_analysis, completeness_scores = run_streaming(
+            data_loader, nlp_analyzer, metrics_calc, args.chunksize, instrumentation
+        )
+    else:
+        text_analysis, completeness_scores = run_in_memory(
+            data_loader, nlp_analyzer, metrics_calc, args.incremental, instrumentation
+        )
+    
+    # Stop the NLP worker processes before the render workers start
+    instrumentation.record('nlp', nlp_analyzer.metrics())
+    nlp_analyzer.close()
+    
+    # Visualize and save results
+    with instrumentation.stage('visualize'):
+        visualizer.visualize_phase_results(text_analysis, completeness_scores)
+    instrumentation.record('render_seconds', visualizer.render_times)
+    instrumentation.save(args.metrics_path)
+    
     print("Analysis complete! Results saved in outputs/")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,6 +1,11 @@
+import numpy as np
 import pandas as pd
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from tqdm import tqdm
+try:
+    from .keyword_matcher import KeywordMatcher
+except ImportError:
+    from keyword_matcher import KeywordMatcher
 
 # Phase mapping from dataset to README phases
 PHASE_MAPPING = {
@@ -23,6 +28,16 @@ PHASE_KEYWORDS = {
     'reevaluation': ['reevaluation', 'reassess', 'follow-up', 'follow up', 'monitoring', 'review']
 }
 
+# Key medical terms rewarded by the completeness score
+MEDICAL_TERMS = ['diagnosis', 'treatment', 'symptoms', 'doctor', 'medication']
+
+# Term score for each number of medical terms found: 0.06 per term, built by
+# repeated addition so scores stay bit-identical to summing per term
+TERM_SCORES = [sum(0.06 for _ in range(count)) for count in range(len(MEDICAL_TERMS) + 1)]
+
+# Shared matcher for phase keywords and medical terms (also used by NLPAnalyzer)
+KEYWORD_MATCHER = KeywordMatcher({**PHASE_KEYWORDS, 'medical_terms': MEDICAL_TERMS})
+
 # Expected phases from README (for consistent visualization)
 EXPECTED_PHASES = [
     'symptom_onset',
@@ -66,16 +81,115 @@ class MetricsCalculator:
             print(f"- Value: {str(content)[:100]}...")  # First 100 chars
         
         # Continue with normal processing...
+        print(f"\nCalculating completeness for {len(patient_data)} patients...")
+        phase_scores, overall = self._completeness_frame(patient_data['chat_summary_per_phase'])
+        results = self._aggregate_completeness_frame(phase_scores, overall)
+        
+        # Debug: print final phase completeness
+        print("\nDEBUG - Final Phase Completeness:")
+        for phase, score in results['phase_completeness'].items():
+            print(f"{phase}: {score:.2f}")
+        
+        return results
+    
+    def calculate_patient_completeness(self, patient_data: pd.DataFrame) -> List[Dict]:
+        """
+        Calculate completeness for each patient, without aggregating
+        Args:
+            patient_data: Cleaned patient data (whole dataset or one chunk)
+        Returns:
+            list: Results of _calculate_single_patient_completeness, one per patient
+        """
+        print(f"\nCalculating completeness for {len(patient_data)} patients...")
+        phase_scores, overall = self._completeness_frame(patient_data['chat_summary_per_phase'])
+        
+        columns = {phase: phase_scores[phase].tolist() for phase in phase_scores.columns}
+        patient_completeness = []
+        for i, overall_score in enumerate(overall.tolist()):
+            patient_completeness.append({
+                'overall': overall_score,
+                'phases': {phase: scores[i] for phase, scores in columns.items() if not np.isnan(scores[i])}
+            })
+        return patient_completeness
+    
+    def _completeness_frame(self, chat_summaries: pd.Series) -> Tuple[pd.DataFrame, pd.Series]:
+        """
+        Columnar version of _calculate_single_patient_completeness for many patients
+        Args:
+            chat_summaries: Series of chat summary dictionaries
+        Returns:
+            tuple: (phase scores with one column per phase and NaN where a patient
+                    has no score for the phase, overall score per patient)
+        """
+        # Explode the summaries into one string column per dataset phase
+        summaries = [summary if isinstance(summary, dict) else {} for summary in chat_summaries]
+        contents = pd.DataFrame(summaries, columns=list(PHASE_MAPPING), dtype=object)
+        
+        total_weight = sum(self.phase_weights.values())
+        weighted_sum = pd.Series(0.0, index=contents.index)
+        phase_scores = {}
+        
+        for dataset_phase, expected_phase in PHASE_MAPPING.items():
+            column = contents[dataset_phase]
+            # String operations give NaN for non-string values (None, NaN, nested objects)
+            stripped = column.str.strip()
+            present = column.str.len().where(stripped.notna()).fillna(0).gt(0)
+            text = column.where(present, '')
+            
+            # Base score from stripped content length (0.0 - 0.7)
+            length = stripped.where(present, '').str.len()
+            length_score = np.minimum(length / 500, 0.7)
+            
+            # Additional score for key medical terms (0.0 - 0.3), by number of distinct terms found
+            term_count = KEYWORD_MATCHER.count_series(text, 'medical_terms')
+            term_score = pd.Series(TERM_SCORES).take(term_count.to_numpy()).set_axis(text.index)
+            
+            score = (length_score + term_score).where(length > 0, 0.0)
+            phase_scores[expected_phase] = score.where(present)
+            weighted_sum = weighted_sum + (score * self.phase_weights[expected_phase]).where(present, 0.0)
+            
+            # Additional phases reuse the score of the content they are found in
+            for add_phase in ADDITIONAL_PHASE_MAPPING.get(dataset_phase, []):
+                found = KEYWORD_MATCHER.contains_series(text, add_phase) & present
+                phase_scores[add_phase] = score.where(found, 0.0).where(present)
+                weighted_sum = weighted_sum + (score * self.phase_weights[add_phase]).where(found, 0.0)
+        
+        return pd.DataFrame(phase_scores), weighted_sum / total_weight
+    
+    def _aggregate_completeness_frame(self, phase_scores: pd.DataFrame, overall: pd.Series) -> Dict:
+        """
+        Same averages as aggregate_completeness, computed from _completeness_frame output
+        """
+        results = {
+            'overall_completeness': sum(overall.tolist()) / len(overall),
+            'phase_completeness': {},
+            'demographic_analysis': {}
+        }
+        
+        # Phases in the order they first appear across patients
+        present = phase_scores.notna()
+        first_seen = {phase: present[phase].values.argmax() for phase in phase_scores.columns if present[phase].any()}
+        for phase in sorted(first_seen, key=lambda phase: (first_seen[phase], list(phase_scores.columns).index(phase))):
+            scores = phase_scores[phase].dropna().tolist()
+            results['phase_completeness'][phase] = sum(scores) / len(scores)
+        
+        return results
+    
+    def aggregate_completeness(self, patient_completeness: List[Dict]) -> Dict:
+        """
+        Average per-patient completeness into dataset-level metrics
+        Args:
+            patient_completeness: Results of _calculate_single_patient_completeness, one per patient
+        Returns:
+            dict: Completeness metrics
+        """
         results = {
             'overall_completeness': [],
             'phase_completeness': {},
             'demographic_analysis': {}
         }
         
-        print(f"\nCalculating completeness for {len(patient_data)} patients...")
-        for _, row in tqdm(patient_data.iterrows(), desc="Processing completeness"):
-            chat_summary = row['chat_summary_per_phase']
-            completeness = self._calculate_single_patient_completeness(chat_summary)
+        for completeness in patient_completeness:
             results['overall_completeness'].append(completeness['overall'])
             
             # Aggregate phase-specific completeness
@@ -90,11 +204,6 @@ class MetricsCalculator:
             scores = results['phase_completeness'][phase]
             results['phase_completeness'][phase] = sum(scores) / len(scores)
         
-        # Debug: print final phase completeness
-        print("\nDEBUG - Final Phase Completeness:")
-        for phase, score in results['phase_completeness'].items():
-            print(f"{phase}: {score:.2f}")
-        
         return results
     
     def _extract_phase_content(self, content: str, phase: str) -> bool:
@@ -102,8 +211,7 @@ class MetricsCalculator:
         if not content:
             return False
         
-        keywords = PHASE_KEYWORDS.get(phase, [])
-        return any(keyword.lower() in content.lower() for keyword in keywords)
+        return KEYWORD_MATCHER.matches(content, phase)
 
     def _calculate_single_patient_completeness(self, chat_summary: Dict) -> Dict:
         results = {
@@ -119,15 +227,16 @@ class MetricsCalculator:
             content = chat_summary.get(dataset_phase, '')
             if content and isinstance(content, str):
                 # Calculate score for main phase
-                phase_score = self._calculate_content_score(content)
+                groups = ('medical_terms', *ADDITIONAL_PHASE_MAPPING.get(dataset_phase, []))
+                hits = KEYWORD_MATCHER.find(content, groups)
+                phase_score = self._calculate_content_score(content, hits)
                 results['phases'][expected_phase] = phase_score
                 weighted_sum += phase_score * self.phase_weights[expected_phase]
                 
                 # Check for additional phases in this content
                 additional_phases = ADDITIONAL_PHASE_MAPPING.get(dataset_phase, [])
                 for add_phase in additional_phases:
-                    if self._extract_phase_content(content, add_phase):
-                        phase_score = self._calculate_content_score(content)
+                    if KEYWORD_MATCHER.in_group(hits, add_phase):
                         results['phases'][add_phase] = phase_score
                         weighted_sum += phase_score * self.phase_weights[add_phase]
                     else:
@@ -136,8 +245,8 @@ class MetricsCalculator:
         results['overall'] = weighted_sum / total_weight
         return results
 
-    def _calculate_content_score(self, content: str) -> float:
-        """Calculate score for a piece of content"""
+    def _calculate_content_score(self, content: str, hits: frozenset = None) -> float:
+        """Calculate score for a piece of content (hits: KEYWORD_MATCHER.find result, if known)"""
         content = content.strip()
         if not content:
             return 0.0
@@ -146,7 +255,8 @@ class MetricsCalculator:
         length_score = min(len(content) / 500, 0.7)
         
         # Additional score for key medical terms (0.0 - 0.3)
-        medical_terms = ['diagnosis', 'treatment', 'symptoms', 'doctor', 'medication']
-        term_score = sum(0.06 for term in medical_terms if term.lower() in content.lower())
+        if hits is None:
+            hits = KEYWORD_MATCHER.find(content, ('medical_terms',))
+        term_score = TERM_SCORES[KEYWORD_MATCHER.count(hits, 'medical_terms')]
         
         return length_score + term_score 
\ No newline at end of file
@@ -0,0 +1,148 @@
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# How the models run on CPU:
+# 'torch': full-precision PyTorch
+# 'torch-int8': PyTorch with the feed-forward Linear layers dynamically quantized
+#               to int8 on load
+# 'onnx' / 'onnx-int8': ONNX Runtime graphs exported by export_models.py
+INFERENCE_BACKENDS = ['torch', 'torch-int8', 'onnx', 'onnx-int8']
+
+# Linear layers quantized by 'torch-int8': the transformer feed-forward blocks
+# (BART, DistilBERT). Quantizing the attention projections as well flips the
+# top label on a fifth of the parity texts
+INT8_LAYERS = ('fc1', 'fc2', 'lin1', 'lin2')
+
+# Where export_models.py writes the ONNX graphs
+DEFAULT_EXPORT_DIR = "models/onnx"
+
+# Pipelines loaded in this process, keyed by (task, model, revision, backend)
+_PIPELINES: Dict[Tuple[str, str, str, str], object] = {}
+# Tokenizers loaded in this process, keyed by (model, revision, backend)
+_TOKENIZERS: Dict[Tuple[str, str, str], object] = {}
+# Reentrant: loading a pipeline loads its tokenizer
+_LOCK = threading.RLock()
+
+def export_path(model: str, revision: str, export_dir: str = DEFAULT_EXPORT_DIR, quantized: bool = False) -> Path:
+    """
+    Directory holding the ONNX export of a pinned model
+    Args:
+        model: Model name on the Hugging Face Hub
+        revision: Pinned model revision
+        export_dir: Root directory of the exports
+        quantized: Path of the int8 export instead of the full-precision one
+    Returns:
+        Path: Export directory (config, tokenizer and model graph)
+    """
+    name = f"{model.replace('/', '--')}--{revision}"
+    return Path(export_dir) / (name + '-int8' if quantized else name)
+
+def get_tokenizer(model: str,
+                  revision: str,
+                  backend: str = 'torch',
+                  export_dir: str = DEFAULT_EXPORT_DIR):
+    """
+    Get the tokenizer of a model without loading its weights, shared with its pipelines
+    Args:
+        model: Model name on the Hugging Face Hub
+        revision: Pinned model revision
+        backend: One of INFERENCE_BACKENDS (the 'onnx' ones use the tokenizer saved with the export)
+        export_dir: Root directory of the ONNX exports ('onnx' backends only)
+    Returns:
+        PreTrainedTokenizer: Shared tokenizer instance
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {INFERENCE_BACKENDS}")
+
+    # Both torch backends use the tokenizer of the Hub model
+    key = (model, revision, 'onnx-int8' if backend == 'onnx-int8' else 'onnx' if backend == 'onnx' else 'torch')
+    with _LOCK:
+        if key not in _TOKENIZERS:
+            from transformers import AutoTokenizer
+            if backend.startswith('onnx'):
+                path = export_path(model, revision, export_dir, quantized=(backend == 'onnx-int8'))
+                if not path.exists():
+                    raise FileNotFoundError(
+                        f"No ONNX export in {path}, create it with: python src/export_models.py --output {path.parent}"
+                    )
+                _TOKENIZERS[key] = AutoTokenizer.from_pretrained(path)
+            else:
+                _TOKENIZERS[key] = AutoTokenizer.from_pretrained(model, revision=revision)
+        return _TOKENIZERS[key]
+
+def get_pipeline(task: str,
+                 model: str,
+                 revision: str,
+                 backend: str = 'torch',
+                 export_dir: str = DEFAULT_EXPORT_DIR):
+    """
+    Get a transformers pipeline, loading it on first request only.
+    Every analyzer of the process asking for the same model and backend gets
+    the same pipeline object, so the weights are held in memory once.
+    Args:
+        task: Pipeline task, e.g. "sentiment-analysis"
+        model: Model name on the Hugging Face Hub
+        revision: Pinned model revision
+        backend: One of INFERENCE_BACKENDS
+        export_dir: Root directory of the ONNX exports ('onnx' backends only)
+    Returns:
+        Pipeline: Shared pipeline instance
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {INFERENCE_BACKENDS}")
+
+    key = (task, model, revision, backend)
+    with _LOCK:
+        if key not in _PIPELINES:
+            if backend.startswith('onnx'):
+                _PIPELINES[key] = _load_onnx_pipeline(
+                    task,
+                    export_path(model, revision, export_dir, quantized=(backend == 'onnx-int8')),
+                    get_tokenizer(model, revision, backend, export_dir)
+                )
+            else:
+                # Deferred: importing transformers alone takes several seconds
+                from transformers import pipeline
+                loaded = pipeline(
+                    task, model=model, revision=revision, tokenizer=get_tokenizer(model, revision, backend)
+                )
+                if backend == 'torch-int8':
+                    import torch
+                    layers = {
+                        name for name, module in loaded.model.named_modules()
+                        if isinstance(module, torch.nn.Linear) and name.rsplit('.', 1)[-1] in INT8_LAYERS
+                    }
+                    loaded.model = torch.ao.quantization.quantize_dynamic(
+                        loaded.model, layers, dtype=torch.qint8, inplace=True
+                    )
+                _PIPELINES[key] = loaded
+        return _PIPELINES[key]
+
+def _load_onnx_pipeline(task: str, path: Path, tokenizer):
+    """Build a pipeline around an exported ONNX Runtime model"""
+    if not path.exists():
+        raise FileNotFoundError(
+            f"No ONNX export in {path}, create it with: python src/export_models.py --output {path.parent}"
+        )
+    try:
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+    except ImportError:
+        raise ImportError("The 'onnx' backends need optimum-onnx: pip install 'optimum-onnx[onnxruntime]'")
+    from transformers import pipeline
+
+    # model.onnx, or model_quantized.onnx for int8 exports
+    file_name = next(path.glob('*.onnx')).name
+    model = ORTModelForSequenceClassification.from_pretrained(path, file_name=file_name)
+    return pipeline(task, model=model, tokenizer=tokenizer)
+
+def loaded_pipelines() -> List[Tuple[str, str, str, str]]:
+    """Keys of the pipelines loaded so far in this process"""
+    with _LOCK:
+        return list(_PIPELINES)
+
+def clear_pipelines():
+    """Drop every loaded pipeline and tokenizer (their memory is freed once no analyzer uses them)"""
+    with _LOCK:
+        _PIPELINES.clear()
+        _TOKENIZERS.clear()
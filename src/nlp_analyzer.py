@@ -1,32 +1,107 @@
-from transformers import pipeline
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import pandas as pd
 from tqdm import tqdm
 try:
     # Try relative import first (for when used as a package)
-    from .metrics_calculator import PHASE_MAPPING, EXPECTED_PHASES, PHASE_KEYWORDS
+    from .metrics_calculator import PHASE_MAPPING, ADDITIONAL_PHASE_MAPPING, EXPECTED_PHASES, PHASE_KEYWORDS, KEYWORD_MATCHER
+    from .inference_cache import InferenceCache
+    from .token_cache import TokenCache, tokenizer_identity
+    from .model_registry import get_pipeline, get_tokenizer, INFERENCE_BACKENDS, DEFAULT_EXPORT_DIR
+    from .text_chunker import TextChunker, aggregate_scores, CHUNK_AGGREGATIONS
+    from .phase_results import PhaseResults
+    from .sentence_splitter import keyword_spans
+    from .batch_tuner import TokenBudgetTuner, token_budget_batches, padded_tokens, MAX_BATCH_TOKENS
 except ImportError:
     # Fallback to absolute import (for when run directly)
-    from metrics_calculator import PHASE_MAPPING, EXPECTED_PHASES, PHASE_KEYWORDS
-from multiprocessing import Pool
+    from metrics_calculator import PHASE_MAPPING, ADDITIONAL_PHASE_MAPPING, EXPECTED_PHASES, PHASE_KEYWORDS, KEYWORD_MATCHER
+    from inference_cache import InferenceCache
+    from token_cache import TokenCache, tokenizer_identity
+    from model_registry import get_pipeline, get_tokenizer, INFERENCE_BACKENDS, DEFAULT_EXPORT_DIR
+    from text_chunker import TextChunker, aggregate_scores, CHUNK_AGGREGATIONS
+    from phase_results import PhaseResults
+    from sentence_splitter import keyword_spans
+    from batch_tuner import TokenBudgetTuner, token_budget_batches, padded_tokens, MAX_BATCH_TOKENS
 import multiprocessing
-from functools import lru_cache
+import os
+import time
+from contextlib import nullcontext
+
+# Pinned models (also part of the inference cache keys)
+SENTIMENT_MODEL = "distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+SENTIMENT_REVISION = "714eb0f"
+ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+ZERO_SHOT_REVISION = "d7645e1"
+
+# Topic scoring engines: the zero-shot pipeline or a TopicScorer backend
+TOPIC_BACKEND_CHOICES = ['pipeline', 'nli']
+
+# What keyword-derived phases (decision, reevaluation) are analyzed on:
+# the sentences mentioning their keywords, or the whole parent text
+DERIVED_PHASE_SCOPES = ['sentences', 'text']
+
+# Zero-shot hypothesis, the pipeline default (and TopicScorer's)
+HYPOTHESIS_TEMPLATE = "This example is {}."
+
+# Analyzer owned by each worker process of the sharded mode
+_worker_analyzer = None
+
+def _init_worker(analyzer_kwargs: Dict, torch_threads: int):
+    """Pool initializer: one analyzer per worker process, loading the models on its first shard"""
+    global _worker_analyzer
+    import torch
+    torch.set_num_threads(torch_threads)
+    analyzer_kwargs = dict(analyzer_kwargs)
+    token_cache_path = analyzer_kwargs.pop('token_cache_path')
+    _worker_analyzer = NLPAnalyzer(**analyzer_kwargs)
+    if token_cache_path:
+        # Workers read the parent's token cache: only the parent may clear it
+        _worker_analyzer.token_cache = TokenCache(token_cache_path, owner=False)
+
+def _analyze_shard(shard: Tuple[List[Dict], int, bool]) -> Tuple[object, Dict]:
+    """Analyze one shard of patient summaries in a worker process, with its counter increments"""
+    summaries, batch_size, as_arrays = shard
+    before = _worker_analyzer.counters()
+    analyze = _worker_analyzer.analyze_phase_results if as_arrays else _worker_analyzer.analyze_patient_summaries
+    results = analyze(summaries, batch_size=batch_size)
+    after = _worker_analyzer.counters()
+    return results, {
+        name: {key: after[name][key] - before[name][key] for key in before[name]}
+        for name in before
+    }
 
 class NLPAnalyzer:
-    def __init__(self):
-        # Initialize sentiment analysis model with explicit model name
-        self.sentiment_analyzer = pipeline(
-            "sentiment-analysis",
-            model="distilbert/distilbert-base-uncased-finetuned-sst-2-english",
-            revision="714eb0f"
-        )
+    def __init__(self,
+                 batch_size: int = None,
+                 batch_tokens='auto',
+                 topic_backend: str = 'pipeline',
+                 cache_path: str = None,
+                 cache_max_entries: int = 200000,
+                 token_cache_path: str = None,
+                 n_workers: int = 1,
+                 torch_threads: int = None,
+                 inference_backend: str = 'torch',
+                 export_dir: str = DEFAULT_EXPORT_DIR,
+                 chunk_aggregation: str = 'mean',
+                 chunk_overlap: int = 64,
+                 derived_phase_scope: str = 'sentences',
+                 label_model_calls: bool = False,
+                 progress: bool = True):
+        # Models are loaded on first use (see the properties below), so that
+        # building an analyzer that ends up not running inference is cheap
+        if topic_backend not in TOPIC_BACKEND_CHOICES:
+            raise ValueError(f"Unknown topic backend '{topic_backend}', expected one of {TOPIC_BACKEND_CHOICES}")
+        if inference_backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend '{inference_backend}', expected one of {INFERENCE_BACKENDS}")
+        if chunk_aggregation not in CHUNK_AGGREGATIONS:
+            raise ValueError(f"Unknown chunk aggregation '{chunk_aggregation}', expected one of {CHUNK_AGGREGATIONS}")
+        if batch_tokens != 'auto' and not (isinstance(batch_tokens, int) and batch_tokens > 0):
+            raise ValueError(f"batch_tokens must be 'auto' or a positive number of tokens, got {batch_tokens!r}")
+        if derived_phase_scope not in DERIVED_PHASE_SCOPES:
+            raise ValueError(f"Unknown derived phase scope '{derived_phase_scope}', expected one of {DERIVED_PHASE_SCOPES}")
         
-        # Initialize zero-shot classifier with explicit model name
-        self.zero_shot_classifier = pipeline(
-            "zero-shot-classification",
-            model="facebook/bart-large-mnli",
-            revision="d7645e1"
-        )
+        # CPU inference engine of both models (see model_registry)
+        self.inference_backend = inference_backend
+        self.export_dir = export_dir
         
         # Define topics for classification
         self.topics = [
@@ -40,6 +115,77 @@ class NLPAnalyzer:
             "daily life impact"
         ]
         
+        # Texts are grouped by token length into model calls of at most
+        # batch_tokens padded tokens ('auto': tuned on the first calls, see
+        # TokenBudgetTuner), or of batch_size texts when it is given
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self._tuners = {}
+        
+        # Topic scoring engine: the zero-shot pipeline, or the TopicScorer
+        # 'nli' backend reusing the same BART-large-MNLI weights
+        self.topic_backend = topic_backend
+        self._topic_scorer = None
+        
+        # Sharded execution: n_workers processes, each loading both pipelines
+        # once and using torch_threads intra-op threads (default: cores / workers)
+        self.n_workers = n_workers
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // n_workers)
+        self._worker_kwargs = {
+            'batch_size': batch_size,
+            'batch_tokens': batch_tokens,
+            'topic_backend': topic_backend,
+            'cache_path': cache_path,
+            'cache_max_entries': cache_max_entries,
+            'token_cache_path': token_cache_path,
+            'inference_backend': inference_backend,
+            'export_dir': export_dir,
+            'chunk_aggregation': chunk_aggregation,
+            'chunk_overlap': chunk_overlap,
+            'derived_phase_scope': derived_phase_scope,
+            'progress': progress
+        }
+        self._pool = None
+        
+        # Optional on-disk cache of model outputs shared across runs
+        self.cache = InferenceCache(cache_path, max_entries=cache_max_entries) if cache_path else None
+        
+        # Optional memory-mapped store of token ids shared across runs. With
+        # it, the models are fed the stored ids instead of the pipelines
+        # re-tokenizing every text (the zero-shot one once per topic)
+        self.token_cache = TokenCache(token_cache_path) if token_cache_path else None
+        
+        # Phase texts collected (derived phase spans included) vs. unique normalized texts actually inferred
+        self.dedup_stats = {'texts': 0, 'unique': 0}
+        
+        # Keyword-derived phases are analyzed on the sentences mentioning
+        # their keywords ('sentences') or share the parent text's inference ('text')
+        self.derived_phase_scope = derived_phase_scope
+        self.derived_phase_stats = {
+            phase: 0 for phases in ADDITIONAL_PHASE_MAPPING.values() for phase in phases
+        }
+        
+        # Texts longer than a model input are scored in windows of
+        # chunk_overlap shared tokens, combined with chunk_aggregation
+        self.chunk_aggregation = chunk_aggregation
+        self.chunk_overlap = chunk_overlap
+        self._chunkers = {}
+        self.chunk_stats = {'sentiment_texts': 0, 'sentiment_windows': 0, 'topics_texts': 0, 'topics_windows': 0}
+        
+        # Model calls per kind: batches, texts, text tokens and wall time
+        self.inference_stats = {
+            f'{kind}_{counter}': 0 for kind in ('sentiment', 'topics')
+            for counter in ('batches', 'texts', 'tokens', 'seconds')
+        }
+        # Fallback values handed out (missing phases included) and texts the model failed on
+        self.fallback_stats = {'sentiment': 0, 'topics': 0, 'sentiment_failed': 0, 'topics_failed': 0}
+        
+        # Label each batch in PyTorch profiler traces (e.g. "Sentiment batches")
+        self.label_model_calls = label_model_calls
+        
+        # tqdm progress bars (off for long-running services)
+        self.progress = progress
+        
         # Define phase mapping (same as in MetricsCalculator)
         self.phase_mapping = PHASE_MAPPING
         
@@ -53,43 +199,371 @@ class NLPAnalyzer:
             'scores': [0.0] * len(self.topics)
         }
     
-    def analyze_chat_summaries(self, chat_summaries: pd.Series) -> Dict:
+    @property
+    def sentiment_analyzer(self):
+        """Sentiment pipeline, loaded once per process on first use"""
+        return get_pipeline(
+            "sentiment-analysis", SENTIMENT_MODEL, SENTIMENT_REVISION, self.inference_backend, self.export_dir
+        )
+    
+    @property
+    def zero_shot_classifier(self):
+        """Zero-shot classification pipeline, loaded once per process on first use"""
+        return get_pipeline(
+            "zero-shot-classification", ZERO_SHOT_MODEL, ZERO_SHOT_REVISION, self.inference_backend, self.export_dir
+        )
+    
+    @property
+    def topic_scorer(self):
+        """
+        TopicScorer ('nli') scoring the topics, or None where the zero-shot
+        pipeline is called: the 'pipeline' backend without a token cache. With
+        one, it uses the equivalent 'nli' scorer, which takes premise ids
+        """
+        if self.topic_backend == 'pipeline' and self.token_cache is None:
+            return None
+        if self._topic_scorer is None:
+            # Deferred: topic_scorer imports torch
+            try:
+                from .topic_scorer import TopicScorer
+            except ImportError:
+                from topic_scorer import TopicScorer
+            self._topic_scorer = TopicScorer(
+                self.zero_shot_classifier.model,
+                self.zero_shot_classifier.tokenizer,
+                self.topics,
+                backend='nli',
+                hypothesis_template=HYPOTHESIS_TEMPLATE,
+                # Token-budget calls are already sized: score each in one go
+                batch_size=self.batch_size or MAX_BATCH_TOKENS
+            )
+        return self._topic_scorer
+    
+    def analyze_chat_summaries(self, chat_summaries: pd.Series, batch_size: int = None) -> PhaseResults:
         """
         Analyze chat summaries using NLP techniques
         Args:
             chat_summaries: Series of chat summary dictionaries
+            batch_size: Number of texts per model call (default: self.batch_size; None: token budget batches)
         Returns:
-            dict: Analysis results containing sentiment and topics per phase
+            PhaseResults: Analysis results containing sentiment and topics per phase
         """
-        results = {
-            'sentiment_per_phase': {},
-            'topics_per_phase': {}
+        print(f"\nAnalyzing {len(chat_summaries)} patient summaries...")
+        
+        results = self.analyze_phase_results(list(chat_summaries), batch_size=batch_size)
+        self.print_stats()
+        
+        return results
+    
+    def counters(self) -> Dict:
+        """Copy of the deduplication, derived phase, chunking, inference, fallback and cache lookup counters"""
+        return {
+            'dedup_stats': dict(self.dedup_stats),
+            'derived_phase_stats': dict(self.derived_phase_stats),
+            'chunk_stats': dict(self.chunk_stats),
+            'inference_stats': dict(self.inference_stats),
+            'fallback_stats': dict(self.fallback_stats),
+            'cache_lookups': {
+                'hits': self.cache.hits if self.cache is not None else 0,
+                'misses': self.cache.misses if self.cache is not None else 0
+            },
+            'token_cache_lookups': {
+                'hits': self.token_cache.hits if self.token_cache is not None else 0,
+                'misses': self.token_cache.misses if self.token_cache is not None else 0
+            }
         }
+    
+    def _merge_counters(self, increments: Dict):
+        """
+        Add counter increments of a worker process (see _analyze_shard) to this analyzer's
+        Args:
+            increments: Increments shaped like counters()
+        """
+        for name, counts in increments.items():
+            if name in ('cache_lookups', 'token_cache_lookups'):
+                # Workers open the same cache files: their lookups count as this analyzer's
+                cache = self.cache if name == 'cache_lookups' else self.token_cache
+                if cache is not None:
+                    cache.hits += counts['hits']
+                    cache.misses += counts['misses']
+                continue
+            for key, count in counts.items():
+                getattr(self, name)[key] += count
+    
+    def metrics(self) -> Dict:
+        """
+        Counters of this session with derived rates, for run instrumentation
+        Returns:
+            dict: Counters, per-model latency and throughput, inference and token cache statistics
+        """
+        metrics = self.counters()
+        # Reported with the rest of each cache's statistics below
+        del metrics['cache_lookups'], metrics['token_cache_lookups']
+        metrics['models'] = {}
+        for kind in ('sentiment', 'topics'):
+            batches, texts, tokens, seconds = (
+                self.inference_stats[f'{kind}_{counter}'] for counter in ('batches', 'texts', 'tokens', 'seconds')
+            )
+            metrics['models'][kind] = {
+                'mean_batch_latency_ms': 1000 * seconds / batches if batches else 0.0,
+                'texts_per_second': texts / seconds if seconds else 0.0,
+                'tokens_per_second': tokens / seconds if seconds else 0.0
+            }
+        metrics['batch_tokens'] = {
+            kind: {'budget': tuner.budget, 'tuned': tuner.tuned} for kind, tuner in self._tuners.items()
+        }
+        metrics['cache'] = self.cache.stats() if self.cache is not None else None
+        metrics['token_cache'] = self.token_cache.stats() if self.token_cache is not None else None
+        return metrics
+    
+    def print_stats(self):
+        """Print text deduplication, chunking, model failure, inference and token cache statistics of this session"""
+        texts, unique = self.dedup_stats['texts'], self.dedup_stats['unique']
+        if texts:
+            print(f"Text deduplication: {texts} phase texts, {unique} unique "
+                  f"({1 - unique / texts:.1%} inferences saved)")
+        if any(self.derived_phase_stats.values()):
+            found = ', '.join(f"{phase} {count}" for phase, count in self.derived_phase_stats.items())
+            scope = "keyword sentences" if self.derived_phase_scope == 'sentences' else "parent text"
+            print(f"Keyword-derived phases: {found} (analyzed on their {scope})")
         
-        print(f"\nAnalyzing {len(chat_summaries)} patient summaries...")
+        for kind in ('sentiment', 'topics'):
+            if self.chunk_stats[f'{kind}_texts']:
+                print(f"Long texts ({kind}): {self.chunk_stats[f'{kind}_texts']} split into "
+                      f"{self.chunk_stats[f'{kind}_windows']} windows ({self.chunk_aggregation} of window scores)")
+            if self.fallback_stats[f'{kind}_failed']:
+                print(f"Model failures ({kind}): {self.fallback_stats[f'{kind}_failed']} texts got the fallback value")
         
-        # Process summaries in batches for better performance
-        batch_size = 8
-        for i in tqdm(range(0, len(chat_summaries), batch_size), desc="Processing patients"):
-            batch = chat_summaries.iloc[i:i+batch_size]
-            
-            # Process each summary in the batch
-            for summary in batch:
-                phase_results = self._analyze_single_summary(summary)
-                
-                # Aggregate results
-                for phase, phase_data in phase_results['sentiment'].items():
-                    if phase not in results['sentiment_per_phase']:
-                        results['sentiment_per_phase'][phase] = []
-                    results['sentiment_per_phase'][phase].append(phase_data)
-                
-                for phase, phase_data in phase_results['topics'].items():
-                    if phase not in results['topics_per_phase']:
-                        results['topics_per_phase'][phase] = []
-                    results['topics_per_phase'][phase].append(phase_data)
+        if self._tuners:
+            budgets = ', '.join(f"{kind} {tuner.budget}" for kind, tuner in self._tuners.items())
+            mode = "auto-tuned" if self.batch_tokens == 'auto' else "fixed"
+            print(f"Batch token budget: {budgets} padded tokens per model call ({mode})")
+        
+        if self.cache is not None:
+            stats = self.cache.stats()
+            print(f"Inference cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['hit_rate']:.1%} hit rate, {stats['entries']} entries)")
+        if self.token_cache is not None:
+            stats = self.token_cache.stats()
+            print(f"Token cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['hit_rate']:.1%} hit rate, {stats['entries']} texts, {stats['tokens']} tokens)")
+    
+    def aggregate_patient_results(self, patient_results: List[Dict]) -> PhaseResults:
+        """
+        Gather per-patient results into patients x phases arrays (for results
+        that already exist as dicts, e.g. incremental runs; analyze_phase_results
+        fills the arrays directly)
+        Args:
+            patient_results: Results shaped like _analyze_single_summary, one per patient
+        Returns:
+            PhaseResults: Sentiment and topics per phase; results['sentiment_per_phase']
+                          and results['topics_per_phase'] give the dict-of-lists view
+        """
+        return PhaseResults.from_patient_results(patient_results, self.topics)
+    
+    def analysis_signature(self) -> Dict:
+        """Models and settings that determine the analysis output"""
+        return {
+            'sentiment_model': SENTIMENT_MODEL,
+            'sentiment_revision': SENTIMENT_REVISION,
+            'zero_shot_model': ZERO_SHOT_MODEL,
+            'zero_shot_revision': ZERO_SHOT_REVISION,
+            'inference_backend': self.inference_backend,
+            'topic_backend': self.topic_backend,
+            'topics': list(self.topics),
+            'derived_phases': ADDITIONAL_PHASE_MAPPING,
+            'derived_phase_scope': self.derived_phase_scope,
+            'chunk_aggregation': self.chunk_aggregation,
+            'chunk_overlap': self.chunk_overlap
+        }
+    
+    def analyze_patient_summaries(self, summaries: List[Dict], batch_size: int = None) -> List[Dict]:
+        """
+        Analyze many patients' chat summaries with batched model calls.
+        Every (patient, phase, text) item of the whole input is collected first,
+        each distinct normalized text is fed once to both pipelines in
+        length-sorted batches and the outputs are scattered back to each patient.
+        Args:
+            summaries: List of dictionaries containing chat summaries per phase
+            batch_size: Number of texts per model call (default: self.batch_size; None: token budget batches)
+        Returns:
+            list: One result per summary, shaped like _analyze_single_summary
+        """
+        batch_size = batch_size or self.batch_size
+        
+        if self.n_workers > 1 and len(summaries) > 1:
+            return [result for shard_results in self._analyze_sharded(summaries, batch_size) for result in shard_results]
+        
+        # Initialize all expected phases with fallback values
+        results = []
+        for _ in summaries:
+            results.append({
+                'sentiment': {phase: self.fallback_sentiment for phase in EXPECTED_PHASES},
+                'topics': {phase: self.fallback_topics for phase in EXPECTED_PHASES}
+            })
+        
+        items, texts, text_indices = self._prepare_items(summaries)
+        if not items:
+            self._count_fallbacks(results)
+            return results
+        
+        sentiments = self._run_cached('sentiment', texts, lambda misses: self._run_sentiment(misses, batch_size))
+        topics = self._run_cached('topics', texts, lambda misses: self._run_topics(misses, batch_size))
+        
+        # Items sharing a text share its (read-only) result dicts
+        for (patient_idx, phase, _), text_idx in zip(items, text_indices):
+            results[patient_idx]['sentiment'][phase] = sentiments[text_idx]
+            results[patient_idx]['topics'][phase] = topics[text_idx]
+        
+        self._count_fallbacks(results)
+        return results
+    
+    def analyze_phase_results(self, summaries: List[Dict], batch_size: int = None) -> PhaseResults:
+        """
+        Analyze many patients' chat summaries straight into PhaseResults arrays:
+        same results as aggregate_patient_results(analyze_patient_summaries(...)),
+        without building per-patient result dicts. The arrays are preallocated
+        from the patient count and each model's outputs are scattered into
+        them as soon as that model returns, then released.
+        Args:
+            summaries: List of dictionaries containing chat summaries per phase
+            batch_size: Number of texts per model call (default: self.batch_size; None: token budget batches)
+        Returns:
+            PhaseResults: Sentiment and topics per patient and expected phase
+        """
+        batch_size = batch_size or self.batch_size
+        
+        if self.n_workers > 1 and len(summaries) > 1:
+            return PhaseResults.concatenate(self._analyze_sharded(summaries, batch_size, as_arrays=True))
+        
+        results = PhaseResults(len(summaries), EXPECTED_PHASES, self.topics)
+        results.fill(self.fallback_sentiment, self.fallback_topics)
+        
+        items, texts, text_indices = self._prepare_items(summaries)
+        rows = [patient_idx for patient_idx, _, _ in items]
+        phases = [phase for _, phase, _ in items]
+        # Cells without an item keep the fallback values
+        uncovered = len(summaries) * len(EXPECTED_PHASES) - len(items)
+        
+        sentiments = self._run_cached('sentiment', texts, lambda misses: self._run_sentiment(misses, batch_size)) if items else []
+        results.scatter_sentiments(rows, phases, sentiments, text_indices)
+        self.fallback_stats['sentiment'] += uncovered + sum(
+            sentiments[text_idx] is self.fallback_sentiment for text_idx in text_indices
+        )
+        del sentiments
         
+        topics = self._run_cached('topics', texts, lambda misses: self._run_topics(misses, batch_size)) if items else []
+        results.scatter_topics(rows, phases, topics, text_indices)
+        self.fallback_stats['topics'] += uncovered + sum(
+            topics[text_idx] is self.fallback_topics for text_idx in text_indices
+        )
         return results
     
+    def _prepare_items(self, summaries: List[Dict]) -> Tuple[List[Tuple[int, str, str]], List[str], List[int]]:
+        """
+        Collect and deduplicate the phase items of summaries, updating the deduplication counters
+        Args:
+            summaries: List of dictionaries containing chat summaries per phase
+        Returns:
+            tuple: (items, see _collect_phase_items; unique normalized texts;
+                    index into them for every item)
+        """
+        items = self._collect_phase_items(summaries)
+        if not items:
+            return items, [], []
+        
+        # Derived phase items carry their keyword sentences (or the parent's
+        # text): deduplication batches them with everything else and shares
+        # the results of identical spans and texts
+        texts, text_indices = self._deduplicate_texts([content for _, _, content in items])
+        for _, phase, _ in items:
+            if phase in self.derived_phase_stats:
+                self.derived_phase_stats[phase] += 1
+        # Derived phase items count as texts too: 'unique' includes their spans
+        self.dedup_stats['texts'] += len(items)
+        self.dedup_stats['unique'] += len(texts)
+        return items, texts, text_indices
+    
+    def _count_fallbacks(self, results: List[Dict]):
+        """Count the fallback values among per-patient results"""
+        for result in results:
+            self.fallback_stats['sentiment'] += sum(
+                sentiment is self.fallback_sentiment for sentiment in result['sentiment'].values()
+            )
+            self.fallback_stats['topics'] += sum(
+                topic_result is self.fallback_topics for topic_result in result['topics'].values()
+            )
+    
+    def _analyze_sharded(self, summaries: List[Dict], batch_size: int, as_arrays: bool = False) -> List:
+        """
+        Analyze summaries in worker processes, in contiguous shards
+        Args:
+            summaries: List of dictionaries containing chat summaries per phase
+            batch_size: Number of texts per model call in each worker
+            as_arrays: Workers return PhaseResults instead of per-patient result dicts
+        Returns:
+            list: Results of each shard (a list of per-patient results, or PhaseResults), in input order
+        """
+        if self.token_cache is not None:
+            # Workers read the ids from the shared token cache
+            self.pretokenize(summaries)
+        
+        if self._pool is None:
+            # spawn: forking a process with torch thread pools alive can deadlock
+            context = multiprocessing.get_context('spawn')
+            self._pool = context.Pool(
+                self.n_workers,
+                initializer=_init_worker,
+                initargs=(self._worker_kwargs, self.torch_threads)
+            )
+        
+        # A few shards per worker to balance uneven journey lengths
+        n_shards = min(len(summaries), self.n_workers * 4)
+        shard_size = -(-len(summaries) // n_shards)
+        shards = [(summaries[i:i+shard_size], batch_size, as_arrays) for i in range(0, len(summaries), shard_size)]
+        
+        results = []
+        # imap returns shard results in input order
+        for shard_results, shard_stats in tqdm(self._pool.imap(_analyze_shard, shards), total=len(shards), desc="Processing shards", disable=not self.progress):
+            results.append(shard_results)
+            self._merge_counters(shard_stats)
+        return results
+    
+    def close(self):
+        """Shut down worker processes and the caches"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        if self.token_cache is not None:
+            self.token_cache.close()
+    
+    def pretokenize(self, summaries: List[Dict]) -> int:
+        """
+        Store the token ids of every text the summaries will feed the models
+        in the token cache, texts with inference cache results excepted
+        Args:
+            summaries: List of dictionaries containing chat summaries per phase
+        Returns:
+            int: Texts tokenized (and stored) by this call, counting each tokenizer
+        """
+        if self.token_cache is None:
+            return 0
+        texts, _ = self._deduplicate_texts([content for _, _, content in self._collect_phase_items(summaries)])
+        misses = self.token_cache.misses
+        for kind in ('sentiment', 'topics'):
+            kind_texts = texts
+            if self.cache is not None:
+                identity = self._cache_identity(kind)
+                keys = [InferenceCache.make_key(text, *identity) for text in texts]
+                cached = self.cache.contains_many(keys)
+                kind_texts = [text for text, key in zip(texts, keys) if key not in cached]
+            self._token_ids(kind, kind_texts)
+        return self.token_cache.misses - misses
+    
     def _analyze_single_summary(self, summary: Dict) -> Dict:
         """
         Analyze a single patient's chat summaries
@@ -98,55 +572,470 @@ class NLPAnalyzer:
         Returns:
             dict: Analysis results for this summary with fallback values for missing data
         """
-        results = {
-            'sentiment': {},
-            'topics': {}
-        }
-        
-        # Initialize all expected phases with fallback values
-        for phase in EXPECTED_PHASES:
-            results['sentiment'][phase] = self.fallback_sentiment
-            results['topics'][phase] = self.fallback_topics
-        
-        # Analyze mapped phases
-        for dataset_phase, expected_phases in PHASE_MAPPING.items():
-            content = summary.get(dataset_phase, '')
-            if not content or not isinstance(content, str):
+        return self.analyze_patient_summaries([summary])[0]
+    
+    def _collect_phase_items(self, summaries: List[Dict]) -> List[Tuple[int, str, str]]:
+        """
+        Collect the (patient index, expected phase, text) items to analyze
+        Args:
+            summaries: List of dictionaries containing chat summaries per phase
+        Returns:
+            list: Items in patient order, then PHASE_MAPPING order, each phase
+                  followed by the keyword-derived phases found in its text
+                  (ADDITIONAL_PHASE_MAPPING) with their keyword sentences
+        """
+        items = []
+        for patient_idx, summary in enumerate(summaries):
+            if not isinstance(summary, dict):
                 continue
             
-            # Convert to list if single string
-            if isinstance(expected_phases, str):
-                expected_phases = [expected_phases]
-            
-            for expected_phase in expected_phases:
-                # Skip if phase requires specific keywords and none are found
-                if expected_phase in PHASE_KEYWORDS and not self._extract_phase_content(content, expected_phase):
+            # Analyze mapped phases
+            for dataset_phase, expected_phases in PHASE_MAPPING.items():
+                content = summary.get(dataset_phase, '')
+                if not content or not isinstance(content, str):
                     continue
                 
-                try:
-                    # Get raw sentiment scores
-                    sentiment = self.sentiment_analyzer(content)[0]
-                    
-                    # Amplify the dominant sentiment
-                    if sentiment['score'] > 0.6:  # Solo se il modello è abbastanza sicuro
-                        sentiment['score'] = max(sentiment['score'], 0.9)  # Aumenta il punteggio
-                    
-                    results['sentiment'][expected_phase] = sentiment
-                except Exception:
-                    results['sentiment'][expected_phase] = self.fallback_sentiment
+                # Convert to list if single string
+                if isinstance(expected_phases, str):
+                    expected_phases = [expected_phases]
                 
+                for expected_phase in expected_phases:
+                    # Skip if phase requires specific keywords and none are found
+                    if expected_phase in PHASE_KEYWORDS and not self._extract_phase_content(content, expected_phase):
+                        continue
+                    items.append((patient_idx, expected_phase, content))
+                
+                derived_phases = tuple(ADDITIONAL_PHASE_MAPPING.get(dataset_phase, ()))
+                if not derived_phases:
+                    continue
+                if self.derived_phase_scope == 'sentences':
+                    # Texts are split into sentences once, only when they mention a derived phase
+                    spans = keyword_spans(content, derived_phases, KEYWORD_MATCHER)
+                else:
+                    hits = KEYWORD_MATCHER.find(content, derived_phases)
+                    spans = {phase: content for phase in derived_phases if KEYWORD_MATCHER.in_group(hits, phase)}
+                items.extend((patient_idx, derived_phase, span) for derived_phase, span in spans.items())
+        
+        return items
+    
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Text as sent to the models: surrounding and repeated whitespace collapsed"""
+        return ' '.join(text.split())
+    
+    def _deduplicate_texts(self, texts: List[str]) -> Tuple[List[str], List[int]]:
+        """
+        Reduce texts to their distinct normalized forms
+        Args:
+            texts: Texts to analyze, possibly repeated
+        Returns:
+            tuple: (unique normalized texts in first-seen order,
+                    index into them for every input text)
+        """
+        positions = {}
+        indices = []
+        for text in texts:
+            normalized = self.normalize_text(text)
+            if normalized not in positions:
+                positions[normalized] = len(positions)
+            indices.append(positions[normalized])
+        return list(positions), indices
+    
+    def _cache_identity(self, kind: str) -> Tuple[str, ...]:
+        """Everything besides the text that determines a model output"""
+        chunking = f'{self.chunk_aggregation}:{self.chunk_overlap}'
+        if self.token_cache is not None:
+            # Windows fed token id slices, which can differ from their re-tokenized text
+            chunking += ':ids'
+        if kind == 'sentiment':
+            return (kind, SENTIMENT_MODEL, SENTIMENT_REVISION, self.inference_backend, chunking)
+        return (kind, ZERO_SHOT_MODEL, ZERO_SHOT_REVISION, self.inference_backend,
+                self.topic_backend, '|'.join(self.topics), chunking)
+    
+    def _run_cached(self, kind: str, texts: List[str], run) -> List[Dict]:
+        """
+        Serve texts from the inference cache and run the models on the misses only
+        Args:
+            kind: 'sentiment' or 'topics'
+            texts: Texts to analyze
+            run: Callable running the model on a list of texts
+        Returns:
+            list: Results in input order
+        """
+        if self.cache is None:
+            return run(texts)
+        
+        identity = self._cache_identity(kind)
+        keys = [InferenceCache.make_key(text, *identity) for text in texts]
+        cached = self.cache.get_many(keys)
+        
+        miss_indices = [i for i, key in enumerate(keys) if key not in cached]
+        computed = run([texts[i] for i in miss_indices]) if miss_indices else []
+        
+        # Fallback values are not model outputs, never persist them
+        fallbacks = (self.fallback_sentiment, self.fallback_topics)
+        self.cache.set_many({
+            keys[i]: result for i, result in zip(miss_indices, computed)
+            if not any(result is fallback for fallback in fallbacks)
+        })
+        
+        results = [cached.get(key) for key in keys]
+        for i, result in zip(miss_indices, computed):
+            results[i] = result
+        return results
+    
+    def _length_sorted_batches(self, lengths: List[int], batch_size: int) -> List[List[int]]:
+        """
+        Group text indices into batches of similar length to minimize padding
+        Args:
+            lengths: Token length of each text
+            batch_size: Maximum number of texts per batch
+        Returns:
+            list: Batches of indices into lengths
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        return [order[i:i+batch_size] for i in range(0, len(order), batch_size)]
+    
+    def _run_sentiment(self, texts: List[str], batch_size: int) -> List[Dict]:
+        """
+        Run the sentiment pipeline on texts in length-sorted batches.
+        Texts longer than the model input are scored window by window.
+        Args:
+            texts: Texts to analyze
+            batch_size: Number of texts per model call
+        Returns:
+            list: Sentiment dicts in input order, fallback for failed texts
+        """
+        outputs = [self.fallback_sentiment] * len(texts)
+        token_ids = self._token_ids('sentiment', texts)
+        windows = self._split_long_texts('sentiment', texts, token_ids)
+        whole = [i for i in range(len(texts)) if i not in windows]
+        
+        whole_outputs = self._classify_batched(
+            [texts[i] for i in whole],
+            [token_ids[i] for i in whole],
+            batch_size,
+            lambda batch, batch_ids: self._classify_sentiment(batch, batch_ids),
+            "Sentiment batches",
+            'sentiment'
+        )
+        for i, sentiment in zip(whole, whole_outputs):
+            if sentiment is not None:
+                outputs[i] = sentiment
+        
+        # Every label's score is needed to aggregate windows
+        window_scores = self._classify_windows(
+            windows,
+            batch_size,
+            lambda batch, batch_ids: self._classify_sentiment(batch, batch_ids, all_labels=True),
+            lambda output: {entry['label']: entry['score'] for entry in output},
+            "Sentiment windows",
+            'sentiment'
+        )
+        for i, scores in window_scores.items():
+            label = max(scores, key=scores.get)
+            outputs[i] = {'label': label, 'score': scores[label]}
+        
+        for sentiment in outputs:
+            if sentiment is self.fallback_sentiment:
+                self.fallback_stats['sentiment_failed'] += 1
+                continue
+            # Amplify the dominant sentiment
+            if sentiment['score'] > 0.6:  # Solo se il modello è abbastanza sicuro
+                sentiment['score'] = max(sentiment['score'], 0.9)  # Aumenta il punteggio
+        
+        return outputs
+    
+    def _run_topics(self, texts: List[str], batch_size: int) -> List[Dict]:
+        """
+        Run zero-shot topic classification on texts in length-sorted batches.
+        Texts longer than the model input are scored window by window.
+        Args:
+            texts: Texts to classify
+            batch_size: Number of texts per model call
+        Returns:
+            list: Zero-shot result dicts in input order, fallback for failed texts
+        """
+        outputs = [self.fallback_topics] * len(texts)
+        token_ids = self._token_ids('topics', texts)
+        windows = self._split_long_texts('topics', texts, token_ids)
+        whole = [i for i in range(len(texts)) if i not in windows]
+        
+        whole_outputs = self._classify_batched(
+            [texts[i] for i in whole],
+            [token_ids[i] for i in whole],
+            batch_size,
+            self._classify_topics,
+            "Topic batches",
+            'topics'
+        )
+        for i, topic_result in zip(whole, whole_outputs):
+            if topic_result is not None:
+                outputs[i] = topic_result
+        
+        window_scores = self._classify_windows(
+            windows,
+            batch_size,
+            self._classify_topics,
+            lambda output: dict(zip(output['labels'], output['scores'])),
+            "Topic windows",
+            'topics'
+        )
+        for i, scores in window_scores.items():
+            labels = sorted(scores, key=lambda label: -scores[label])
+            outputs[i] = {
+                'sequence': texts[i],
+                'labels': labels,
+                'scores': [scores[label] for label in labels]
+            }
+        
+        self.fallback_stats['topics_failed'] += sum(topic_result is self.fallback_topics for topic_result in outputs)
+        return outputs
+    
+    def _classify_batched(self, texts: List[str], token_ids: List[List[int]], batch_size: int, classify, desc: str, kind: str) -> List:
+        """
+        Run a classifier on texts in length-sorted batches
+        Args:
+            texts: Texts to classify
+            token_ids: Token ids of each text (see _token_ids)
+            batch_size: Number of texts per model call (None: token budget batches)
+            classify: Callable mapping a list of texts and their token ids to one output per text
+            desc: Progress bar label
+            kind: 'sentiment' or 'topics', whose inference_stats are updated
+        Returns:
+            list: Outputs in input order, None for texts that failed
+        """
+        outputs = [None] * len(texts)
+        if not texts:
+            return outputs
+        
+        # The token ids drive the batching and the token counters, and are
+        # what the models are fed where they take ids
+        chunker = self._chunker(kind)
+        lengths = [len(ids) for ids in token_ids]
+        # Every text is one sequence per topic for zero-shot, each padded
+        # with the special tokens (and hypothesis) the chunker leaves room for
+        sequences = 1 if kind == 'sentiment' else len(self.topics)
+        overhead = chunker.tokenizer.model_max_length - chunker.max_tokens
+        
+        if batch_size:
+            tuner = None
+            batches = self._length_sorted_batches(lengths, batch_size)
+        else:
+            tuner = self._tuner(kind)
+            batches = token_budget_batches(lengths, lambda: tuner.budget, sequences, overhead)
+        
+        for batch in tqdm(batches, desc=desc, disable=not self.progress):
+            batch_texts = [texts[i] for i in batch]
+            batch_ids = [token_ids[i] for i in batch]
+            start = time.perf_counter()
+            with self._model_call_label(desc):
                 try:
-                    # Topic classification
-                    topic_result = self.zero_shot_classifier(
-                        content,
-                        candidate_labels=self.topics,
-                        multi_label=True
-                    )
-                    results['topics'][expected_phase] = topic_result
+                    batch_outputs = classify(batch_texts, batch_ids)
                 except Exception:
-                    results['topics'][expected_phase] = self.fallback_topics
+                    # A single failing text must not take the whole batch down
+                    batch_outputs = []
+                    for text, ids in zip(batch_texts, batch_ids):
+                        try:
+                            batch_outputs.append(classify([text], [ids])[0])
+                        except Exception:
+                            batch_outputs.append(None)
+            
+            seconds = time.perf_counter() - start
+            batch_lengths = [lengths[i] for i in batch]
+            if tuner is not None:
+                tuner.observe(padded_tokens(batch_lengths, sequences, overhead), seconds)
+            self.inference_stats[f'{kind}_seconds'] += seconds
+            self.inference_stats[f'{kind}_batches'] += 1
+            self.inference_stats[f'{kind}_texts'] += len(batch_texts)
+            # Text tokens only: special tokens and zero-shot hypotheses are not counted
+            self.inference_stats[f'{kind}_tokens'] += sum(batch_lengths)
+            
+            for i, output in zip(batch, batch_outputs):
+                outputs[i] = output
+        
+        return outputs
+    
+    def _tokenizer(self, kind: str):
+        """Tokenizer of the sentiment or zero-shot model, loaded without the model weights"""
+        if kind == 'sentiment':
+            return get_tokenizer(SENTIMENT_MODEL, SENTIMENT_REVISION, self.inference_backend, self.export_dir)
+        return get_tokenizer(ZERO_SHOT_MODEL, ZERO_SHOT_REVISION, self.inference_backend, self.export_dir)
+    
+    def _token_ids(self, kind: str, texts: List[str]) -> List[List[int]]:
+        """
+        Token ids of texts (no special tokens, untruncated), from the token cache when there is one
+        Args:
+            kind: 'sentiment' or 'topics'
+            texts: Texts to tokenize
+        Returns:
+            list: Token ids of each text, in input order
+        """
+        if self.token_cache is None:
+            return self._tokenizer(kind)(texts, add_special_tokens=False, verbose=False)['input_ids'] if texts else []
+        
+        model, revision = (SENTIMENT_MODEL, SENTIMENT_REVISION) if kind == 'sentiment' else (ZERO_SHOT_MODEL, ZERO_SHOT_REVISION)
+        identity = tokenizer_identity(model, revision)
+        keys = [TokenCache.make_key(text, identity) for text in texts]
+        cached = self.token_cache.get_many(keys)
+        
+        # The tokenizer is only loaded when some text is not cached
+        miss_indices = [i for i, key in enumerate(keys) if key not in cached]
+        computed = self._tokenizer(kind)(
+            [texts[i] for i in miss_indices], add_special_tokens=False, verbose=False
+        )['input_ids'] if miss_indices else []
+        self.token_cache.set_many({keys[i]: ids for i, ids in zip(miss_indices, computed)})
+        
+        token_ids = [cached[key].tolist() if key in cached else None for key in keys]
+        for i, ids in zip(miss_indices, computed):
+            token_ids[i] = ids
+        return token_ids
+    
+    def _tuner(self, kind: str) -> TokenBudgetTuner:
+        """Token budget of a model's calls, kept for the life of the analyzer"""
+        if kind not in self._tuners:
+            fixed_tokens = None if self.batch_tokens == 'auto' else self.batch_tokens
+            self._tuners[kind] = TokenBudgetTuner(fixed_tokens)
+        return self._tuners[kind]
+    
+    def _model_call_label(self, desc: str):
+        """PyTorch profiler label of a model call when label_model_calls is set, a no-op context otherwise"""
+        if not self.label_model_calls:
+            return nullcontext()
+        from torch.profiler import record_function
+        return record_function(desc)
+    
+    def _split_long_texts(self, kind: str, texts: List[str], token_ids: List[List[int]]) -> Dict[int, List[Tuple[str, List[int]]]]:
+        """
+        Split the texts that do not fit in the model input into windows,
+        deciding from their token ids and slicing the windows' ids out of them
+        Args:
+            kind: 'sentiment' or 'topics'
+            texts: Texts to analyze
+            token_ids: Token ids of each text (see _token_ids)
+        Returns:
+            dict: (window text, window token ids) pairs of each long text, keyed by its index in texts
+        """
+        chunker = self._chunker(kind)
+        windows = {}
+        for i, (text, ids) in enumerate(zip(texts, token_ids)):
+            if len(ids) > chunker.max_tokens:
+                windows[i] = chunker.split_ids(text, ids)
         
-        return results 
+        self.chunk_stats[f'{kind}_texts'] += len(windows)
+        self.chunk_stats[f'{kind}_windows'] += sum(len(text_windows) for text_windows in windows.values())
+        return windows
+    
+    def _classify_windows(self, windows: Dict[int, List[Tuple[str, List[int]]]], batch_size: int, classify, to_scores, desc: str, kind: str) -> Dict[int, Dict]:
+        """
+        Classify the windows of long texts and aggregate them per text
+        Args:
+            windows: (window text, window token ids) pairs of each long text, keyed by text index
+            batch_size: Number of windows per model call
+            classify: Callable mapping a list of texts and their token ids to one output per text
+            to_scores: Callable turning one output into a {label: score} dict
+            desc: Progress bar label
+            kind: 'sentiment' or 'topics'
+        Returns:
+            dict: {label: aggregated score} per text index, texts with a failed window left out
+        """
+        flat = [(i, window) for i, text_windows in windows.items() for window in text_windows]
+        window_outputs = self._classify_batched(
+            [window_text for _, (window_text, _) in flat],
+            [window_ids for _, (_, window_ids) in flat],
+            batch_size, classify, desc, kind
+        )
+        
+        per_text = {i: [] for i in windows}
+        for (i, _), output in zip(flat, window_outputs):
+            per_text[i].append(None if output is None else to_scores(output))
+        
+        return {
+            i: aggregate_scores(scores, self.chunk_aggregation)
+            for i, scores in per_text.items()
+            if None not in scores
+        }
+    
+    def _chunker(self, kind: str) -> TextChunker:
+        """Chunker fitting texts in the sentiment model input or, for topics, next to the longest hypothesis"""
+        if kind not in self._chunkers:
+            tokenizer = self._tokenizer(kind)
+            if kind == 'sentiment':
+                budget = tokenizer.model_max_length - tokenizer.num_special_tokens_to_add(pair=False)
+            else:
+                # Pair length with an empty premise: special tokens + hypothesis
+                budget = tokenizer.model_max_length - max(
+                    len(tokenizer('', HYPOTHESIS_TEMPLATE.format(topic))['input_ids']) for topic in self.topics
+                )
+            self._chunkers[kind] = TextChunker(tokenizer, budget, overlap=min(self.chunk_overlap, budget // 2))
+        return self._chunkers[kind]
+    
+    def _classify_sentiment(self, texts: List[str], token_ids: List[List[int]], all_labels: bool = False) -> List:
+        """
+        Run the sentiment model on texts, fed their token ids when there is a token cache
+        Args:
+            texts: Texts to classify
+            token_ids: Token ids of each text (see _token_ids)
+            all_labels: Every label's score per text instead of the top one
+        Returns:
+            list: Pipeline-shaped outputs, one {'label', 'score'} (or a list of them) per text
+        """
+        if self.token_cache is None:
+            if all_labels:
+                return self.sentiment_analyzer(texts, batch_size=len(texts), truncation=True, top_k=None)
+            return self.sentiment_analyzer(texts, batch_size=len(texts), truncation=True)
+        
+        # Deferred: topic_scorer imports torch
+        try:
+            from .topic_scorer import pad_token_ids
+        except ImportError:
+            from topic_scorer import pad_token_ids
+        import torch
+        
+        tokenizer = self._tokenizer('sentiment')
+        model = self.sentiment_analyzer.model
+        # Truncated as the pipeline does, then wrapped in the special tokens
+        budget = tokenizer.model_max_length - tokenizer.num_special_tokens_to_add(pair=False)
+        inputs = pad_token_ids(
+            [tokenizer.build_inputs_with_special_tokens(list(ids[:budget])) for ids in token_ids],
+            tokenizer.pad_token_id,
+            model.device
+        )
+        with torch.no_grad():
+            # Single-label model: softmax over the labels, as in the pipeline
+            scores = model(**inputs).logits.softmax(dim=-1).tolist()
+        
+        outputs = []
+        for text_scores in scores:
+            ranked = sorted(
+                ({'label': model.config.id2label[j], 'score': score} for j, score in enumerate(text_scores)),
+                key=lambda entry: -entry['score']
+            )
+            outputs.append(ranked if all_labels else ranked[0])
+        return outputs
+    
+    def _classify_topics(self, texts: List[str], token_ids: List[List[int]] = None) -> List[Dict]:
+        """
+        Classify texts against self.topics with the configured topic backend
+        Args:
+            texts: Texts to classify
+            token_ids: Token ids of each text, used by the TopicScorer backends
+        Returns:
+            list: Zero-shot result dicts, one per text
+        """
+        if self.topic_scorer is not None:
+            return self.topic_scorer.score(texts, token_ids)
+        
+        # The pipeline batches premise/hypothesis pairs, one pair per topic
+        outputs = self.zero_shot_classifier(
+            texts,
+            candidate_labels=self.topics,
+            multi_label=True,
+            batch_size=len(texts) * len(self.topics)
+        )
+        if isinstance(outputs, dict):
+            outputs = [outputs]
+        return outputs
 
     def _extract_phase_content(self, content: str, phase: str) -> bool:
         """
@@ -160,12 +1049,4 @@ class NLPAnalyzer:
         if not content:
             return False
         
-        keywords = PHASE_KEYWORDS.get(phase, [])
-        return any(keyword.lower() in content.lower() for keyword in keywords) 
-
-    @lru_cache(maxsize=1000)
-    def _analyze_content(self, content: str) -> tuple:
-        """Analyze content and cache results"""
-        sentiment = self.sentiment_analyzer(content)[0]
-        topics = self.zero_shot_classifier(content, candidate_labels=self.topics, multi_label=True)
-        return sentiment, topics 
\ No newline at end of file
+        return KEYWORD_MATCHER.matches(content, phase)
@@ -0,0 +1,223 @@
+import math
+from typing import Dict, List
+import numpy as np
+
+class PhaseResults:
+    """
+    Per-patient, per-phase NLP results held in preallocated NumPy arrays:
+    - sentiment_labels: (patients x phases) codes into self.sentiment_label_names, -1 if missing
+    - sentiment_scores: (patients x phases) sentiment scores
+    - topic_scores: (patients x phases x topics) scores in canonical topic order, NaN if missing
+    The former dict-of-lists shape ({'sentiment_per_phase': {phase: [...]},
+    'topics_per_phase': {phase: [...]}}) is built on demand by indexing,
+    e.g. results['sentiment_per_phase'].
+    """
+    def __init__(self, n_patients: int, phases: List[str], topics: List[str]):
+        self.phases = list(phases)
+        self.topics = list(topics)
+        self.sentiment_label_names = []
+        self._phase_index = {phase: i for i, phase in enumerate(self.phases)}
+        self._topic_index = {topic: i for i, topic in enumerate(self.topics)}
+        self._label_index = {}
+
+        self.sentiment_labels = np.full((n_patients, len(self.phases)), -1, dtype=np.int8)
+        # float64: amplified sentiment scores (0.9) must stay exact
+        self.sentiment_scores = np.zeros((n_patients, len(self.phases)), dtype=np.float64)
+        self.topic_scores = np.full((n_patients, len(self.phases), len(self.topics)), np.nan, dtype=np.float32)
+        # Phases with a topic result, per patient
+        self.has_topics = np.zeros((n_patients, len(self.phases)), dtype=bool)
+
+    @classmethod
+    def from_patient_results(cls, patient_results: List[Dict], topics: List[str]) -> 'PhaseResults':
+        """
+        Build from per-patient results
+        Args:
+            patient_results: Results shaped like NLPAnalyzer._analyze_single_summary, one per patient
+            topics: Canonical topic order
+        Returns:
+            PhaseResults: Results of all patients
+        """
+        phases = list(dict.fromkeys(
+            phase for result in patient_results for kind in ('sentiment', 'topics') for phase in result[kind]
+        ))
+        results = cls(len(patient_results), phases, topics)
+        for patient_idx, result in enumerate(patient_results):
+            for phase, sentiment in result['sentiment'].items():
+                results.set_sentiment(patient_idx, phase, sentiment)
+            for phase, topic_result in result['topics'].items():
+                results.set_topics(patient_idx, phase, topic_result)
+        return results
+
+    @classmethod
+    def from_phase_lists(cls,
+                         sentiment_per_phase: Dict = None,
+                         topics_per_phase: Dict = None,
+                         topics: List[str] = None) -> 'PhaseResults':
+        """
+        Build from the dict-of-lists shape, entry i of every phase being patient i
+        Args:
+            sentiment_per_phase: {phase: [{'label', 'score'} per patient]}
+            topics_per_phase: {phase: [{'labels', 'scores'} per patient]}
+            topics: Canonical topic order (default: derived from the entries)
+        Returns:
+            PhaseResults: Results of all patients
+        """
+        sentiment_per_phase = sentiment_per_phase or {}
+        topics_per_phase = topics_per_phase or {}
+        phases = list(dict.fromkeys([*sentiment_per_phase, *topics_per_phase]))
+        if topics is None:
+            # Fallback entries (all scores 0.0) list the topics in analyzer
+            # order: scanning them first makes it the canonical order
+            entries = sorted(
+                (t for phase_entries in topics_per_phase.values() for t in phase_entries),
+                key=lambda t: any(t['scores'])
+            )
+            topics = list(dict.fromkeys(label for t in entries for label in t['labels']))
+        n_patients = max((len(entries) for entries in [*sentiment_per_phase.values(), *topics_per_phase.values()]), default=0)
+
+        results = cls(n_patients, phases, topics)
+        for phase, entries in sentiment_per_phase.items():
+            for patient_idx, sentiment in enumerate(entries):
+                results.set_sentiment(patient_idx, phase, sentiment)
+        for phase, entries in topics_per_phase.items():
+            for patient_idx, topic_result in enumerate(entries):
+                results.set_topics(patient_idx, phase, topic_result)
+        return results
+
+    @classmethod
+    def concatenate(cls, parts: List['PhaseResults']) -> 'PhaseResults':
+        """
+        Stack the patients of several results (e.g. streamed chunks)
+        Args:
+            parts: Results sharing the same topics
+        Returns:
+            PhaseResults: Patients of every part, in order
+        """
+        phases = list(dict.fromkeys(phase for part in parts for phase in part.phases))
+        topics = parts[0].topics if parts else []
+        results = cls(sum(part.n_patients for part in parts), phases, topics)
+
+        offset = 0
+        for part in parts:
+            rows = slice(offset, offset + part.n_patients)
+            columns = [results._phase_index[phase] for phase in part.phases]
+            # Re-code sentiment labels into the combined vocabulary
+            codes = np.array([results._label_code(label) for label in part.sentiment_label_names] + [-1], dtype=np.int8)
+            results.sentiment_labels[rows, columns] = codes[part.sentiment_labels]
+            results.sentiment_scores[rows, columns] = part.sentiment_scores
+            results.topic_scores[rows, columns] = part.topic_scores
+            results.has_topics[rows, columns] = part.has_topics
+            offset += part.n_patients
+        return results
+
+    @property
+    def n_patients(self) -> int:
+        return self.sentiment_labels.shape[0]
+
+    def set_sentiment(self, patient_idx: int, phase: str, sentiment: Dict):
+        """Store a {'label', 'score'} sentiment result"""
+        column = self._phase_index[phase]
+        self.sentiment_labels[patient_idx, column] = self._label_code(sentiment['label'])
+        self.sentiment_scores[patient_idx, column] = sentiment['score']
+
+    def set_topics(self, patient_idx: int, phase: str, topic_result: Dict):
+        """Store a zero-shot {'labels', 'scores'} result"""
+        column = self._phase_index[phase]
+        for label, score in zip(topic_result['labels'], topic_result['scores']):
+            self.topic_scores[patient_idx, column, self._topic_index[label]] = score
+        self.has_topics[patient_idx, column] = True
+
+    def fill(self, sentiment: Dict, topic_result: Dict):
+        """Store the same sentiment and topic result (e.g. the fallback values) in every cell"""
+        self.sentiment_labels[:] = self._label_code(sentiment['label'])
+        self.sentiment_scores[:] = sentiment['score']
+        self.topic_scores[:] = np.nan
+        for label, score in zip(topic_result['labels'], topic_result['scores']):
+            self.topic_scores[..., self._topic_index[label]] = score
+        self.has_topics[:] = True
+
+    def scatter_sentiments(self, rows: List[int], phases: List[str], sentiments: List[Dict], text_indices: List[int]):
+        """
+        Store the sentiment results of distinct texts in every cell sharing them
+        Args:
+            rows: Patient index of each cell
+            phases: Phase of each cell
+            sentiments: {'label', 'score'} result of each distinct text
+            text_indices: Index into sentiments of each cell
+        """
+        codes = np.array([self._label_code(sentiment['label']) for sentiment in sentiments], dtype=np.int8)
+        scores = np.array([sentiment['score'] for sentiment in sentiments], dtype=np.float64)
+        columns = [self._phase_index[phase] for phase in phases]
+        text_indices = np.asarray(text_indices, dtype=np.intp)
+        self.sentiment_labels[rows, columns] = codes[text_indices]
+        self.sentiment_scores[rows, columns] = scores[text_indices]
+
+    def scatter_topics(self, rows: List[int], phases: List[str], topic_results: List[Dict], text_indices: List[int]):
+        """
+        Store the zero-shot results of distinct texts in every cell sharing them
+        Args:
+            rows: Patient index of each cell
+            phases: Phase of each cell
+            topic_results: {'labels', 'scores'} result of each distinct text
+            text_indices: Index into topic_results of each cell
+        """
+        matrix = np.full((len(topic_results), len(self.topics)), np.nan, dtype=np.float32)
+        for text_idx, topic_result in enumerate(topic_results):
+            for label, score in zip(topic_result['labels'], topic_result['scores']):
+                matrix[text_idx, self._topic_index[label]] = score
+        columns = [self._phase_index[phase] for phase in phases]
+        self.topic_scores[rows, columns] = matrix[np.asarray(text_indices, dtype=np.intp)]
+        self.has_topics[rows, columns] = True
+
+    def sentiment_per_phase(self) -> Dict[str, List[Dict]]:
+        """Compatibility view: {phase: [{'label', 'score'} per patient]}"""
+        view = {}
+        for column, phase in enumerate(self.phases):
+            codes = self.sentiment_labels[:, column].tolist()
+            scores = self.sentiment_scores[:, column].tolist()
+            entries = [
+                {'label': self.sentiment_label_names[code], 'score': score}
+                for code, score in zip(codes, scores) if code >= 0
+            ]
+            if entries:
+                view[phase] = entries
+        return view
+
+    def topics_per_phase(self) -> Dict[str, List[Dict]]:
+        """Compatibility view: {phase: [{'labels', 'scores'} per patient]}, labels by decreasing score"""
+        view = {}
+        for column, phase in enumerate(self.phases):
+            entries = []
+            present = self.has_topics[:, column]
+            for row in self.topic_scores[present, column].tolist():
+                # Stable sort: ties (e.g. fallback zeros) keep the canonical order
+                labelled = [j for j in range(len(self.topics)) if not math.isnan(row[j])]
+                order = sorted(labelled, key=lambda j: -row[j])
+                entries.append({
+                    'labels': [self.topics[j] for j in order],
+                    'scores': [row[j] for j in order]
+                })
+            if entries:
+                view[phase] = entries
+        return view
+
+    def to_dict(self) -> Dict:
+        """Full compatibility view, as formerly returned by analyze_chat_summaries"""
+        return {
+            'sentiment_per_phase': self.sentiment_per_phase(),
+            'topics_per_phase': self.topics_per_phase()
+        }
+
+    def __getitem__(self, key: str) -> Dict:
+        if key == 'sentiment_per_phase':
+            return self.sentiment_per_phase()
+        if key == 'topics_per_phase':
+            return self.topics_per_phase()
+        raise KeyError(key)
+
+    def _label_code(self, label: str) -> int:
+        """Code of a sentiment label, registering new labels"""
+        if label not in self._label_index:
+            self._label_index[label] = len(self.sentiment_label_names)
+            self.sentiment_label_names.append(label)
+        return self._label_index[label]
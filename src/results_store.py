@@ -0,0 +1,133 @@
+import json
+import math
+from pathlib import Path
+from typing import Dict
+import numpy as np
+try:
+    from .phase_results import PhaseResults
+except ImportError:
+    from phase_results import PhaseResults
+
+# Bumped whenever the on-disk layout changes
+FORMAT_VERSION = 1
+
+# Columns of the store, one .npy file each
+COLUMNS = ['phase', 'patient', 'sentiment_label', 'sentiment_score', 'topic_scores']
+
+class ColumnarResultsStore:
+    """
+    Compact, columnar replacement of analysis_results.json.
+    One row per (patient, phase) with label-encoded sentiments and a fixed
+    (rows x topics) score matrix, each column saved as a .npy file so it can
+    be memory-mapped; the label vocabularies and the completeness metrics
+    live in meta.json. Input texts are not stored (they are in
+    cleaned_dataset.csv), so reconstructed topic results have no 'sequence'.
+    """
+    def __init__(self, path: str = "outputs/analysis_results"):
+        self.path = Path(path)
+
+    def save(self, sentiment_analysis: Dict, topic_analysis: Dict, completeness_metrics: Dict):
+        """
+        Save analysis results given in the dict-of-lists shape
+        Args:
+            sentiment_analysis: {phase: [{'label', 'score'} per patient]}
+            topic_analysis: {phase: [{'labels', 'scores'} per patient]}
+            completeness_metrics: Completeness metrics (saved as JSON)
+        """
+        self.save_phase_results(
+            PhaseResults.from_phase_lists(sentiment_analysis, topic_analysis),
+            completeness_metrics
+        )
+
+    def save_phase_results(self, results: PhaseResults, completeness_metrics: Dict):
+        """
+        Save array-backed analysis results
+        Args:
+            results: NLP results, see PhaseResults
+            completeness_metrics: Completeness metrics (saved as JSON)
+        """
+        # Rows: every patient of every phase, in phase order
+        n_phases = len(results.phases)
+        missing = results.sentiment_labels.T.ravel() < 0
+        # -1 / NaN mark a missing sentiment / topic entry. Sentiment scores
+        # are amplified in float64 (0.9), topic scores are float32 model outputs
+        sentiment_scores = results.sentiment_scores.T.ravel().copy()
+        sentiment_scores[missing] = np.nan
+        topic_scores = results.topic_scores.transpose(1, 0, 2).reshape(-1, len(results.topics)).copy()
+        topic_scores[~results.has_topics.T.ravel()] = np.nan
+
+        columns = {
+            'phase': np.repeat(np.arange(n_phases, dtype=np.int16), results.n_patients),
+            'patient': np.tile(np.arange(results.n_patients, dtype=np.int32), n_phases),
+            'sentiment_label': results.sentiment_labels.T.ravel(),
+            'sentiment_score': sentiment_scores,
+            'topic_scores': topic_scores
+        }
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        for name in COLUMNS:
+            np.save(self.path / f'{name}.npy', columns[name])
+        with open(self.path / 'meta.json', 'w') as f:
+            json.dump({
+                'format_version': FORMAT_VERSION,
+                'phases': results.phases,
+                'sentiment_labels': results.sentiment_label_names,
+                'topics': results.topics,
+                'completeness': completeness_metrics
+            }, f)
+
+    def load_meta(self) -> Dict:
+        """Label vocabularies and completeness metrics"""
+        with open(self.path / 'meta.json') as f:
+            meta = json.load(f)
+        if meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported results format version {meta.get('format_version')} in {self.path}")
+        return meta
+
+    def load_columns(self, mmap_mode: str = 'r') -> Dict[str, np.ndarray]:
+        """
+        Load the columns without decoding them
+        Args:
+            mmap_mode: numpy memory-map mode ('r' by default, None to read in memory)
+        Returns:
+            dict: Column name to array, decode codes with load_meta()
+        """
+        return {name: np.load(self.path / f'{name}.npy', mmap_mode=mmap_mode) for name in COLUMNS}
+
+    def load(self) -> Dict:
+        """
+        Rebuild the results in the shape of analysis_results.json
+        Returns:
+            dict: {'sentiment': ..., 'topics': ..., 'completeness': ...}
+        """
+        meta = self.load_meta()
+        columns = self.load_columns(mmap_mode=None)
+        sentiment = {}
+        topics = {}
+
+        phase_codes = columns['phase'].tolist()
+        label_codes = columns['sentiment_label'].tolist()
+        scores = columns['sentiment_score'].tolist()
+        topic_rows = columns['topic_scores'].tolist()
+
+        for phase_code, label_code, score, topic_scores in zip(phase_codes, label_codes, scores, topic_rows):
+            phase = meta['phases'][phase_code]
+            if label_code >= 0:
+                sentiment.setdefault(phase, []).append({
+                    'label': meta['sentiment_labels'][label_code],
+                    'score': score
+                })
+            present = [j for j, topic_score in enumerate(topic_scores) if not math.isnan(topic_score)]
+            if present:
+                # Same order as the zero-shot pipeline: decreasing score
+                present.sort(key=lambda j: -topic_scores[j])
+                topics.setdefault(phase, []).append({
+                    'labels': [meta['topics'][j] for j in present],
+                    'scores': [topic_scores[j] for j in present]
+                })
+
+        return {'sentiment': sentiment, 'topics': topics, 'completeness': meta['completeness']}
+
+    def size_bytes(self) -> int:
+        """Total size of the store on disk"""
+        return sum(f.stat().st_size for f in self.path.iterdir() if f.is_file())
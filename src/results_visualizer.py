@@ -1,18 +1,138 @@
 import pandas as pd
+import matplotlib
+# Figures are only ever written to files: never start an interactive backend
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
-from typing import Dict
+from typing import Dict, List, Tuple
 import json
+import multiprocessing
+import time
+import numpy as np
 from pathlib import Path
 try:
     from .metrics_calculator import EXPECTED_PHASES
+    from .results_store import ColumnarResultsStore
+    from .phase_results import PhaseResults
 except ImportError:
     from metrics_calculator import EXPECTED_PHASES
+    from results_store import ColumnarResultsStore
+    from phase_results import PhaseResults
+
+# Formats of the saved raw results
+RESULTS_FORMATS = ['columnar', 'json']
+
+# Image formats of the figures, unless told otherwise
+DEFAULT_PLOT_FORMATS = ['png']
+
+# Phases shown in the heatmaps (additional keyword phases are left out)
+MAIN_PHASES = ['symptom_onset', 'pre_diagnostic', 'primary_diagnostic', 'new_treatment', 'ongoing_care']
+
+def _save_figure(output_stem: Path, formats: List[str], **kwargs):
+    """Save the current figure once per format, then close it"""
+    for fmt in formats:
+        plt.savefig(output_stem.with_suffix(f'.{fmt}'), **kwargs)
+    plt.close()
+
+def _draw_sentiment_heatmap(sentiment_pivot: pd.DataFrame, output_stem: Path, formats: List[str]):
+    """Draw the sentiment heatmap (phases x sentiment labels)"""
+    plt.figure(figsize=(12, 6))
+    
+    # Use a colormap that shows better shades
+    sns.heatmap(
+        sentiment_pivot, 
+        annot=True, 
+        cmap='RdYlGn',
+        vmin=0, 
+        vmax=1,
+        fmt='.2f'
+    )
+    plt.title('Sentiment Analysis by Phase')
+    plt.tight_layout()
+    _save_figure(output_stem, formats)
+
+def _draw_topic_heatmap(topic_pivot: pd.DataFrame, output_stem: Path, formats: List[str]):
+    """Draw the topic heatmap (phases x topics)"""
+    plt.figure(figsize=(15, 10))
+    
+    # Improve readability of labels
+    sns.heatmap(
+        topic_pivot, 
+        annot=True, 
+        cmap='YlOrRd',
+        fmt='.2f',
+        yticklabels=[label.replace('_', ' ').title() for label in topic_pivot.index]
+    )
+    
+    plt.title('Topic Distribution by Phase', pad=20)
+    plt.xticks(rotation=0)
+    plt.yticks(rotation=0)
+    
+    plt.tight_layout()
+    _save_figure(output_stem, formats, bbox_inches='tight', dpi=300)
+
+def _draw_completeness_bars(phases: List[str], scores: List[float], output_stem: Path, formats: List[str]):
+    """Draw the completeness bar chart"""
+    plt.figure(figsize=(10, 6))
+    
+    plt.bar(phases, scores)
+    plt.title('Completeness Score by Phase')
+    plt.xticks(rotation=45)
+    plt.ylabel('Completeness Score')
+    plt.tight_layout()
+    _save_figure(output_stem, formats)
+
+# Figure (output file stem) -> drawing function
+FIGURES = {
+    'sentiment_analysis': _draw_sentiment_heatmap,
+    'topic_distribution': _draw_topic_heatmap,
+    'completeness_scores': _draw_completeness_bars
+}
+
+def _render_figure(job: Tuple) -> Tuple[str, float]:
+    """
+    Draw one figure, in this process or in a rendering worker
+    Args:
+        job: (figure name, drawing arguments, output directory, formats)
+    Returns:
+        tuple: (figure name, render time in seconds)
+    """
+    name, args, output_dir, formats = job
+    start = time.perf_counter()
+    FIGURES[name](*args, Path(output_dir) / name, formats)
+    return name, time.perf_counter() - start
 
 class ResultsVisualizer:
-    def __init__(self, output_dir: str = "outputs/"):
+    def __init__(self,
+                 output_dir: str = "outputs/",
+                 results_format: str = 'columnar',
+                 plot_formats: List[str] = None,
+                 n_jobs: int = 1):
+        if results_format not in RESULTS_FORMATS:
+            raise ValueError(f"Unknown results format '{results_format}', expected one of {RESULTS_FORMATS}")
+        
+        plot_formats = DEFAULT_PLOT_FORMATS if plot_formats is None else list(plot_formats)
+        supported = Figure().canvas.get_supported_filetypes()
+        for fmt in plot_formats:
+            if fmt not in supported:
+                raise ValueError(f"Unsupported plot format '{fmt}', expected one of {sorted(supported)}")
+        
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        
+        # 'columnar': analysis_results/ (see ColumnarResultsStore)
+        # 'json': the legacy, much larger analysis_results.json
+        self.results_format = results_format
+        
+        # Image formats of every figure, no figures at all if empty
+        self.plot_formats = plot_formats
+        
+        # Figures are rendered in up to n_jobs processes
+        self.n_jobs = n_jobs
+        
+        # Seconds spent drawing and saving each figure
+        self.render_times = {}
     
     def visualize_and_save_results(self, 
                                  sentiment_analysis: Dict, 
@@ -21,149 +141,167 @@ class ResultsVisualizer:
         """
         Visualize and save analysis results
         """
+        self.visualize_phase_results(
+            PhaseResults.from_phase_lists(sentiment_analysis, topic_analysis),
+            completeness_metrics
+        )
+    
+    def visualize_phase_results(self, results: PhaseResults, completeness_metrics: Dict):
+        """
+        Visualize and save array-backed analysis results
+        Args:
+            results: NLP results, as returned by NLPAnalyzer.analyze_chat_summaries
+            completeness_metrics: Completeness metrics
+        """
+        # Saving raw results
+        if self.results_format == 'columnar':
+            self._save_results_columnar(results, completeness_metrics)
+        else:
+            self._save_results_to_json({
+                'sentiment': results.sentiment_per_phase(),
+                'topics': results.topics_per_phase(),
+                'completeness': completeness_metrics
+            })
         
-        # Saving raw results to JSON
-        self._save_results_to_json({
-            'sentiment': sentiment_analysis,
-            'topics': topic_analysis,
-            'completeness': completeness_metrics
-        })
+        if not self.plot_formats:
+            print("Plots skipped")
+            return
         
-        self._plot_sentiment_analysis(sentiment_analysis)
+        self._render_figures([
+            self._sentiment_figure(results),
+            self._topic_figure(results),
+            self._completeness_figure(completeness_metrics)
+        ])
         
-        self._plot_topic_distribution(topic_analysis)
+        print("All visualizations saved successfully!")
+    
+    def _render_figures(self, figures: List[Tuple[str, Tuple]]):
+        """
+        Draw figures in this process or, with n_jobs > 1, concurrently in
+        worker processes, recording each figure's render time
+        Args:
+            figures: (figure name, drawing arguments) pairs
+        """
+        jobs = [(name, args, str(self.output_dir), self.plot_formats) for name, args in figures]
         
-        self._plot_completeness_scores(completeness_metrics)
+        if self.n_jobs > 1 and len(jobs) > 1:
+            # Not fork: the parent may have torch thread pools running, which a
+            # forked child inherits in an undefined state
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            with multiprocessing.get_context(method).Pool(min(self.n_jobs, len(jobs))) as pool:
+                timings = pool.map(_render_figure, jobs)
+        else:
+            timings = [_render_figure(job) for job in jobs]
         
-        print("All visualizations saved successfully!")
+        for name, seconds in timings:
+            self.render_times[name] = seconds
+            print(f"Rendered {name} ({', '.join(self.plot_formats)}) in {seconds:.2f}s")
+    
+    def _save_results_columnar(self, results: PhaseResults, completeness_metrics: Dict):
+        """Save raw results to the columnar store, loadable with ColumnarResultsStore(...).load()"""
+        store = ColumnarResultsStore(self.output_dir / 'analysis_results')
+        store.save_phase_results(results, completeness_metrics)
+        print(f"Results saved to {store.path} ({store.size_bytes() / 1024:.0f} KB)")
     
     def _save_results_to_json(self, results: Dict):
         """Save raw results to JSON file"""
         with open(self.output_dir / 'analysis_results.json', 'w') as f:
             json.dump(results, f, indent=2)
     
-    def _plot_sentiment_analysis(self, sentiment_results: Dict):
+    def _plot_sentiment_analysis(self, sentiment_results):
         """Create sentiment analysis visualization"""
-        sentiment_data = []
-        all_sentiments = {'POSITIVE', 'NEGATIVE', 'NEUTRAL'}
-        
-        # Define main phases only
-        main_phases = ['symptom_onset', 'pre_diagnostic', 'primary_diagnostic', 'new_treatment', 'ongoing_care']
-        
-        # Create complete data, filtering out phases with only fallback values
-        for phase in main_phases:  # Usa solo le fasi principali invece di EXPECTED_PHASES
-            phase_sentiments = sentiment_results.get(phase, [])
-            
-            # Create a dict to store scores for each sentiment
-            sentiment_scores = {s: 0.0 for s in all_sentiments}
-            
-            # Update with actual values
-            has_real_values = False
-            for s in phase_sentiments:
-                # Check if this is not a fallback value (0.5)
-                if s['score'] != 0.5:
-                    has_real_values = True
-                sentiment_scores[s['label']] = s['score']
-            
-            # Only include phases with real sentiment values
-            if has_real_values:
-                for sentiment, score in sentiment_scores.items():
-                    sentiment_data.append({
-                        'phase': phase,
-                        'sentiment': sentiment,
-                        'score': score
-                    })
-        
-        df = pd.DataFrame(sentiment_data)
-        
-        # Create sentiment heatmap
-        plt.figure(figsize=(12, 6))
-        sentiment_pivot = df.pivot_table(
-            values='score', 
-            index='phase',
-            columns='sentiment',
-            aggfunc='mean',
-            fill_value=0.0
-        )
-        
-        # Reorder by main phases order
-        sentiment_pivot = sentiment_pivot.reindex(main_phases)
-        
-        # Use a colormap that shows better shades
-        sns.heatmap(
-            sentiment_pivot, 
-            annot=True, 
-            cmap='RdYlGn',
-            vmin=0, 
-            vmax=1,
-            fmt='.2f'
-        )
-        plt.title('Sentiment Analysis by Phase')
-        plt.tight_layout()
-        plt.savefig(self.output_dir / 'sentiment_analysis.png')
-        plt.close()
+        if not isinstance(sentiment_results, PhaseResults):
+            sentiment_results = PhaseResults.from_phase_lists(sentiment_per_phase=sentiment_results)
+        self._render_figures([self._sentiment_figure(sentiment_results)])
     
-    def _plot_topic_distribution(self, topic_results: Dict):
+    def _plot_topic_distribution(self, topic_results):
         """Create topic distribution visualization"""
-        topic_data = []
-        
-        # Filter phases with only zero scores and exclude additional phases
-        main_phases = ['symptom_onset', 'pre_diagnostic', 'primary_diagnostic', 'new_treatment', 'ongoing_care']
-        for phase, topics in topic_results.items():
-            if phase not in main_phases:  # Skip additional phases
-                continue
-            for topic_list in topics:
-                if any(score > 0.0 for score in topic_list['scores']):
-                    for label, score in zip(topic_list['labels'], topic_list['scores']):
-                        topic_data.append({
-                            'phase': phase,
-                            'topic': label,
-                            'score': score
-                        })
-        
-        df = pd.DataFrame(topic_data)
-        
-        # Create topic heatmap
-        plt.figure(figsize=(15, 10))
-        topic_pivot = df.pivot_table(
-            values='score',
-            index='phase',
-            columns='topic',
-            aggfunc='mean'
-        )
-        
-        # Reorder by main phases
-        topic_pivot = topic_pivot.reindex(main_phases)
-        
-        # Improve readability of labels
-        sns.heatmap(
-            topic_pivot, 
-            annot=True, 
-            cmap='YlOrRd',
-            fmt='.2f',
-            yticklabels=[label.replace('_', ' ').title() for label in topic_pivot.index]
-        )
-        
-        plt.title('Topic Distribution by Phase', pad=20)
-        plt.xticks(rotation=0)
-        plt.yticks(rotation=0)
-        
-        plt.tight_layout()
-        plt.savefig(self.output_dir / 'topic_distribution.png', bbox_inches='tight', dpi=300)
-        plt.close()
+        if not isinstance(topic_results, PhaseResults):
+            topic_results = PhaseResults.from_phase_lists(topics_per_phase=topic_results)
+        self._render_figures([self._topic_figure(topic_results)])
     
     def _plot_completeness_scores(self, completeness_results: Dict):
         """Create completeness scores visualization"""
-        plt.figure(figsize=(10, 6))
-        
+        self._render_figures([self._completeness_figure(completeness_results)])
+    
+    def _sentiment_figure(self, results: PhaseResults) -> Tuple[str, Tuple]:
+        """Sentiment heatmap job: figure name and drawing arguments"""
+        return 'sentiment_analysis', (self._sentiment_by_phase(results, MAIN_PHASES),)
+    
+    def _topic_figure(self, results: PhaseResults) -> Tuple[str, Tuple]:
+        """Topic heatmap job: figure name and drawing arguments"""
+        return 'topic_distribution', (self._topics_by_phase(results, MAIN_PHASES),)
+    
+    def _completeness_figure(self, completeness_results: Dict) -> Tuple[str, Tuple]:
+        """Completeness bar chart job: figure name and drawing arguments"""
         # Reorder by EXPECTED_PHASES
         ordered_phases = [p for p in EXPECTED_PHASES if p in completeness_results['phase_completeness']]
         scores = [completeness_results['phase_completeness'][p] for p in ordered_phases]
+        return 'completeness_scores', (ordered_phases, scores)
+    
+    def _sentiment_by_phase(self, results: PhaseResults, phases: List[str]) -> pd.DataFrame:
+        """
+        Sentiment heatmap values: per phase, the score of the last patient with
+        each label (0.0 if none). Phases with only fallback scores (0.5) or
+        no results are left empty (NaN)
+        Args:
+            results: NLP results
+            phases: Heatmap rows, in order
+        Returns:
+            DataFrame: phases x sentiment labels (sorted)
+        """
+        rows = {}
+        for phase in phases:
+            if phase not in results.phases:
+                continue
+            column = results.phases.index(phase)
+            codes = results.sentiment_labels[:, column]
+            scores = results.sentiment_scores[:, column]
+            
+            # Only include phases with real sentiment values
+            if not np.any(scores[codes >= 0] != 0.5):
+                continue
+            
+            row = {label: 0.0 for label in ('POSITIVE', 'NEGATIVE', 'NEUTRAL')}
+            for code, label in enumerate(results.sentiment_label_names):
+                patients = np.flatnonzero(codes == code)
+                if patients.size:
+                    row[label] = scores[patients[-1]]
+            rows[phase] = row
+        
+        frame = pd.DataFrame.from_dict(rows, orient='index', dtype=np.float64)
+        frame = frame.reindex(index=phases, columns=sorted(frame.columns))
+        frame.index.name = 'phase'
+        frame.columns.name = 'sentiment'
+        return frame
+    
+    def _topics_by_phase(self, results: PhaseResults, phases: List[str]) -> pd.DataFrame:
+        """
+        Topic heatmap values: per phase and topic, the mean score over the
+        patients with a non-zero topic result
+        Args:
+            results: NLP results
+            phases: Heatmap rows, in order
+        Returns:
+            DataFrame: phases x topics (sorted), NaN where there is no result
+        """
+        means = {}
+        for phase in phases:
+            if phase not in results.phases:
+                continue
+            scores = results.topic_scores[:, results.phases.index(phase)].astype(np.float64)
+            # Skip fallback (all zero) and missing (all NaN) results
+            scores = scores[np.any(scores > 0.0, axis=1)]
+            if len(scores):
+                counts = np.sum(~np.isnan(scores), axis=0)
+                sums = np.nansum(scores, axis=0)
+                means[phase] = {
+                    topic: sums[j] / counts[j]
+                    for j, topic in enumerate(results.topics) if counts[j]
+                }
         
-        plt.bar(ordered_phases, scores)
-        plt.title('Completeness Score by Phase')
-        plt.xticks(rotation=45)
-        plt.ylabel('Completeness Score')
-        plt.tight_layout()
-        plt.savefig(self.output_dir / 'completeness_scores.png')
-        plt.close() 
\ No newline at end of file
+        frame = pd.DataFrame.from_dict(means, orient='index', dtype=np.float64)
+        frame = frame.reindex(index=phases, columns=sorted(frame.columns))
+        frame.index.name = 'phase'
+        frame.columns.name = 'topic'
+        return frame
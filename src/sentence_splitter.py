@@ -0,0 +1,62 @@
+import re
+from typing import Dict, List, Tuple
+try:
+    from .keyword_matcher import KeywordMatcher
+except ImportError:
+    from keyword_matcher import KeywordMatcher
+
+# Sentence ends within a line: ., ! or ? followed by whitespace
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+# Abbreviations whose final period does not end a sentence
+ABBREVIATIONS = {'dr.', 'mr.', 'mrs.', 'ms.', 'prof.', 'e.g.', 'i.e.', 'vs.', 'etc.', 'approx.'}
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split a text into sentences, at sentence-ending punctuation and line breaks
+    Args:
+        text: Text to split
+    Returns:
+        list: Non-empty sentences, in order
+    """
+    sentences = []
+    for line in text.splitlines():
+        line_sentences = []
+        for part in SENTENCE_END.split(line.strip()):
+            if not part:
+                continue
+            if line_sentences and line_sentences[-1].rsplit(None, 1)[-1].lower() in ABBREVIATIONS:
+                line_sentences[-1] = f'{line_sentences[-1]} {part}'
+            else:
+                line_sentences.append(part)
+        sentences.extend(line_sentences)
+    return sentences
+
+def keyword_spans(text: str, groups: Tuple[str, ...], matcher: KeywordMatcher) -> Dict[str, str]:
+    """
+    Sentences of a text mentioning each keyword group
+    Args:
+        text: Text to scan
+        groups: Keyword groups of the matcher to look for
+        matcher: Matcher holding the groups
+    Returns:
+        dict: For each group found in the text, its sentences joined by a
+              space (the whole text if it is a single sentence or if the
+              keyword only appears across a sentence break)
+    """
+    hits = matcher.find(text, groups)
+    found = [group for group in groups if matcher.in_group(hits, group)]
+    if not found:
+        return {}
+
+    sentences = split_sentences(text)
+    if len(sentences) <= 1:
+        return {group: text for group in found}
+
+    # One keyword scan per sentence, shared by all groups
+    sentence_hits = [matcher.find(sentence, groups) for sentence in sentences]
+    spans = {}
+    for group in found:
+        selected = [sentence for sentence, s_hits in zip(sentences, sentence_hits) if matcher.in_group(s_hits, group)]
+        spans[group] = ' '.join(selected) if selected else text
+    return spans
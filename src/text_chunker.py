@@ -0,0 +1,98 @@
+from typing import Dict, List, Tuple
+
+# How the scores of a long text's windows are combined
+CHUNK_AGGREGATIONS = ['mean', 'max']
+
+class TextChunker:
+    """
+    Tokenizer-aware splitter of texts longer than a model's input budget.
+    Long texts are cut at token boundaries into windows of at most max_tokens
+    tokens, consecutive windows sharing `overlap` tokens so that no sentence
+    is only ever seen cut in half.
+    """
+    def __init__(self, tokenizer, max_tokens: int, overlap: int = 64):
+        if max_tokens <= overlap:
+            raise ValueError(f"max_tokens ({max_tokens}) must be larger than overlap ({overlap})")
+
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+
+    def split(self, text: str) -> List[str]:
+        """
+        Split a text into overlapping windows
+        Args:
+            text: Text to split
+        Returns:
+            list: [text] if it fits in max_tokens, its windows otherwise
+        """
+        # Every token covers at least one byte: short texts need no tokenization
+        if len(text.encode('utf-8')) <= self.max_tokens:
+            return [text]
+
+        offsets = self._offsets(text)
+        if len(offsets) <= self.max_tokens:
+            return [text]
+        return [text[offsets[start][0]:offsets[end - 1][1]] for start, end in self.token_windows(len(offsets))]
+
+    def split_ids(self, text: str, token_ids: List[int]) -> List[Tuple[str, List[int]]]:
+        """
+        Split an already tokenized text into overlapping windows. Only texts
+        over max_tokens are tokenized again, for the character offsets of their windows
+        Args:
+            text: Text to split
+            token_ids: Its token ids (no special tokens, untruncated)
+        Returns:
+            list: (window text, window token ids) pairs, [(text, token_ids)] if it fits
+        """
+        if len(token_ids) <= self.max_tokens:
+            return [(text, token_ids)]
+
+        offsets = self._offsets(text)
+        return [
+            (text[offsets[start][0]:offsets[end - 1][1]], token_ids[start:end])
+            for start, end in self.token_windows(len(token_ids))
+        ]
+
+    def token_windows(self, length: int) -> List[Tuple[int, int]]:
+        """
+        Token ranges of the windows of a text
+        Args:
+            length: Number of tokens of the text
+        Returns:
+            list: (start, end) token ranges, [(0, length)] if it fits in max_tokens
+        """
+        if length <= self.max_tokens:
+            return [(0, length)]
+
+        windows = []
+        step = self.max_tokens - self.overlap
+        for start in range(0, length, step):
+            end = min(start + self.max_tokens, length)
+            windows.append((start, end))
+            if end == length:
+                break
+        return windows
+
+    def _offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Character span of each token of a text"""
+        return self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        )['offset_mapping']
+
+def aggregate_scores(window_scores: List[Dict[str, float]], aggregation: str = 'mean') -> Dict[str, float]:
+    """
+    Combine per-label scores of the windows of one text
+    Args:
+        window_scores: {label: score} of each window
+        aggregation: 'mean' (average over windows) or 'max' (strongest window)
+    Returns:
+        dict: {label: aggregated score}
+    """
+    if aggregation not in CHUNK_AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation '{aggregation}', expected one of {CHUNK_AGGREGATIONS}")
+
+    labels = window_scores[0].keys()
+    if aggregation == 'max':
+        return {label: max(scores[label] for scores in window_scores) for label in labels}
+    return {label: sum(scores[label] for scores in window_scores) / len(window_scores) for label in labels}
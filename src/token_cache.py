@@ -0,0 +1,245 @@
+import hashlib
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+try:
+    # Unix only: elsewhere concurrent writers are not serialized
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Header of tokens.idx: format magic and generation, bumped on every clear
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('generation', '<i8')])
+INDEX_MAGIC = b'TOKIDX01'
+# One index record per cached text: key digest, offset and length in the ids
+# file. Raw bytes ('V'): an 'S' field would drop the digest's trailing zeros
+INDEX_DTYPE = np.dtype([('key', 'V16'), ('offset', '<i8'), ('length', '<i4')])
+# Token ids are stored as little-endian int32
+TOKEN_DTYPE = np.dtype('<i4')
+
+def tokenizer_identity(model: str, revision: str) -> str:
+    """
+    Identity of a model's tokenizer in the cache keys (ONNX exports save the
+    same tokenizer, so every inference backend shares the entries)
+    Args:
+        model: Model name the tokenizer belongs to
+        revision: Pinned model revision
+    Returns:
+        str: e.g. 'facebook/bart-large-mnli@d7645e1'
+    """
+    return f"{model}@{revision}"
+
+class TokenCache:
+    """
+    Persistent, content-addressed store of token id arrays backed by two
+    append-only files: `tokens.ids` holds the ids of every cached text back to
+    back and is memory-mapped, so lookups are zero-copy views shared by every
+    process reading the same files; `tokens.idx` holds a header with the
+    cache generation, then one fixed-size record (key, offset, length) per
+    text. Keys hash the text together with the tokenizer identity, so entries
+    never go stale. Ids are the text's tokens without special tokens,
+    untruncated.
+
+    Writers, readers and clear() serialize on `tokens.lock`. Clearing
+    replaces both files with new ones under a new generation instead of
+    truncating them, so views handed out earlier keep their data, and
+    every open instance drops its offsets on its next lookup.
+    """
+    def __init__(self, path: str = "outputs/token_cache", max_size_mb: float = 512, owner: bool = True):
+        """
+        Args:
+            path: Directory of the cache files
+            max_size_mb: Size of tokens.ids above which the owner starts over
+            owner: Only the owning process may clear the cache (worker processes
+                   and other readers of the same files pass False)
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.ids_path = self.path / 'tokens.ids'
+        self.index_path = self.path / 'tokens.idx'
+        self.lock_path = self.path / 'tokens.lock'
+        self.owner = owner
+
+        # Key digest -> (offset, length) in tokens.ids, in tokens
+        self.index: Dict[bytes, tuple] = {}
+        self._index_read = 0
+        self._generation = None
+        self._ids = None
+        self.hits = 0
+        self.misses = 0
+
+        if owner:
+            with self._locked(exclusive=True):
+                # Missing or pre-generation files are started over, as is a cache over the size limit
+                if self._read_generation() is None or (
+                    self.ids_path.exists() and self.ids_path.stat().st_size > max_size_mb * 2**20
+                ):
+                    self._clear_locked()
+        self._refresh()
+
+    @staticmethod
+    def make_key(text: str, identity: str) -> bytes:
+        """
+        Build a cache key
+        Args:
+            text: Tokenized text
+            identity: Tokenizer identity (see tokenizer_identity)
+        Returns:
+            bytes: 16-byte SHA-256 prefix
+        """
+        digest = hashlib.sha256(identity.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.digest()[:16]
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Look up several keys at once
+        Args:
+            keys: Cache keys
+        Returns:
+            dict: Read-only token id arrays for the keys that were found
+        """
+        # Pick up entries appended (or a clear) by other processes since the last lookup
+        self._refresh()
+        found = {}
+        for key in keys:
+            entry = self.index.get(key)
+            if entry is not None:
+                offset, length = entry
+                found[key] = self._ids[offset:offset + length]
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def set_many(self, entries: Dict[bytes, List[int]]):
+        """
+        Append token ids
+        Args:
+            entries: Token ids per key; keys already cached are skipped
+        """
+        if not entries:
+            return
+
+        with self._locked(exclusive=True):
+            # Offsets must be those of the current generation of the files
+            self._refresh_locked()
+            entries = {key: ids for key, ids in entries.items() if key not in self.index}
+            if not entries or self._generation is None:
+                return
+
+            arrays = [np.asarray(ids, dtype=TOKEN_DTYPE) for ids in entries.values()]
+            records = np.empty(len(arrays), dtype=INDEX_DTYPE)
+            records['key'] = list(entries)
+            records['length'] = [len(array) for array in arrays]
+
+            with open(self.ids_path, 'ab') as ids_file, open(self.index_path, 'ab') as index_file:
+                # The ids are written before the records pointing to them, so
+                # a reader never sees a record past the end of tokens.ids
+                start = os.fstat(ids_file.fileno()).st_size // TOKEN_DTYPE.itemsize
+                records['offset'] = start + np.concatenate(([0], np.cumsum(records['length'])[:-1]))
+                ids_file.write(np.concatenate(arrays).tobytes())
+                ids_file.flush()
+                index_file.write(records.tobytes())
+                index_file.flush()
+            self._refresh_locked()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and size of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.index),
+            'tokens': len(self._ids) if self._ids is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        """Drop every entry (owner only)"""
+        if not self.owner:
+            raise RuntimeError(f"Only the process owning the token cache in {self.path} may clear it")
+        with self._locked(exclusive=True):
+            self._clear_locked()
+            self._refresh_locked()
+
+    def close(self):
+        """Release the memory map (the next lookup maps the file again)"""
+        self._ids = None
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """Hold the cache lock: exclusive to write or clear, shared to read"""
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_generation(self):
+        """Generation in the index header, None if the index is missing or of another format"""
+        try:
+            with open(self.index_path, 'rb') as index_file:
+                header = np.frombuffer(index_file.read(HEADER_DTYPE.itemsize), dtype=HEADER_DTYPE)
+        except FileNotFoundError:
+            return None
+        if len(header) == 0 or header['magic'][0] != INDEX_MAGIC:
+            return None
+        return int(header['generation'][0])
+
+    def _clear_locked(self):
+        """Replace both files with empty ones of the next generation (lock held exclusively)"""
+        header = np.array([(INDEX_MAGIC, (self._read_generation() or 0) + 1)], dtype=HEADER_DTYPE)
+        # New files renamed over the old ones: processes still mapping the
+        # old tokens.ids keep reading its (unlinked) data, never a truncated file
+        for file_path, content in ((self.ids_path, b''), (self.index_path, header.tobytes())):
+            temp_path = file_path.with_name(file_path.name + '.tmp')
+            with open(temp_path, 'wb') as temp_file:
+                temp_file.write(content)
+            os.replace(temp_path, file_path)
+
+    def _refresh(self):
+        """Pick up the records appended since the last call, or start over after a clear"""
+        with self._locked(exclusive=False):
+            self._refresh_locked()
+
+    def _refresh_locked(self):
+        """_refresh with the lock held"""
+        generation = self._read_generation()
+        if generation is None:
+            # Not initialized by the owner yet: nothing to read
+            self.index, self._index_read, self._generation, self._ids = {}, 0, None, None
+            return
+
+        token_count = self.ids_path.stat().st_size // TOKEN_DTYPE.itemsize
+        # Only whole records: a writer may be halfway through one
+        record_count = (self.index_path.stat().st_size - HEADER_DTYPE.itemsize) // INDEX_DTYPE.itemsize
+        shrunk = record_count < self._index_read or (self._ids is not None and token_count < len(self._ids))
+        if generation != self._generation or shrunk:
+            # Cleared (or truncated) since the last call: every known offset is stale
+            self.index = {}
+            self._index_read = 0
+            self._ids = None
+            self._generation = generation
+
+        if record_count > self._index_read:
+            records = np.fromfile(
+                self.index_path, dtype=INDEX_DTYPE, count=record_count - self._index_read,
+                offset=HEADER_DTYPE.itemsize + self._index_read * INDEX_DTYPE.itemsize
+            )
+            # Records past the end of tokens.ids (a damaged file) are never served
+            records = records[records['offset'] + records['length'] <= token_count]
+            self.index.update(zip(records['key'].tolist(), zip(records['offset'].tolist(), records['length'].tolist())))
+            self._index_read = record_count
+
+        if self._ids is None or len(self._ids) < token_count:
+            # An empty file cannot be memory-mapped
+            self._ids = (
+                np.memmap(self.ids_path, dtype=TOKEN_DTYPE, mode='r', shape=(token_count,))
+                if token_count else np.empty(0, dtype=TOKEN_DTYPE)
+            )
@@ -0,0 +1,168 @@
+import itertools
+import torch
+from typing import Dict, List
+
+# Backends supported by TopicScorer
+TOPIC_BACKENDS = ['nli']
+
+# Agreement with the zero-shot pipeline a TopicScorer backend must reach on
+# sample phase texts (see topic_agreement): top label on 9 texts out of 10,
+# and 9 label pairs out of 10 ranked in the same order. A cosine-similarity
+# backend over mean-pooled MNLI encoder states was dropped for scoring at
+# chance level (0.0 top-1, 0.43 rank agreement on export_models.PARITY_TEXTS)
+MIN_TOP1_AGREEMENT = 0.9
+MIN_RANK_AGREEMENT = 0.9
+
+def topic_agreement(reference: List[Dict], candidate: List[Dict]) -> Dict:
+    """
+    Compare topic scores with the zero-shot pipeline's
+    Args:
+        reference: Pipeline outputs (labels and scores) of some texts
+        candidate: Outputs of the scorer to check on the same texts
+    Returns:
+        dict: 'top1_agreement', share of texts with the same top label, and
+              'rank_agreement', share of label pairs ranked in the same order
+    """
+    same_top = 0
+    same_pairs = 0
+    pair_count = 0
+    for expected, actual in zip(reference, candidate):
+        expected_scores = dict(zip(expected['labels'], expected['scores']))
+        actual_scores = dict(zip(actual['labels'], actual['scores']))
+        same_top += expected['labels'][0] == actual['labels'][0]
+        for first, second in itertools.combinations(expected['labels'], 2):
+            same_pairs += (expected_scores[first] > expected_scores[second]) == (actual_scores[first] > actual_scores[second])
+            pair_count += 1
+
+    return {
+        'top1_agreement': same_top / len(reference),
+        'rank_agreement': same_pairs / pair_count if pair_count else 1.0
+    }
+
+def pad_token_ids(sequences: List[List[int]], pad_id: int, device=None) -> Dict:
+    """
+    Right-pad token id sequences into model inputs
+    Args:
+        sequences: Token ids of each sequence, special tokens included
+        pad_id: Padding token id
+        device: Device of the returned tensors
+    Returns:
+        dict: 'input_ids' and 'attention_mask' tensors
+    """
+    width = max(len(ids) for ids in sequences)
+    input_ids = torch.full((len(sequences), width), pad_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(sequences), width), dtype=torch.long)
+    for row, ids in enumerate(sequences):
+        input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[row, :len(ids)] = 1
+
+    return {'input_ids': input_ids.to(device), 'attention_mask': attention_mask.to(device)}
+
+class TopicScorer:
+    """
+    Zero-shot topic scorer for a fixed list of labels.
+
+    'nli': same multi-label NLI scores as the zero-shot pipeline, but the
+        hypotheses are tokenized once at startup, every premise is tokenized
+        once (or taken as token ids, e.g. from a token cache) and all
+        premise/hypothesis pairs of a batch of texts go through the model in
+        a single forward pass.
+    """
+    def __init__(self,
+                 model,
+                 tokenizer,
+                 labels: List[str],
+                 backend: str = 'nli',
+                 hypothesis_template: str = "This example is {}.",
+                 batch_size: int = 8):
+        if backend not in TOPIC_BACKENDS:
+            raise ValueError(f"Unknown topic backend '{backend}', expected one of {TOPIC_BACKENDS}")
+
+        self.model = model
+        self.tokenizer = tokenizer
+        self.labels = list(labels)
+        self.backend = backend
+        self.hypothesis_template = hypothesis_template
+        self.batch_size = batch_size
+        self.hypotheses = [hypothesis_template.format(label) for label in self.labels]
+
+        # Same label resolution as the zero-shot pipeline in multi-label mode
+        self.entailment_id = -1
+        for label, idx in model.config.label2id.items():
+            if label.lower().startswith('entail'):
+                self.entailment_id = idx
+        self.contradiction_id = -1 if self.entailment_id == 0 else 0
+
+        # Hypotheses never change: tokenize each one once, together with
+        # the special tokens the tokenizer places around a sentence pair
+        self.pair_prefix, self.hypothesis_tails = self._pair_layout(self.hypotheses)
+
+    def score(self, texts: List[str], token_ids: List[List[int]] = None) -> List[Dict]:
+        """
+        Score texts against all labels
+        Args:
+            texts: Texts to classify
+            token_ids: Token ids of each text without special tokens, when
+                       already tokenized (e.g. from a token cache)
+        Returns:
+            list: Dicts shaped like the zero-shot pipeline output
+                  (sequence, labels and scores sorted by decreasing score)
+        """
+        results = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i+self.batch_size]
+            batch_ids = token_ids[i:i+self.batch_size] if token_ids is not None else None
+            scores = self._score_nli(batch, batch_ids)
+
+            for text, text_scores in zip(batch, scores.tolist()):
+                order = sorted(range(len(self.labels)), key=lambda j: -text_scores[j])
+                results.append({
+                    'sequence': text,
+                    'labels': [self.labels[j] for j in order],
+                    'scores': [text_scores[j] for j in order]
+                })
+
+        return results
+
+    def _score_nli(self, texts: List[str], token_ids: List[List[int]] = None) -> torch.Tensor:
+        """Run every premise/hypothesis pair of the batch in one forward pass"""
+        max_length = self.tokenizer.model_max_length
+        if token_ids is None:
+            token_ids = self.tokenizer(texts, add_special_tokens=False, verbose=False)['input_ids']
+        sequences = []
+        for premise_ids in token_ids:
+            premise_ids = list(premise_ids)
+            for tail in self.hypothesis_tails:
+                # Truncate the premise only, as the pipeline does
+                budget = max_length - len(self.pair_prefix) - len(tail)
+                sequences.append(self.pair_prefix + premise_ids[:budget] + tail)
+
+        inputs = self._pad(sequences)
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+
+        logits = logits.reshape(len(texts), len(self.labels), -1)
+        entail_contr_logits = logits[..., [self.contradiction_id, self.entailment_id]]
+        return entail_contr_logits.softmax(dim=-1)[..., 1]
+
+    def _pair_layout(self, hypotheses: List[str]):
+        """
+        Split tokenized premise/hypothesis pairs into a shared prefix and one
+        tail per hypothesis, so pairs can be assembled from premise ids alone
+        """
+        premise_ids = self.tokenizer('premise', add_special_tokens=False)['input_ids']
+        prefix = None
+        tails = []
+        for hypothesis in hypotheses:
+            pair_ids = self.tokenizer('premise', hypothesis)['input_ids']
+            start = next(
+                i for i in range(len(pair_ids))
+                if pair_ids[i:i+len(premise_ids)] == premise_ids
+            )
+            prefix = pair_ids[:start]
+            tails.append(pair_ids[start+len(premise_ids):])
+        return prefix, tails
+
+    def _pad(self, sequences: List[List[int]]) -> Dict:
+        """Right-pad token id sequences into model inputs"""
+        return pad_token_ids(sequences, self.tokenizer.pad_token_id, self.model.device)
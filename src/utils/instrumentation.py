@@ -0,0 +1,98 @@
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict
+try:
+    from .profiling import StageProfiler
+except ImportError:
+    from profiling import StageProfiler
+try:
+    # Unix only: peak memory is reported as None elsewhere
+    import resource
+except ImportError:
+    resource = None
+
+# Metrics JSON written next to the other outputs
+DEFAULT_METRICS_PATH = "outputs/run_metrics.json"
+
+def peak_rss_mb(children: bool = False) -> float:
+    """
+    Peak resident set size so far, in MB
+    Args:
+        children: Peak of the largest terminated child process (e.g. pool workers) instead of this process
+    Returns:
+        float: Peak RSS, None where it cannot be measured
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+class Instrumentation:
+    """
+    Machine-readable metrics of one run: wall time of each pipeline stage,
+    metric groups recorded by the components (e.g. NLPAnalyzer.metrics())
+    and peak memory, saved as a JSON file. Stage timings are also logged.
+    With a StageProfiler, every stage is profiled as well.
+    """
+    def __init__(self, logger: logging.Logger = None, profiler: StageProfiler = None):
+        self.logger = logger or logging.getLogger('patient_journey_analysis')
+        self.profiler = profiler
+        # Stage name -> {'seconds', 'calls'}, in first-run order
+        self.stages = {}
+        self.metrics = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, torch_ops: bool = False):
+        """
+        Time a pipeline stage; stages run several times (e.g. once per chunk) are summed
+        Args:
+            name: Stage name
+            torch_ops: The stage runs the models (PyTorch-profiled when profiling)
+        """
+        profile = self.profiler.profile(name, torch_ops) if self.profiler is not None else nullcontext()
+        start = time.perf_counter()
+        try:
+            with profile:
+                yield
+        finally:
+            seconds = time.perf_counter() - start
+            stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            stage['seconds'] += seconds
+            stage['calls'] += 1
+            self.logger.info(f"Stage {name} finished in {seconds:.2f}s")
+
+    def record(self, name: str, metrics: Dict):
+        """Store a group of metrics (JSON-serializable), replacing a previous group of the same name"""
+        self.metrics[name] = metrics
+
+    def to_dict(self) -> Dict:
+        """All metrics of the run so far"""
+        return {
+            'total_seconds': time.perf_counter() - self._start,
+            'stages': {name: dict(stage) for name, stage in self.stages.items()},
+            'peak_rss_mb': peak_rss_mb(),
+            'peak_rss_children_mb': peak_rss_mb(children=True),
+            **self.metrics
+        }
+
+    def save(self, path: str = DEFAULT_METRICS_PATH) -> Dict:
+        """
+        Write the metrics JSON
+        Args:
+            path: Output file
+        Returns:
+            dict: The saved metrics
+        """
+        metrics = self.to_dict()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(metrics, f, indent=2)
+        self.logger.info(f"Run metrics saved to {path}")
+        return metrics
@@ -0,0 +1,76 @@
+import cProfile
+import io
+import pstats
+from contextlib import contextmanager
+from pathlib import Path
+
+# Profiles written by `main.py --profile`
+DEFAULT_PROFILE_DIR = "outputs/profiles"
+
+class StageProfiler:
+    """
+    Profiles pipeline stages: cProfile for the Python side of every stage and,
+    on stages running the models, the PyTorch profiler for operator times.
+    Repeated runs of a stage (e.g. one per streamed chunk) accumulate in the
+    same cProfile; each PyTorch-profiled run gets its own trace. Per stage:
+    - <stage>.prof: cProfile stats (snakeviz, pstats...)
+    - <stage>.txt: functions with the largest cumulative time
+    - <stage>.<run>.trace.json / .torch.txt: Chrome trace (chrome://tracing,
+      Perfetto) and operator table of the PyTorch profiler
+    Only the calling process is profiled, not pool workers.
+    """
+    def __init__(self, output_dir: str = DEFAULT_PROFILE_DIR, top_n: int = 40):
+        self.output_dir = Path(output_dir)
+        self.top_n = top_n
+        self._profiles = {}
+        self._torch_runs = {}
+        self._active = False
+
+    @contextmanager
+    def profile(self, name: str, torch_ops: bool = False):
+        """
+        Profile one run of a stage
+        Args:
+            name: Stage name, used in the file names
+            torch_ops: Also run the PyTorch profiler
+        """
+        if self._active:
+            # Nested stage: already covered by the enclosing profile
+            yield
+            return
+
+        self._active = True
+        profile = self._profiles.setdefault(name, cProfile.Profile())
+        torch_profiler = self._start_torch_profiler() if torch_ops else None
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._active = False
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            self._write_cprofile(name, profile)
+            if torch_profiler is not None:
+                torch_profiler.stop()
+                self._write_torch_profile(name, torch_profiler)
+
+    def _write_cprofile(self, name: str, profile: cProfile.Profile):
+        """Dump the stats of a stage so far and their text summary"""
+        profile.dump_stats(self.output_dir / f'{name}.prof')
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats('cumulative').print_stats(self.top_n)
+        (self.output_dir / f'{name}.txt').write_text(summary.getvalue())
+
+    def _start_torch_profiler(self):
+        """Start a CPU PyTorch profiler (torch is only imported when profiling)"""
+        from torch.profiler import profile, ProfilerActivity
+        profiler = profile(activities=[ProfilerActivity.CPU])
+        profiler.start()
+        return profiler
+
+    def _write_torch_profile(self, name: str, profiler):
+        """Write the Chrome trace and operator table of one PyTorch-profiled run"""
+        run = self._torch_runs[name] = self._torch_runs.get(name, 0) + 1
+        profiler.export_chrome_trace(str(self.output_dir / f'{name}.{run}.trace.json'))
+        table = profiler.key_averages().table(sort_by='cpu_time_total', row_limit=self.top_n)
+        (self.output_dir / f'{name}.{run}.torch.txt').write_text(table)
@@ -0,0 +1,345 @@
+"""
+End-to-end pipeline benchmark on synthetic patient journeys.
+Generates a reproducible raw dataset (chat_summary_per_phase JSON strings)
+and times each stage separately: DataLoader.clean_data,
+MetricsCalculator.calculate_phase_completeness,
+NLPAnalyzer.analyze_chat_summaries and the visualizer.
+With --models stub (default) the NLP models are replaced by deterministic
+stand-ins so the benchmark runs offline and measures the pipeline itself;
+--models real uses the pinned models (their weights must be in the Hugging
+Face cache, set HF_HUB_OFFLINE=1 to forbid downloads).
+Usage: python test/benchmark_pipeline.py [--patients N] [--output report.json] [--compare baseline.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from typing import Dict, List
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.data_loader import DataLoader
+from src.metrics_calculator import MetricsCalculator, PHASE_MAPPING, PHASE_KEYWORDS, MEDICAL_TERMS
+from src.nlp_analyzer import NLPAnalyzer
+from src.results_visualizer import ResultsVisualizer
+from src.utils.instrumentation import peak_rss_mb
+
+# Bumped whenever the generated data or the report layout changes:
+# reports are only comparable within the same version
+BENCHMARK_VERSION = 1
+
+STAGES = ['clean_data', 'completeness', 'nlp', 'visualize']
+
+# Filler words of the synthetic journeys
+FILLER_WORDS = [
+    'patient', 'felt', 'pain', 'fatigue', 'worried', 'clinic', 'weeks', 'months', 'started',
+    'noticed', 'appointment', 'hospital', 'specialist', 'results', 'tests', 'blood', 'sleep',
+    'work', 'family', 'better', 'worse', 'again', 'after', 'before', 'during', 'severe', 'mild'
+]
+
+# Words that make phase detection and completeness scoring fire
+KEYWORDS = sorted({keyword for keywords in PHASE_KEYWORDS.values() for keyword in keywords} | set(MEDICAL_TERMS))
+
+# Boilerplate answer repeated across patients, as in the real exports
+BOILERPLATE = "No information provided"
+
+def generate_journeys(n_patients: int,
+                      median_words: int = 40,
+                      words_sigma: float = 0.8,
+                      keyword_density: float = 0.1,
+                      missing_share: float = 0.15,
+                      boilerplate_share: float = 0.05,
+                      seed: int = 0) -> pd.DataFrame:
+    """
+    Generate raw patient journeys shaped like the data/ exports
+    Args:
+        n_patients: Number of patients
+        median_words: Median number of words of a phase text (log-normal lengths)
+        words_sigma: Log-normal sigma of the phase text lengths
+        keyword_density: Share of words drawn from the phase keywords and medical terms
+        missing_share: Share of phases left out of a journey
+        boilerplate_share: Share of phases answered with the same boilerplate text
+        seed: Random seed, the same parameters always give the same dataset
+    Returns:
+        pd.DataFrame: Raw dataset with JSON chat_summary_per_phase strings
+    """
+    rng = random.Random(seed)
+    summaries = []
+    for _ in range(n_patients):
+        summary = {}
+        for phase in PHASE_MAPPING:
+            draw = rng.random()
+            if draw < missing_share:
+                continue
+            if draw < missing_share + boilerplate_share:
+                summary[phase] = BOILERPLATE
+                continue
+
+            n_words = max(1, int(rng.lognormvariate(0, words_sigma) * median_words))
+            words = [
+                rng.choice(KEYWORDS) if rng.random() < keyword_density else rng.choice(FILLER_WORDS)
+                for _ in range(n_words)
+            ]
+            summary[phase] = ' '.join(words).capitalize() + '.'
+        # Extras removed by DataLoader.clean_data
+        summary['tips'] = {'tips': 'Drink water', 'documents': []}
+        summaries.append(json.dumps(summary))
+
+    return pd.DataFrame({
+        'patient_id': range(n_patients),
+        'chat_summary_per_phase': summaries,
+        'age_range': [rng.choice(['18-30', '31-50', '51-70', None]) for _ in range(n_patients)],
+        'latitude': [rng.uniform(36, 47) if rng.random() > 0.02 else None for _ in range(n_patients)]
+    })
+
+
+class StubTokenizer:
+    """Word-level tokenizer with the parts of the Hugging Face API the analyzer uses"""
+    model_max_length = 512
+
+    def num_special_tokens_to_add(self, pair: bool = False) -> int:
+        return 3 if pair else 2
+
+    def __call__(self, text, text_pair: str = None, add_special_tokens: bool = True,
+                 return_offsets_mapping: bool = False, verbose: bool = True) -> Dict:
+        if isinstance(text, list):
+            return {'input_ids': [self(t, add_special_tokens=add_special_tokens)['input_ids'] for t in text]}
+        offsets = [match.span() for match in re.finditer(r'\w+|[^\w\s]', text)]
+        n_tokens = len(offsets)
+        if text_pair is not None:
+            n_tokens += len(re.findall(r'\w+|[^\w\s]', text_pair))
+        if add_special_tokens:
+            n_tokens += self.num_special_tokens_to_add(pair=text_pair is not None)
+        encoding = {'input_ids': [0] * n_tokens}
+        if return_offsets_mapping:
+            encoding['offset_mapping'] = offsets
+        return encoding
+
+
+def _text_scores(text: str, labels: List[str]) -> List[float]:
+    """Deterministic pseudo-scores in [0, 1) of a text for each label"""
+    return [zlib.crc32(f'{label}\0{text}'.encode('utf-8')) / 2**32 for label in labels]
+
+
+class StubSentimentPipeline:
+    """Deterministic stand-in of the sentiment pipeline"""
+    labels = ['NEGATIVE', 'POSITIVE']
+
+    def __init__(self):
+        self.tokenizer = StubTokenizer()
+
+    def __call__(self, texts: List[str], top_k: int = 1, **kwargs) -> List:
+        outputs = []
+        for text in texts:
+            positive = _text_scores(text, ['POSITIVE'])[0]
+            scores = [
+                {'label': 'NEGATIVE', 'score': 1 - positive},
+                {'label': 'POSITIVE', 'score': positive}
+            ]
+            scores.sort(key=lambda entry: -entry['score'])
+            outputs.append(scores if top_k is None else scores[0])
+        return outputs
+
+
+class StubZeroShotPipeline:
+    """Deterministic stand-in of the zero-shot classification pipeline"""
+    def __init__(self):
+        self.tokenizer = StubTokenizer()
+
+    def __call__(self, texts: List[str], candidate_labels: List[str], **kwargs) -> List[Dict]:
+        outputs = []
+        for text in texts:
+            scores = dict(zip(candidate_labels, _text_scores(text, candidate_labels)))
+            labels = sorted(candidate_labels, key=lambda label: -scores[label])
+            outputs.append({'sequence': text, 'labels': labels, 'scores': [scores[label] for label in labels]})
+        return outputs
+
+
+class StubNLPAnalyzer(NLPAnalyzer):
+    """NLPAnalyzer running on the stub pipelines (no model weights needed)"""
+    _stub_sentiment = StubSentimentPipeline()
+    _stub_zero_shot = StubZeroShotPipeline()
+
+    @property
+    def sentiment_analyzer(self):
+        return self._stub_sentiment
+
+    @property
+    def zero_shot_classifier(self):
+        return self._stub_zero_shot
+
+    def _tokenizer(self, kind: str):
+        return (self._stub_sentiment if kind == 'sentiment' else self._stub_zero_shot).tokenizer
+
+
+def count_phase_texts(clean_data: pd.DataFrame) -> int:
+    """Number of non-empty phase texts of the cleaned dataset"""
+    return sum(
+        1 for summary in clean_data['chat_summary_per_phase'] if isinstance(summary, dict)
+        for phase in PHASE_MAPPING if isinstance(summary.get(phase), str) and summary[phase]
+    )
+
+def run_stages(raw_data: pd.DataFrame, models: str, analyzer_kwargs: Dict, output_dir: str) -> Dict:
+    """
+    Run every stage once
+    Returns:
+        dict: {stage: {'seconds', 'items', 'peak_rss_mb'}}
+    """
+    timings = {}
+
+    def timed(stage: str, run, items):
+        # Stage output is not part of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = run()
+            seconds = time.perf_counter() - start
+        timings[stage] = {'seconds': seconds, 'items': items(result), 'peak_rss_mb': peak_rss_mb()}
+        return result
+
+    clean_data = timed('clean_data', lambda: DataLoader().clean_data(raw_data), count_phase_texts)
+    n_texts = timings['clean_data']['items']
+    completeness = timed(
+        'completeness', lambda: MetricsCalculator().calculate_phase_completeness(clean_data), lambda _: n_texts
+    )
+
+    analyzer = (StubNLPAnalyzer if models == 'stub' else NLPAnalyzer)(**analyzer_kwargs)
+    if models == 'real':
+        # Loading the models is startup cost (see benchmark_startup.py), not throughput
+        analyzer._analyze_single_summary({'diagnosis': 'Doctor confirmed the diagnosis'})
+        analyzer.dedup_stats = {'texts': 0, 'unique': 0}
+    text_analysis = timed(
+        'nlp',
+        lambda: analyzer.analyze_chat_summaries(clean_data['chat_summary_per_phase']),
+        lambda _: analyzer.dedup_stats['texts']
+    )
+    analyzer.close()
+
+    visualizer = ResultsVisualizer(output_dir=output_dir)
+    timed('visualize', lambda: visualizer.visualize_phase_results(text_analysis, completeness), lambda _: len(raw_data))
+    return timings
+
+def git_commit() -> str:
+    """Current commit of the repository, with '+dirty' for uncommitted changes"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, cwd=ROOT
+        ).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True, check=True, cwd=ROOT).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('+dirty' if dirty else '')
+
+def print_report(report: Dict, baseline: Dict = None):
+    """Print the stage table, with the change against a baseline report if given"""
+    header = f"{'stage':<14} {'best (s)':>10} {'items':>8} {'items/s':>12} {'peak RSS (MB)':>14}"
+    if baseline:
+        header += f" {'vs ' + baseline['commit']:>20}"
+    print(header)
+    for stage in STAGES:
+        result = report['stages'][stage]
+        line = (f"{stage:<14} {result['seconds']:>10.3f} {result['items']:>8} "
+                f"{result['items_per_second']:>12.1f} {result['peak_rss_mb']:>14.1f}")
+        if baseline:
+            before = baseline['stages'][stage]['seconds']
+            line += f" {(result['seconds'] - before) / before:>+19.1%}" if before else f" {'-':>20}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on synthetic journeys")
+    parser.add_argument('--patients', type=int, default=2000, help="Number of synthetic patients")
+    parser.add_argument('--median-words', type=int, default=40, help="Median words per phase text")
+    parser.add_argument('--words-sigma', type=float, default=0.8, help="Log-normal sigma of the text lengths")
+    parser.add_argument('--keyword-density', type=float, default=0.1, help="Share of keyword words in the texts")
+    parser.add_argument('--seed', type=int, default=0, help="Dataset random seed")
+    parser.add_argument('--models', choices=['stub', 'real'], default='stub',
+                        help="Deterministic offline stand-ins or the pinned models from the HF cache")
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help="NLPAnalyzer texts per model call (default: token budget batches)")
+    parser.add_argument('--batch-tokens', type=lambda value: value if value == 'auto' else int(value), default='auto',
+                        help="NLPAnalyzer padded tokens per model call, or 'auto'")
+    parser.add_argument('--token-cache', action='store_true',
+                        help="Feed the models from a token cache, filled by the first repeat (real models only)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage (best is reported)")
+    parser.add_argument('--output', default=None, help="Write the report to this JSON file")
+    parser.add_argument('--compare', default=None, help="Baseline report JSON to compare with")
+    args = parser.parse_args()
+    if args.token_cache and args.models == 'stub':
+        parser.error("--token-cache needs --models real: token ids are fed to the models themselves")
+
+    params = {
+        'patients': args.patients,
+        'median_words': args.median_words,
+        'words_sigma': args.words_sigma,
+        'keyword_density': args.keyword_density,
+        'seed': args.seed,
+        'models': args.models,
+        'batch_size': args.batch_size,
+        'batch_tokens': args.batch_tokens,
+        'token_cache': args.token_cache
+    }
+    raw_data = generate_journeys(
+        args.patients, args.median_words, args.words_sigma, args.keyword_density, seed=args.seed
+    )
+
+    runs = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        analyzer_kwargs = {
+            'batch_size': args.batch_size,
+            'batch_tokens': args.batch_tokens,
+            'token_cache_path': os.path.join(output_dir, 'token_cache') if args.token_cache else None
+        }
+        for _ in range(args.repeat):
+            runs.append(run_stages(raw_data, args.models, analyzer_kwargs, output_dir))
+
+    stages = {}
+    for stage in STAGES:
+        best = min(runs, key=lambda run: run[stage]['seconds'])[stage]
+        stages[stage] = {
+            'seconds': best['seconds'],
+            'items': best['items'],
+            'items_per_second': best['items'] / best['seconds'] if best['seconds'] else 0.0,
+            'peak_rss_mb': max(run[stage]['peak_rss_mb'] for run in runs)
+        }
+    report = {
+        'benchmark_version': BENCHMARK_VERSION,
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'params': params,
+        'stages': stages
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('benchmark_version') != BENCHMARK_VERSION or baseline.get('params') != params:
+            print(f"Warning: {args.compare} was run with a different benchmark version or parameters")
+
+    print(f"{args.patients} synthetic patients, {args.models} models, commit {report['commit']}")
+    print("items: phase texts (visualize: patients); peak RSS is the process peak up to the stage\n")
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    print(f"\nBenchmark finished in {time.perf_counter() - start:.1f}s")
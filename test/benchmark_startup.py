@@ -0,0 +1,62 @@
+"""
+Startup-time benchmark for NLPAnalyzer.
+Each stage is timed in a fresh interpreter so that import caches and already
+loaded models of one measurement do not leak into the next.
+Usage: python test/benchmark_startup.py [--repeat N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Statements timed in a fresh interpreter; setup runs untimed
+STAGES = [
+    ("import src.nlp_analyzer", "", "import src.nlp_analyzer"),
+    ("NLPAnalyzer()", "from src.nlp_analyzer import NLPAnalyzer", "NLPAnalyzer()"),
+    ("first analysis (loads models)",
+     "from src.nlp_analyzer import NLPAnalyzer\nanalyzer = NLPAnalyzer()",
+     "analyzer._analyze_single_summary({'diagnosis': 'Doctor confirmed the diagnosis'})"),
+    ("second NLPAnalyzer() + analysis (shared models)",
+     "from src.nlp_analyzer import NLPAnalyzer\n"
+     "NLPAnalyzer()._analyze_single_summary({'diagnosis': 'Doctor confirmed the diagnosis'})",
+     "NLPAnalyzer()._analyze_single_summary({'diagnosis': 'Doctor confirmed the diagnosis'})"),
+]
+
+TEMPLATE = """
+import sys, time
+sys.path.insert(0, {root!r})
+{setup}
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+
+def time_stage(setup: str, statement: str) -> float:
+    """
+    Time a statement in a fresh interpreter
+    Returns:
+        float: Elapsed seconds
+    """
+    code = TEMPLATE.format(root=ROOT, setup=setup, statement=statement)
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="NLPAnalyzer startup benchmark")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage (best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'stage':<50} {'best (s)':>10}")
+    for name, setup, statement in STAGES:
+        best = min(time_stage(setup, statement) for _ in range(args.repeat))
+        print(f"{name:<50} {best:>10.3f}")
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    print(f"\nBenchmark finished in {time.perf_counter() - start:.1f}s")
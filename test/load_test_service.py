@@ -0,0 +1,153 @@
+"""
+Load test of the inference service with a local asyncio HTTP client.
+Concurrent clients send synthetic journeys (see benchmark_pipeline.py) to
+POST /analyze over keep-alive connections and the latency distribution,
+the throughput and the service's micro-batching statistics are reported.
+Without --url the service is started in this process, on stub models by
+default so the test runs offline (--models real uses the cached weights).
+Usage: python test/load_test_service.py [--clients N] [--requests N] [--url http://host:port]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.inference_service import InferenceService
+from src.nlp_analyzer import NLPAnalyzer
+from benchmark_pipeline import generate_journeys, StubNLPAnalyzer
+
+class Client:
+    """Minimal keep-alive HTTP/1.1 JSON client"""
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method: str, path: str, payload=None) -> Tuple[int, Dict]:
+        """
+        Send one request
+        Returns:
+            tuple: (HTTP status, decoded JSON body)
+        """
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self._writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+        )
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        response = await self._reader.readexactly(int(headers['content-length']))
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, json.loads(response)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+def percentile(values: List[float], share: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+async def run_client(host: str, port: int, journeys: List[str], latencies: List[float], errors: List[int]):
+    """Send journeys one after the other, recording each latency"""
+    client = Client(host, port)
+    try:
+        for journey in journeys:
+            start = time.perf_counter()
+            status, _ = await client.request('POST', '/analyze', {'chat_summary_per_phase': journey})
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        await client.close()
+
+async def load_test(args) -> Dict:
+    """Run the load test, starting the service in-process unless a URL is given"""
+    service = None
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port
+    else:
+        analyzer_class = StubNLPAnalyzer if args.models == 'stub' else NLPAnalyzer
+        service = InferenceService(
+            analyzer_class(progress=False), max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms
+        )
+        await service.start('127.0.0.1', 0)
+        await service.warm_up()
+        host, port = '127.0.0.1', service.port
+
+    journeys = generate_journeys(args.requests, seed=args.seed)['chat_summary_per_phase'].tolist()
+    latencies, errors = [], []
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            run_client(host, port, journeys[i::args.clients], latencies, errors) for i in range(args.clients)
+        ))
+        elapsed = time.perf_counter() - start
+
+        stats_client = Client(host, port)
+        _, stats = await stats_client.request('GET', '/stats')
+        await stats_client.close()
+    finally:
+        if service is not None:
+            await service.close()
+
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'latency_ms': {
+            name: 1000 * percentile(latencies, share)
+            for name, share in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))
+        },
+        'service': stats['batcher']
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference service load test")
+    parser.add_argument('--url', default=None, help="Running service to test (default: start one in-process)")
+    parser.add_argument('--models', choices=['stub', 'real'], default='stub', help="Models of the in-process service")
+    parser.add_argument('--clients', type=int, default=16, help="Concurrent clients")
+    parser.add_argument('--requests', type=int, default=1000, help="Total journeys sent")
+    parser.add_argument('--max-batch-size', type=int, default=32, help="In-process service micro-batch size")
+    parser.add_argument('--max-wait-ms', type=float, default=10.0, help="In-process service micro-batch wait")
+    parser.add_argument('--seed', type=int, default=0, help="Journey generator seed")
+    args = parser.parse_args()
+
+    report = asyncio.run(load_test(args))
+    latency = report['latency_ms']
+    service = report['service']
+    print(f"{report['requests']} requests from {args.clients} clients in {report['seconds']:.2f}s "
+          f"({report['requests_per_second']:.1f} req/s, {report['errors']} errors)")
+    print(f"Latency: p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+          f"p99 {latency['p99']:.1f} ms, max {latency['max']:.1f} ms")
+    print(f"Micro-batches: {service['batches']} (mean size {service['mean_batch_size']:.1f}, "
+          f"largest {service['largest_batch']}), inference busy {service['busy_seconds']:.2f}s")
+
+if __name__ == "__main__":
+    main()
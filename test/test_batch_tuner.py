@@ -0,0 +1,66 @@
+import unittest
+from src.batch_tuner import token_budget_batches, padded_tokens, TokenBudgetTuner
+
+class TestBatchTuner(unittest.TestCase):
+    def test_token_budget_batches(self):
+        """Test that batches are length-sorted and fit the budget once padded"""
+        lengths = [10, 3, 50, 7, 8, 200, 4]
+        batches = list(token_budget_batches(lengths, 60, overhead=2))
+        
+        self.assertEqual(sorted(i for batch in batches for i in batch), list(range(len(lengths))))
+        self.assertEqual([lengths[i] for batch in batches for i in batch], sorted(lengths))
+        for batch in batches:
+            if len(batch) > 1:
+                self.assertLessEqual(padded_tokens([lengths[i] for i in batch], overhead=2), 60)
+        # A text over the budget is batched alone
+        self.assertIn([5], batches)
+        # Zero-shot: one sequence per label
+        self.assertEqual(list(token_budget_batches([10, 10, 10], 60, sequences_per_text=3)), [[0, 1], [2]])
+        self.assertEqual(list(token_budget_batches([], 60)), [])
+
+    def test_budget_read_per_batch(self):
+        """Test that a callable budget is re-read before each batch"""
+        budgets = iter([10, 40, 40])
+        batches = list(token_budget_batches([10] * 5, lambda: next(budgets)))
+        self.assertEqual(batches, [[0], [1, 2, 3, 4]])
+
+    def test_tuner_grows_then_stops(self):
+        """Test that the budget doubles while throughput improves, and stops at a plateau"""
+        tuner = TokenBudgetTuner(initial_tokens=100, batches_per_step=1, max_memory_mb=float('inf'))
+        tuner.observe(100, 1.0)
+        self.assertEqual(tuner.budget, 200)
+        tuner.observe(200, 1.0)
+        self.assertEqual(tuner.budget, 400)
+        # 2% faster: not worth a larger budget
+        tuner.observe(400, 400 / 204)
+        self.assertTrue(tuner.tuned)
+        self.assertEqual(tuner.budget, 400)
+        tuner.observe(400, 100.0)
+        self.assertEqual(tuner.budget, 400)
+
+    def test_tuner_rolls_back(self):
+        """Test that a slower budget is rolled back, and small calls are ignored"""
+        tuner = TokenBudgetTuner(initial_tokens=100, batches_per_step=2, max_memory_mb=float('inf'))
+        tuner.observe(100, 1.0)
+        tuner.observe(10, 100.0)
+        tuner.observe(100, 1.0)
+        self.assertEqual(tuner.budget, 200)
+        tuner.observe(200, 4.0)
+        tuner.observe(200, 4.0)
+        self.assertTrue(tuner.tuned)
+        self.assertEqual(tuner.budget, 100)
+        self.assertEqual(tuner.history, [(100, 100.0), (200, 50.0)])
+
+    def test_tuner_limits(self):
+        """Test the budget ceiling and fixed budgets"""
+        tuner = TokenBudgetTuner(initial_tokens=100, max_tokens=150, batches_per_step=1)
+        tuner.observe(100, 1.0)
+        self.assertTrue(tuner.tuned)
+        self.assertEqual(tuner.budget, 100)
+        
+        fixed = TokenBudgetTuner(fixed_tokens=300, batches_per_step=1)
+        fixed.observe(300, 1.0)
+        self.assertEqual((fixed.budget, fixed.tuned, fixed.history), (300, True, []))
+
+if __name__ == '__main__':
+    unittest.main()
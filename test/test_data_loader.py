@@ -1,5 +1,10 @@
 import unittest
+import json
+import os
+import tempfile
 import pandas as pd
+from unittest import mock
+import src.data_loader as data_loader
 from src.data_loader import DataLoader
 
 class TestDataLoader(unittest.TestCase):
@@ -28,6 +33,51 @@ class TestDataLoader(unittest.TestCase):
         summary = cleaned_data.iloc[1]['chat_summary_per_phase']
         self.assertNotIn('early_symptoms_phase', summary)  # Null values removed
         
+    def test_streaming_chunks_all_files(self):
+        """Test chunked streaming across CSV and JSON Lines files"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            summary = json.dumps({'diagnosis': {'text': 'x', 'tips': 'remove me'}})
+            pd.DataFrame({'patient_id': range(5), 'chat_summary_per_phase': [summary] * 5}).to_csv(
+                os.path.join(tmp_dir, 'a.csv'), index=False
+            )
+            pd.DataFrame({'patient_id': range(5, 8), 'chat_summary_per_phase': [summary] * 3}).to_json(
+                os.path.join(tmp_dir, 'b.jsonl'), orient='records', lines=True
+            )
+            
+            chunks = list(DataLoader(tmp_dir).iter_clean_chunks(chunksize=2))
+        
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1, 2, 1])
+        self.assertEqual(sum((list(chunk['patient_id']) for chunk in chunks), []), list(range(8)))
+        for chunk in chunks:
+            for cleaned in chunk['chat_summary_per_phase']:
+                self.assertEqual(cleaned, {'diagnosis': {'text': 'x'}})
+
+    def test_bulk_parse_matches_stdlib(self):
+        """Test that bulk decoding gives the same dictionaries as json.loads, in and out of process"""
+        raw = [
+            json.dumps({'diagnosis': {'text': 'é "quoted"', 'tips': 't', 'documents': ['d']}, 'treatment': 'text'}),
+            'not json',
+            None,
+            '',
+            json.dumps({'ongoing_care': {'documents': 1, 'score': 1.5e300}})
+        ] * 3
+        expected = []
+        for value in raw:
+            try:
+                summary = json.loads(value) if isinstance(value, str) else {}
+            except json.JSONDecodeError:
+                summary = {}
+            for phase_data in summary.values():
+                if isinstance(phase_data, dict):
+                    phase_data.pop('tips', None)
+                    phase_data.pop('documents', None)
+            expected.append(summary)
+        
+        df = pd.DataFrame({'chat_summary_per_phase': raw})
+        self.assertEqual(self.loader.clean_data(df)['chat_summary_per_phase'].tolist(), expected)
+        with mock.patch.object(data_loader, 'PARSE_BLOCK_SIZE', 4):
+            self.assertEqual(self.loader.clean_data(df, n_jobs=2)['chat_summary_per_phase'].tolist(), expected)
+
     def test_validate_phase_names(self):
         """Test phase name validation"""
         valid_phases = {'early_symptoms_phase', 'diagnosis'}
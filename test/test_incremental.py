@@ -0,0 +1,65 @@
+import unittest
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from src.incremental import IncrementalStore, analyze_incrementally
+from src.metrics_calculator import MetricsCalculator
+
+class CountingAnalyzer:
+    """Minimal analyzer recording which summaries were analyzed"""
+    def __init__(self):
+        self.analyzed = []
+
+    def analysis_signature(self):
+        return {'model': 'counting'}
+
+    def analyze_patient_summaries(self, summaries):
+        self.analyzed.extend(summaries)
+        return [{'sentiment': {'symptom_onset': {'label': 'POSITIVE', 'score': 0.9}}, 'topics': {}}
+                for _ in summaries]
+
+    def aggregate_patient_results(self, patient_results):
+        return {'sentiment_per_phase': {'symptom_onset': [r['sentiment']['symptom_onset'] for r in patient_results]},
+                'topics_per_phase': {}}
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = IncrementalStore(os.path.join(self.tmp_dir.name, 'patient_results.json'))
+        self.metrics_calc = MetricsCalculator()
+        self.summaries = [
+            {'early_symptoms_phase': 'Patient reported severe headaches', 'diagnosis': 'Doctor decided on tests'},
+            {'treatment': 'Started medication with regular follow-up'}
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_fingerprint_ignores_key_order(self):
+        """Test that fingerprints only depend on content"""
+        reordered = dict(reversed(list(self.summaries[0].items())))
+        self.assertEqual(IncrementalStore.fingerprint(self.summaries[0]), IncrementalStore.fingerprint(reordered))
+        self.assertNotEqual(IncrementalStore.fingerprint(self.summaries[0]), IncrementalStore.fingerprint(self.summaries[1]))
+
+    def test_only_changed_patients_are_analyzed(self):
+        """Test that unchanged patients are reused from the previous run"""
+        analyzer = CountingAnalyzer()
+        analyze_incrementally(pd.DataFrame({'chat_summary_per_phase': self.summaries}), analyzer, self.metrics_calc, self.store)
+        self.assertEqual(len(analyzer.analyzed), 2)
+
+        changed = [self.summaries[0], {'treatment': 'Switched medication'}]
+        analyzer = CountingAnalyzer()
+        text_analysis, _ = analyze_incrementally(pd.DataFrame({'chat_summary_per_phase': changed}), analyzer, self.metrics_calc, self.store)
+        self.assertEqual(analyzer.analyzed, [{'treatment': 'Switched medication'}])
+        self.assertEqual(len(text_analysis['sentiment_per_phase']['symptom_onset']), 2)
+
+    def test_completeness_matches_full_run(self):
+        """Test that re-aggregated completeness equals a full recompute"""
+        data = pd.DataFrame({'chat_summary_per_phase': self.summaries})
+        analyze_incrementally(data, CountingAnalyzer(), self.metrics_calc, self.store)
+        _, completeness = analyze_incrementally(data, CountingAnalyzer(), self.metrics_calc, self.store)
+
+        self.assertEqual(completeness, self.metrics_calc.calculate_phase_completeness(data))
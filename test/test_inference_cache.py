@@ -0,0 +1,62 @@
+import unittest
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.inference_cache import InferenceCache
+
+class TestInferenceCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = InferenceCache(os.path.join(self.tmp_dir.name, 'cache.sqlite'), max_entries=3)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_key_depends_on_model_identity(self):
+        """Test that the same text under another model or revision gets another key"""
+        key = InferenceCache.make_key('text', 'model', '714eb0f')
+        self.assertEqual(key, InferenceCache.make_key('text', 'model', '714eb0f'))
+        self.assertNotEqual(key, InferenceCache.make_key('text', 'model', 'd7645e1'))
+        self.assertNotEqual(key, InferenceCache.make_key('other text', 'model', '714eb0f'))
+
+    def test_round_trip_and_stats(self):
+        """Test storing, retrieving and hit/miss counting"""
+        self.cache.set_many({'a': {'label': 'POSITIVE', 'score': 0.9}})
+        found = self.cache.get_many(['a', 'b'])
+
+        self.assertEqual(found, {'a': {'label': 'POSITIVE', 'score': 0.9}})
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    def test_contains_many(self):
+        """Test membership checks, which count no lookup and keep the LRU order"""
+        for key in ['a', 'b', 'c']:
+            self.cache.set_many({key: key})
+        self.assertEqual(self.cache.contains_many(['a', 'x', 'a']), {'a'})
+        self.assertEqual(self.cache.stats()['hits'], 0)
+        
+        self.cache.set_many({'d': 'd'})
+        self.assertEqual(self.cache.contains_many(['a', 'b']), {'b'})
+
+    def test_persistence(self):
+        """Test that entries survive reopening the cache"""
+        self.cache.set_many({'a': [1, 2, 3]})
+        self.cache.close()
+
+        self.cache = InferenceCache(os.path.join(self.tmp_dir.name, 'cache.sqlite'), max_entries=3)
+        self.assertEqual(self.cache.get_many(['a']), {'a': [1, 2, 3]})
+
+    def test_size_bounded_eviction(self):
+        """Test that the least recently used entries are evicted"""
+        for key in ['a', 'b', 'c']:
+            self.cache.set_many({key: key})
+        self.cache.get_many(['a'])
+        self.cache.set_many({'d': 'd'})
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(set(self.cache.get_many(['a', 'b', 'c', 'd'])), {'a', 'c', 'd'})
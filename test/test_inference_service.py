@@ -0,0 +1,118 @@
+import unittest
+import asyncio
+import json
+from unittest import mock
+from src.inference_service import MicroBatcher, InferenceService
+
+class TestMicroBatcher(unittest.IsolatedAsyncioTestCase):
+    async def test_coalesces_concurrent_requests(self):
+        """Test that concurrent submissions are grouped up to max_batch_size, results in order"""
+        batches = []
+        def process_batch(items):
+            batches.append(list(items))
+            return [item * 10 for item in items]
+        
+        batcher = MicroBatcher(process_batch, max_batch_size=4, max_wait_ms=50)
+        try:
+            results = await asyncio.gather(*(batcher.submit(i) for i in range(6)))
+        finally:
+            await batcher.close()
+        
+        self.assertEqual(results, [i * 10 for i in range(6)])
+        self.assertEqual([len(batch) for batch in batches], [4, 2])
+        self.assertEqual(batcher.stats['requests'], 6)
+        self.assertEqual(batcher.stats['largest_batch'], 4)
+
+    async def test_batch_failure(self):
+        """Test that a failing batch fails all its requests without stopping the batcher"""
+        def process_batch(items):
+            if 'bad' in items:
+                raise RuntimeError("model failure")
+            return items
+        
+        batcher = MicroBatcher(process_batch, max_batch_size=8, max_wait_ms=20)
+        try:
+            results = await asyncio.gather(batcher.submit('good'), batcher.submit('bad'), return_exceptions=True)
+            self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+            self.assertEqual(await batcher.submit('good'), 'good')
+        finally:
+            await batcher.close()
+
+
+class TestInferenceService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.service = InferenceService(max_batch_size=8, max_wait_ms=20)
+        await self.service.start('127.0.0.1', 0)
+
+    async def asyncTearDown(self):
+        await self.service.close()
+
+    async def request(self, method: str, path: str, body: bytes = b''):
+        """Send one request on a new connection, returning (status, JSON payload)"""
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.service.port)
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, payload = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(payload)
+
+    async def test_analyze_requests(self):
+        """Test that concurrent journeys get the same results as a direct analysis"""
+        summaries = [
+            {'diagnosis': 'Doctor confirmed diagnosis, patient considered options', 'tips': {'tips': 'x'}},
+            {'treatment': 'Started new medication'}
+        ]
+        bodies = [
+            json.dumps({'chat_summary_per_phase': summaries[0]}).encode(),
+            json.dumps(json.dumps(summaries[1])).encode()
+        ]
+        responses = await asyncio.gather(*(self.request('POST', '/analyze', body) for body in bodies))
+        expected = json.loads(json.dumps(self.service.analyze_batch(summaries)))
+        
+        self.assertEqual([status for status, _ in responses], [200, 200])
+        for (_, result), expected_result in zip(responses, expected):
+            self.assertEqual(set(result), {'sentiment', 'topics', 'completeness'})
+            for phase, sentiment in expected_result['sentiment'].items():
+                self.assertEqual(result['sentiment'][phase]['label'], sentiment['label'])
+                self.assertAlmostEqual(result['sentiment'][phase]['score'], sentiment['score'], places=4)
+            self.assertEqual(result['completeness'], expected_result['completeness'])
+        self.assertEqual(self.service.stats()['batcher']['requests'], 2)
+
+    async def test_errors_and_status(self):
+        """Test health, unknown paths and invalid bodies"""
+        self.assertEqual(await self.request('GET', '/health'), (200, {'status': 'loading'}))
+        self.assertEqual((await self.request('GET', '/missing'))[0], 404)
+        self.assertEqual((await self.request('GET', '/analyze'))[0], 405)
+        self.assertEqual((await self.request('POST', '/analyze', b'not json'))[0], 400)
+        self.assertEqual((await self.request('POST', '/analyze', b'[1, 2]'))[0], 400)
+        self.assertEqual((await self.request('POST', '/analyze', b'"abc"'))[0], 400)
+        self.assertEqual((await self.request('POST', '/analyze', b'{"chat_summary_per_phase": "[1]"}'))[0], 400)
+        status, stats = await self.request('GET', '/stats')
+        self.assertEqual((status, stats['batcher']['requests']), (200, 0))
+
+    async def test_analysis_errors(self):
+        """Test that a failing analysis gets a logged 500, even when it raises ValueError"""
+        failure = ValueError("shape mismatch")
+        with mock.patch.object(self.service.analyzer, 'analyze_patient_summaries', side_effect=failure):
+            with self.assertLogs('patient_journey_analysis', level='ERROR') as logs:
+                status, payload = await self.request('POST', '/analyze', b'{"diagnosis": "Doctor confirmed"}')
+        
+        self.assertEqual(status, 500)
+        self.assertIn('shape mismatch', payload['error'])
+        self.assertIn('Analysis of a journey failed', logs.output[0])
+
+    async def test_malformed_requests(self):
+        """Test that unparseable request lines and Content-Length values get a 400"""
+        for raw in (b"GARBAGE\r\n\r\n", b"POST /analyze HTTP/1.1\r\nContent-Length: abc\r\n\r\n"):
+            reader, writer = await asyncio.open_connection('127.0.0.1', self.service.port)
+            writer.write(raw)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            self.assertTrue(response.startswith(b'HTTP/1.1 400 '), response)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import json
+import logging
+import os
+import tempfile
+from src.utils.instrumentation import Instrumentation
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.instrumentation = Instrumentation(logging.getLogger('test_instrumentation'))
+
+    def test_stage_timings(self):
+        """Test that repeated stages are summed and still recorded when they raise"""
+        for _ in range(3):
+            with self.instrumentation.stage('nlp_analysis'):
+                pass
+        with self.assertRaises(ValueError):
+            with self.instrumentation.stage('completeness'):
+                raise ValueError("failed stage")
+        
+        stages = self.instrumentation.to_dict()['stages']
+        self.assertEqual(list(stages), ['nlp_analysis', 'completeness'])
+        self.assertEqual(stages['nlp_analysis']['calls'], 3)
+        self.assertGreaterEqual(stages['nlp_analysis']['seconds'], 0.0)
+        self.assertEqual(stages['completeness']['calls'], 1)
+
+    def test_save_metrics_json(self):
+        """Test the saved metrics JSON"""
+        with self.instrumentation.stage('load_data'):
+            pass
+        self.instrumentation.record('nlp', {'fallback_stats': {'sentiment': 2}})
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'outputs', 'run_metrics.json')
+            self.instrumentation.save(path)
+            with open(path) as f:
+                metrics = json.load(f)
+        
+        self.assertEqual(metrics['nlp'], {'fallback_stats': {'sentiment': 2}})
+        self.assertIn('load_data', metrics['stages'])
+        self.assertGreater(metrics['total_seconds'], 0.0)
+        self.assertGreater(metrics['peak_rss_mb'], 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
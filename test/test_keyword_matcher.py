@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.keyword_matcher import KeywordMatcher
+from src.metrics_calculator import KEYWORD_MATCHER, PHASE_KEYWORDS, MEDICAL_TERMS
+
+class TestKeywordMatcher(unittest.TestCase):
+    def setUp(self):
+        self.matcher = KeywordMatcher({
+            'decision': ['decide', 'Option', 'opt'],
+            'reevaluation': ['follow-up', 'review'],
+            'medical_terms': ['doctor', 'option']
+        })
+
+    def test_find_is_case_insensitive(self):
+        """Test that keywords are found regardless of case, including nested ones"""
+        hits = self.matcher.find("The DOCTOR discussed every OPTION")
+        self.assertEqual(hits, frozenset({'doctor', 'option', 'opt'}))
+        self.assertEqual(self.matcher.find(''), frozenset())
+
+    def test_group_queries(self):
+        """Test that one hit set answers queries for every group"""
+        hits = self.matcher.find("Doctor asked for a follow-up to review the option")
+        self.assertTrue(self.matcher.in_group(hits, 'decision'))
+        self.assertTrue(self.matcher.in_group(hits, 'reevaluation'))
+        self.assertEqual(self.matcher.count(hits, 'medical_terms'), 2)
+        self.assertEqual(self.matcher.count(hits, 'unknown'), 0)
+
+    def test_restricted_scan(self):
+        """Test that scanning a subset of groups only reports their keywords"""
+        hits = self.matcher.find("Doctor asked for a follow-up", ('reevaluation',))
+        self.assertEqual(hits, frozenset({'follow-up'}))
+        self.assertTrue(self.matcher.matches("Doctor asked for a follow-up", 'reevaluation'))
+        self.assertFalse(self.matcher.matches("Doctor asked for a follow-up", 'decision'))
+
+    def test_matches_substring_semantics(self):
+        """Test that the shared matcher agrees with plain substring checks"""
+        texts = [
+            "Patient decided to proceed with the treatment option",
+            "Regular follow up and monitoring of symptoms",
+            "Nothing relevant here"
+        ]
+        groups = {**PHASE_KEYWORDS, 'medical_terms': MEDICAL_TERMS}
+        for text in texts:
+            for group, keywords in groups.items():
+                expected = any(keyword.lower() in text.lower() for keyword in keywords)
+                self.assertEqual(KEYWORD_MATCHER.matches(text, group), expected)
+
+    def test_series_queries_match_per_text(self):
+        """Test that the columnar queries agree with the per-text ones, non-string values included"""
+        texts = pd.Series([
+            "The DOCTOR discussed every OPTION",
+            "Doctor asked for a follow-up to review (a+b) the option",
+            "",
+            None,
+            {'text': 'doctor'}
+        ], dtype=object)
+        for group in ('decision', 'reevaluation', 'medical_terms', 'unknown'):
+            expected_matches = [isinstance(text, str) and self.matcher.matches(text, group) for text in texts]
+            expected_counts = [
+                self.matcher.count(self.matcher.find(text), group) if isinstance(text, str) else 0 for text in texts
+            ]
+            self.assertEqual(self.matcher.contains_series(texts, group).tolist(), expected_matches)
+            self.assertEqual(self.matcher.count_series(texts, group).tolist(), expected_counts)
@@ -1,4 +1,5 @@
 import unittest
+import pandas as pd
 from src.metrics_calculator import (
     MetricsCalculator, 
     PHASE_MAPPING, 
@@ -120,4 +121,23 @@ class TestMetricsCalculator(unittest.TestCase):
         
         high_score = self.calculator._calculate_single_patient_completeness(summaries['high_quality'])
         low_score = self.calculator._calculate_single_patient_completeness(summaries['low_quality'])
-        self.assertGreater(high_score['overall'], low_score['overall'])
\ No newline at end of file
+        self.assertGreater(high_score['overall'], low_score['overall'])
+
+    def test_columnar_matches_per_patient(self):
+        """Test that columnar scoring reproduces the per-patient scores exactly"""
+        summaries = [
+            self.sample_chat_summary,
+            {},
+            {'diagnosis': None, 'treatment': '   ', 'ongoing_care': {'text': 'nested'}},
+            {'referral_pathway': '  Referred by the DOCTOR for symptoms  ', 'treatment': 'Follow up review'},
+            {'diagnosis': 'Long diagnosis text with a decision ' * 30},
+            {'treatment': 'Symptoms, DIAGNOSIS, Treatment, doctor and Medication: REASSESS (a.b*c)'}
+        ]
+        patient_data = pd.DataFrame({'chat_summary_per_phase': summaries})
+        
+        expected = [self.calculator._calculate_single_patient_completeness(summary) for summary in summaries]
+        self.assertEqual(self.calculator.calculate_patient_completeness(patient_data), expected)
+        self.assertEqual(
+            self.calculator.calculate_phase_completeness(patient_data),
+            self.calculator.aggregate_completeness(expected)
+        )
@@ -0,0 +1,66 @@
+import unittest
+import importlib.util
+import subprocess
+import tempfile
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from src.nlp_analyzer import NLPAnalyzer, SENTIMENT_MODEL, SENTIMENT_REVISION
+from src.model_registry import get_pipeline, loaded_pipelines
+from src.export_models import export_models, check_parity, PINNED_MODELS
+
+class TestModelRegistry(unittest.TestCase):
+    def test_construction_is_lazy(self):
+        """Test that importing and building an analyzer neither imports transformers nor loads models"""
+        code = (
+            "import sys\n"
+            f"sys.path.insert(0, {ROOT!r})\n"
+            "from src.nlp_analyzer import NLPAnalyzer\n"
+            "from src.model_registry import loaded_pipelines\n"
+            "analyzer = NLPAnalyzer(topic_backend='nli')\n"
+            "analyzer._extract_phase_content('Patient decided to proceed', 'decision')\n"
+            "print('transformers' in sys.modules, 'torch' in sys.modules, len(loaded_pipelines()))\n"
+        )
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.split(), ['False', 'False', '0'])
+
+    def test_analyzers_share_models(self):
+        """Test that every analyzer of the process uses the same pipeline objects"""
+        first = NLPAnalyzer()
+        second = NLPAnalyzer(batch_size=4)
+        self.assertIs(first.sentiment_analyzer, second.sentiment_analyzer)
+        self.assertIs(first.zero_shot_classifier, second.zero_shot_classifier)
+        self.assertIs(first.sentiment_analyzer, get_pipeline("sentiment-analysis", SENTIMENT_MODEL, SENTIMENT_REVISION))
+        self.assertIn(("sentiment-analysis", SENTIMENT_MODEL, SENTIMENT_REVISION, "torch"), loaded_pipelines())
+
+    def test_unknown_topic_backend(self):
+        """Test that unknown topic backends are rejected when the analyzer is built"""
+        with self.assertRaises(ValueError):
+            NLPAnalyzer(topic_backend='unknown')
+
+    def test_unknown_inference_backend(self):
+        """Test that unknown inference backends are rejected"""
+        with self.assertRaises(ValueError):
+            NLPAnalyzer(inference_backend='unknown')
+
+    def test_quantized_backend_parity(self):
+        """Test that the int8 torch backend is compared with full precision on every model"""
+        report = check_parity('torch-int8')
+        self.assertEqual(set(report), {task for task, _, _ in PINNED_MODELS})
+        for result in report.values():
+            self.assertGreaterEqual(result['label_agreement'], 0.9)
+            self.assertLess(result['max_score_diff'], 0.25)
+
+    @unittest.skipUnless(importlib.util.find_spec('optimum'), "optimum-onnx is not installed")
+    def test_onnx_export_parity(self):
+        """Test that the full-precision ONNX export reproduces the PyTorch scores"""
+        with tempfile.TemporaryDirectory() as export_dir:
+            models = PINNED_MODELS[:1]
+            export_models(export_dir, models=models, quantize=False)
+            report = check_parity('onnx', export_dir, models=models)
+        
+        for result in report.values():
+            self.assertEqual(result['label_agreement'], 1.0)
+            self.assertLess(result['max_score_diff'], 1e-4)
@@ -1,10 +1,13 @@
 import unittest
 import sys
 import os
+import tempfile
+from unittest import mock
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.nlp_analyzer import NLPAnalyzer
 from src.metrics_calculator import EXPECTED_PHASES
+from src.text_chunker import TextChunker
 import pandas as pd
 
 class TestNLPAnalyzer(unittest.TestCase):
@@ -60,6 +63,199 @@ class TestNLPAnalyzer(unittest.TestCase):
             len(sample_series)
         )
 
+    def test_batched_matches_single_summary(self):
+        """Test that cross-patient batching returns the same results as per-patient analysis"""
+        summaries = [self.sample_summary, {'diagnosis': 'Short text'}, {}]
+        batched = self.analyzer.analyze_patient_summaries(summaries, batch_size=2)
+        
+        self.assertEqual(len(batched), len(summaries))
+        for summary, batched_result in zip(summaries, batched):
+            single_result = self.analyzer._analyze_single_summary(summary)
+            for phase in EXPECTED_PHASES:
+                self.assertEqual(batched_result['sentiment'][phase]['label'], single_result['sentiment'][phase]['label'])
+                self.assertAlmostEqual(batched_result['sentiment'][phase]['score'], single_result['sentiment'][phase]['score'], places=4)
+                batched_topics = dict(zip(batched_result['topics'][phase]['labels'], batched_result['topics'][phase]['scores']))
+                single_topics = dict(zip(single_result['topics'][phase]['labels'], single_result['topics'][phase]['scores']))
+                self.assertEqual(set(batched_topics), set(single_topics))
+                for label, score in single_topics.items():
+                    self.assertAlmostEqual(batched_topics[label], score, places=4)
+
+    def test_phase_results_match_patient_results(self):
+        """Test that filling the arrays directly gives the aggregated per-patient results"""
+        summaries = [self.sample_summary, {'diagnosis': 'Short text'}, {}, None, {'treatment': 'Follow up review, new medication'}]
+        # Fixed batches: both runs pad every text the same way
+        expected = self.analyzer.aggregate_patient_results(self.analyzer.analyze_patient_summaries(summaries, batch_size=2))
+        fallbacks = dict(self.analyzer.fallback_stats)
+        results = self.analyzer.analyze_phase_results(summaries, batch_size=2)
+        
+        self.assertEqual(results.to_dict(), expected.to_dict())
+        self.assertEqual(results.sentiment_scores.tolist(), expected.sentiment_scores.tolist())
+        # Fallback values are counted as on the per-patient path
+        self.assertEqual(self.analyzer.fallback_stats, {key: 2 * count for key, count in fallbacks.items()})
+        self.assertEqual(self.analyzer.analyze_phase_results([]).n_patients, 0)
+
+    def test_deduplicates_repeated_texts(self):
+        """Test that repeated phase texts are inferred once and fanned back out"""
+        summaries = [
+            {'diagnosis': 'No information provided'},
+            {'diagnosis': '  No information   provided '},
+            {'diagnosis': 'Doctor confirmed diagnosis'}
+        ]
+        inferred = []
+        run_sentiment = self.analyzer._run_sentiment
+        self.analyzer._run_sentiment = lambda texts, batch_size: inferred.extend(texts) or run_sentiment(texts, batch_size)
+        
+        results = self.analyzer.analyze_patient_summaries(summaries)
+        
+        self.assertEqual(sorted(inferred), ['Doctor confirmed diagnosis', 'No information provided'])
+        self.assertEqual(self.analyzer.dedup_stats, {'texts': 3, 'unique': 2})
+        self.assertEqual(results[0]['sentiment']['primary_diagnostic'], results[1]['sentiment']['primary_diagnostic'])
+        self.assertEqual(results[0]['topics']['primary_diagnostic'], results[1]['topics']['primary_diagnostic'])
+
+    def test_long_text_chunking(self):
+        """Test that texts longer than the model input are scored in windows instead of falling back"""
+        long_text = "Doctor confirmed diagnosis after many tests and visits. " * 200
+        results = self.analyzer.analyze_patient_summaries([{'diagnosis': long_text}])
+        
+        self.assertIsNot(results[0]['sentiment']['primary_diagnostic'], self.analyzer.fallback_sentiment)
+        self.assertIsNot(results[0]['topics']['primary_diagnostic'], self.analyzer.fallback_topics)
+        self.assertEqual(set(results[0]['topics']['primary_diagnostic']['labels']), set(self.analyzer.topics))
+        self.assertEqual(self.analyzer.chunk_stats['sentiment_texts'], 1)
+        self.assertGreater(self.analyzer.chunk_stats['sentiment_windows'], 1)
+        self.assertEqual(self.analyzer.chunk_stats['topics_texts'], 1)
+
+    def test_long_text_windows_from_cached_ids(self):
+        """Test that long texts are split from their cached token ids, without tokenizing their windows"""
+        summaries = [{'diagnosis': "Doctor confirmed diagnosis after many tests and visits. " * 200, 'treatment': 'Short text'}]
+        offsets = mock.patch.object(TextChunker, '_offsets', autospec=True, side_effect=TextChunker._offsets)
+        with tempfile.TemporaryDirectory() as tmp_dir, offsets as offsets_calls:
+            analyzer = NLPAnalyzer(token_cache_path=os.path.join(tmp_dir, 'token_cache'), progress=False)
+            self.assertEqual(analyzer.pretokenize(summaries), 2 * 2)
+            misses = analyzer.token_cache.misses
+            results = analyzer.analyze_patient_summaries(summaries)
+            analyzer.close()
+        
+        # No window went through the token cache, and only the long text got offsets, once per model
+        self.assertEqual(analyzer.token_cache.misses, misses)
+        self.assertEqual(offsets_calls.call_count, 2)
+        self.assertGreater(analyzer.chunk_stats['sentiment_windows'], 1)
+        self.assertIsNot(results[0]['sentiment']['primary_diagnostic'], analyzer.fallback_sentiment)
+        self.assertIsNot(results[0]['topics']['primary_diagnostic'], analyzer.fallback_topics)
+
+    def test_keyword_derived_phases(self):
+        """Test that decision and reevaluation are analyzed on their keyword sentences, sharing identical spans"""
+        treatment = 'Started new medication. Follow-up visit planned next month.'
+        summaries = [self.sample_summary, {'diagnosis': 'Short text', 'treatment': treatment}]
+        
+        for scope, extra_texts in (('sentences', ['Follow-up visit planned next month.']), ('text', [])):
+            analyzer = NLPAnalyzer(derived_phase_scope=scope)
+            inferred = []
+            run_sentiment = analyzer._run_sentiment
+            analyzer._run_sentiment = lambda texts, batch_size: inferred.extend(texts) or run_sentiment(texts, batch_size)
+            
+            results = analyzer.analyze_patient_summaries(summaries)
+            
+            # Single-sentence texts: the derived phase shares the parent's results
+            self.assertEqual(sorted(inferred), sorted([*self.sample_summary.values(), 'Short text', treatment, *extra_texts]))
+            self.assertIs(results[0]['sentiment']['decision'], results[0]['sentiment']['primary_diagnostic'])
+            self.assertIs(results[0]['topics']['decision'], results[0]['topics']['primary_diagnostic'])
+            self.assertIs(results[0]['sentiment']['reevaluation'], results[0]['sentiment']['new_treatment'])
+            self.assertIs(results[1]['sentiment']['decision'], analyzer.fallback_sentiment)
+            self.assertIsNot(results[1]['sentiment']['reevaluation'], analyzer.fallback_sentiment)
+            self.assertEqual(analyzer.derived_phase_stats, {'decision': 1, 'reevaluation': 2})
+            # 5 phase texts and 3 derived phase items
+            self.assertEqual(analyzer.dedup_stats, {'texts': 8, 'unique': 5 + len(extra_texts)})
+        
+        self.assertEqual(results[1]['topics']['reevaluation'], results[1]['topics']['new_treatment'])
+        with self.assertRaises(ValueError):
+            NLPAnalyzer(derived_phase_scope='paragraphs')
+
+    def test_dedup_stats_count_derived_spans(self):
+        """Test that a derived phase span is counted among the texts it adds to the unique ones"""
+        analyzer = NLPAnalyzer()
+        analyzer.analyze_patient_summaries([{'diagnosis': 'Doctor confirmed it. We decided to wait.'}])
+        self.assertEqual(analyzer.dedup_stats, {'texts': 2, 'unique': 2})
+
+    def test_inference_metrics(self):
+        """Test batch, token and fallback counters"""
+        self.analyzer.analyze_patient_summaries([self.sample_summary, {}], batch_size=2)
+        metrics = self.analyzer.metrics()
+        
+        # 3 analyzed phases plus decision and reevaluation, out of 2 patients x all expected phases
+        fallbacks = 2 * len(EXPECTED_PHASES) - 5
+        self.assertEqual(metrics['fallback_stats'], {'sentiment': fallbacks, 'topics': fallbacks, 'sentiment_failed': 0, 'topics_failed': 0})
+        for kind in ('sentiment', 'topics'):
+            self.assertEqual(metrics['inference_stats'][f'{kind}_texts'], 3)
+            self.assertEqual(metrics['inference_stats'][f'{kind}_batches'], 2)
+            self.assertGreater(metrics['inference_stats'][f'{kind}_tokens'], 3)
+            self.assertGreater(metrics['models'][kind]['mean_batch_latency_ms'], 0.0)
+        self.assertIsNone(metrics['cache'])
+
+    def test_token_budget_batches(self):
+        """Test that token budget batching matches fixed-size batching and reports its budget"""
+        summaries = [self.sample_summary, {'diagnosis': 'Short text'}, {'treatment': 'Started new medication'}]
+        counted = self.analyzer.analyze_patient_summaries(summaries, batch_size=2)
+        analyzer = NLPAnalyzer(batch_tokens=64)
+        budgeted = analyzer.analyze_patient_summaries(summaries)
+        
+        for counted_result, budgeted_result in zip(counted, budgeted):
+            for phase in EXPECTED_PHASES:
+                self.assertEqual(budgeted_result['sentiment'][phase]['label'], counted_result['sentiment'][phase]['label'])
+                self.assertAlmostEqual(budgeted_result['sentiment'][phase]['score'], counted_result['sentiment'][phase]['score'], places=4)
+        metrics = analyzer.metrics()
+        self.assertEqual(metrics['batch_tokens']['sentiment'], {'budget': 64, 'tuned': True})
+        # Every text is scored against all topics: a 64-token budget fits one text per call
+        self.assertEqual(metrics['inference_stats']['topics_batches'], metrics['inference_stats']['topics_texts'])
+        with self.assertRaises(ValueError):
+            NLPAnalyzer(batch_tokens=0)
+    
+    def test_token_cache(self):
+        """Test that feeding the models cached token ids matches the pipelines"""
+        summaries = [self.sample_summary, {'diagnosis': 'Short text'}, {'treatment': 'Started new medication'}]
+        reference = self.analyzer.analyze_patient_summaries(summaries)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for run in range(2):
+                analyzer = NLPAnalyzer(token_cache_path=os.path.join(tmp_dir, 'token_cache'))
+                # 5 distinct texts, for both tokenizers, the first time only
+                self.assertEqual(analyzer.pretokenize(summaries), 0 if run else 2 * 5)
+                cached = analyzer.analyze_patient_summaries(summaries)
+                analyzer.close()
+                
+                for reference_result, cached_result in zip(reference, cached):
+                    for phase in EXPECTED_PHASES:
+                        self.assertEqual(cached_result['sentiment'][phase]['label'], reference_result['sentiment'][phase]['label'])
+                        self.assertAlmostEqual(cached_result['sentiment'][phase]['score'], reference_result['sentiment'][phase]['score'], places=4)
+                        reference_topics = dict(zip(reference_result['topics'][phase]['labels'], reference_result['topics'][phase]['scores']))
+                        cached_topics = dict(zip(cached_result['topics'][phase]['labels'], cached_result['topics'][phase]['scores']))
+                        for label, score in reference_topics.items():
+                            self.assertAlmostEqual(cached_topics[label], score, places=4)
+            self.assertEqual(analyzer.metrics()['token_cache']['misses'], 0)
+    
+    def test_sharded_matches_in_process(self):
+        """Test that the multi-process mode returns per-patient results in input order"""
+        summaries = [self.sample_summary, {'diagnosis': 'Short text'}, {}, {'treatment': 'Started new medication'}]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sharded_analyzer = NLPAnalyzer(
+                n_workers=2, torch_threads=1, cache_path=os.path.join(tmp_dir, 'cache.sqlite')
+            )
+            try:
+                sharded = sharded_analyzer.analyze_patient_summaries(summaries)
+                # Inference cache lookups of the workers: 5 distinct texts, for both models
+                cache_stats = sharded_analyzer.metrics()['cache']
+                # Workers can also return arrays, stacked in shard order
+                sharded_arrays = sharded_analyzer.analyze_phase_results(summaries)
+            finally:
+                sharded_analyzer.close()
+        self.assertEqual((cache_stats['hits'], cache_stats['misses']), (0, 10))
+        in_process = self.analyzer.analyze_patient_summaries(summaries)
+        
+        self.assertEqual(len(sharded), len(summaries))
+        self.assertEqual(sharded_arrays.to_dict(), sharded_analyzer.aggregate_patient_results(sharded).to_dict())
+        for sharded_result, in_process_result in zip(sharded, in_process):
+            for phase in EXPECTED_PHASES:
+                self.assertEqual(sharded_result['sentiment'][phase]['label'], in_process_result['sentiment'][phase]['label'])
+                self.assertAlmostEqual(sharded_result['sentiment'][phase]['score'], in_process_result['sentiment'][phase]['score'], places=4)
+
     def test_error_handling(self):
         """Test error handling in analysis"""
         # Test with invalid input
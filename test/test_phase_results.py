@@ -0,0 +1,65 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.phase_results import PhaseResults
+
+TOPICS = ['symptoms', 'diagnosis', 'treatment']
+
+def topic_result(scores):
+    """Zero-shot result with labels sorted by decreasing score"""
+    order = sorted(range(len(TOPICS)), key=lambda j: -scores[j])
+    return {'sequence': 'text', 'labels': [TOPICS[j] for j in order], 'scores': [scores[j] for j in order]}
+
+class TestPhaseResults(unittest.TestCase):
+    def setUp(self):
+        fallback_topics = {'labels': TOPICS, 'scores': [0.0] * len(TOPICS)}
+        self.patient_results = [
+            {
+                'sentiment': {'symptom_onset': {'label': 'NEGATIVE', 'score': 0.9},
+                              'primary_diagnostic': {'label': 'NEUTRAL', 'score': 0.5}},
+                'topics': {'symptom_onset': topic_result([0.75, 0.25, 0.5]),
+                           'primary_diagnostic': fallback_topics}
+            },
+            {
+                'sentiment': {'symptom_onset': {'label': 'POSITIVE', 'score': 0.625},
+                              'primary_diagnostic': {'label': 'NEGATIVE', 'score': 0.99}},
+                'topics': {'symptom_onset': fallback_topics,
+                           'primary_diagnostic': topic_result([0.125, 0.875, 0.5])}
+            }
+        ]
+
+    def expected_view(self, patient_results):
+        """Dict-of-lists shape of the former accumulation, without input texts"""
+        view = {'sentiment_per_phase': {}, 'topics_per_phase': {}}
+        for result in patient_results:
+            for phase, sentiment in result['sentiment'].items():
+                view['sentiment_per_phase'].setdefault(phase, []).append(sentiment)
+            for phase, topics in result['topics'].items():
+                view['topics_per_phase'].setdefault(phase, []).append(
+                    {'labels': topics['labels'], 'scores': topics['scores']}
+                )
+        return view
+
+    def test_compatibility_view(self):
+        """Test that the dict-of-lists view matches the former accumulation"""
+        results = PhaseResults.from_patient_results(self.patient_results, TOPICS)
+
+        self.assertEqual(results.to_dict(), self.expected_view(self.patient_results))
+        self.assertEqual(results['sentiment_per_phase'], results.sentiment_per_phase())
+        self.assertEqual(results.topic_scores.shape, (2, 2, 3))
+        with self.assertRaises(KeyError):
+            results['completeness']
+
+    def test_concatenate(self):
+        """Test that stacking chunk results equals accumulating all patients at once"""
+        parts = [
+            PhaseResults.from_patient_results(self.patient_results[1:], TOPICS),
+            PhaseResults.from_patient_results(self.patient_results[:1], TOPICS)
+        ]
+        combined = PhaseResults.concatenate(parts)
+
+        reordered = self.patient_results[1:] + self.patient_results[:1]
+        self.assertEqual(combined.n_patients, 2)
+        self.assertEqual(combined.to_dict(), self.expected_view(reordered))
@@ -0,0 +1,45 @@
+import unittest
+import os
+import pstats
+import tempfile
+import torch
+from src.utils.profiling import StageProfiler
+from src.utils.instrumentation import Instrumentation
+
+def _busy_loop():
+    return sum(i * i for i in range(10000))
+
+class TestStageProfiler(unittest.TestCase):
+    def test_stage_profiles(self):
+        """Test that repeated stages accumulate in one cProfile and torch stages get traces"""
+        with tempfile.TemporaryDirectory() as profile_dir:
+            instrumentation = Instrumentation(profiler=StageProfiler(profile_dir))
+            for _ in range(2):
+                with instrumentation.stage('completeness'):
+                    _busy_loop()
+            with instrumentation.stage('nlp_analysis', torch_ops=True):
+                torch.ones(8, 8) @ torch.ones(8, 8)
+            
+            files = sorted(os.listdir(profile_dir))
+            stats = pstats.Stats(os.path.join(profile_dir, 'completeness.prof'))
+        
+        self.assertEqual(files, [
+            'completeness.prof', 'completeness.txt',
+            'nlp_analysis.1.torch.txt', 'nlp_analysis.1.trace.json', 'nlp_analysis.prof', 'nlp_analysis.txt'
+        ])
+        busy_loop_calls = [calls for (_, _, function), (calls, *_) in stats.stats.items() if function == '_busy_loop']
+        self.assertEqual(busy_loop_calls, [2])
+        self.assertEqual(instrumentation.stages['completeness']['calls'], 2)
+
+    def test_nested_stage(self):
+        """Test that a stage nested in a profiled stage does not start a second profiler"""
+        with tempfile.TemporaryDirectory() as profile_dir:
+            profiler = StageProfiler(profile_dir)
+            with profiler.profile('outer'):
+                with profiler.profile('inner'):
+                    _busy_loop()
+            
+            self.assertEqual(sorted(os.listdir(profile_dir)), ['outer.prof', 'outer.txt'])
+
+if __name__ == '__main__':
+    unittest.main()
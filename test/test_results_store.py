@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from src.results_store import ColumnarResultsStore
+from src.results_visualizer import ResultsVisualizer
+from src.phase_results import PhaseResults
+
+class TestColumnarResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = ColumnarResultsStore(os.path.join(self.tmp_dir.name, 'analysis_results'))
+        topics = ['symptoms', 'diagnosis', 'treatment']
+        self.sentiment = {
+            'symptom_onset': [{'label': 'NEGATIVE', 'score': 0.75}, {'label': 'NEUTRAL', 'score': 0.5}],
+            'primary_diagnostic': [{'label': 'POSITIVE', 'score': 0.9}, {'label': 'NEGATIVE', 'score': 0.625}]
+        }
+        self.topics = {
+            'symptom_onset': [
+                {'sequence': 'text', 'labels': ['symptoms', 'treatment', 'diagnosis'], 'scores': [0.875, 0.5, 0.25]},
+                {'labels': topics, 'scores': [0.0, 0.0, 0.0]}
+            ],
+            'primary_diagnostic': [
+                {'sequence': 'text', 'labels': ['diagnosis', 'symptoms', 'treatment'], 'scores': [0.75, 0.5, 0.125]},
+                {'labels': topics, 'scores': [0.0, 0.0, 0.0]}
+            ]
+        }
+        self.completeness = {'overall_completeness': 0.5, 'phase_completeness': {'symptom_onset': 0.5}}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        """Test that the dict shape is rebuilt, without the input texts"""
+        self.store.save(self.sentiment, self.topics, self.completeness)
+        loaded = self.store.load()
+
+        expected_topics = {
+            phase: [{'labels': t['labels'], 'scores': t['scores']} for t in entries]
+            for phase, entries in self.topics.items()
+        }
+        self.assertEqual(loaded['sentiment'], self.sentiment)
+        self.assertEqual(loaded['topics'], expected_topics)
+        self.assertEqual(loaded['completeness'], self.completeness)
+
+    def test_columns_are_memory_mapped(self):
+        """Test the one-row-per-(patient, phase) columnar layout"""
+        self.store.save(self.sentiment, self.topics, self.completeness)
+        columns = self.store.load_columns()
+        meta = self.store.load_meta()
+
+        self.assertIsInstance(columns['topic_scores'], np.memmap)
+        self.assertEqual(columns['topic_scores'].shape, (4, 3))
+        self.assertEqual(columns['patient'].tolist(), [0, 1, 0, 1])
+        self.assertEqual([meta['phases'][code] for code in columns['phase']],
+                         ['symptom_onset', 'symptom_onset', 'primary_diagnostic', 'primary_diagnostic'])
+        self.assertEqual(meta['sentiment_labels'][columns['sentiment_label'][2]], 'POSITIVE')
+
+    def test_visualizer_saves_columnar_results(self):
+        """Test that the visualizer writes the columnar store by default"""
+        visualizer = ResultsVisualizer(output_dir=self.tmp_dir.name)
+        visualizer._save_results_columnar(PhaseResults.from_phase_lists(self.sentiment, self.topics), self.completeness)
+        self.assertEqual(self.store.load()['sentiment'], self.sentiment)
+
+        with self.assertRaises(ValueError):
+            ResultsVisualizer(output_dir=self.tmp_dir.name, results_format='xml')
@@ -5,8 +5,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.results_visualizer import ResultsVisualizer
 from src.metrics_calculator import EXPECTED_PHASES
+from src.phase_results import PhaseResults
 import pandas as pd
 import os
+import tempfile
 from pathlib import Path
 
 class TestResultsVisualizer(unittest.TestCase):
@@ -87,4 +89,63 @@ class TestResultsVisualizer(unittest.TestCase):
         # Could add checks for image properties, size, format
         sentiment_plot_path = Path(self.test_output_dir) / 'sentiment_analysis.png'
         self.assertTrue(sentiment_plot_path.exists())
-        self.assertGreater(sentiment_plot_path.stat().st_size, 0) 
\ No newline at end of file
+        self.assertGreater(sentiment_plot_path.stat().st_size, 0) 
+
+    def test_aggregation_matches_pivot(self):
+        """Test that the array aggregation reproduces the former row-per-score pivot tables"""
+        main_phases = ['symptom_onset', 'pre_diagnostic', 'primary_diagnostic', 'new_treatment', 'ongoing_care']
+        topics = {
+            'symptom_onset': [
+                {'labels': ['symptoms', 'diagnosis'], 'scores': [0.9, 0.25]},
+                {'labels': ['diagnosis', 'symptoms'], 'scores': [0.5, 0.1]},
+                {'labels': ['symptoms', 'diagnosis'], 'scores': [0.0, 0.0]}
+            ],
+            'primary_diagnostic': [{'labels': ['diagnosis'], 'scores': [0.8]}],
+            'decision': [{'labels': ['treatment'], 'scores': [0.7]}]
+        }
+        sentiment = dict(self.sample_sentiment)
+        sentiment['new_treatment'] = [{'label': 'NEUTRAL', 'score': 0.5}]
+        sentiment['symptom_onset'] = [{'label': 'NEGATIVE', 'score': 0.8}, {'label': 'NEGATIVE', 'score': 0.7},
+                                      {'label': 'POSITIVE', 'score': 0.95}]
+        
+        topic_rows = [
+            {'phase': phase, 'topic': label, 'score': score}
+            for phase, entries in topics.items() if phase in main_phases
+            for entry in entries if any(score > 0.0 for score in entry['scores'])
+            for label, score in zip(entry['labels'], entry['scores'])
+        ]
+        expected_topics = pd.DataFrame(topic_rows).pivot_table(
+            values='score', index='phase', columns='topic', aggfunc='mean'
+        ).reindex(main_phases)
+        topic_frame = self.visualizer._topics_by_phase(PhaseResults.from_phase_lists(topics_per_phase=topics), main_phases)
+        pd.testing.assert_frame_equal(topic_frame, expected_topics)
+        
+        sentiment_frame = self.visualizer._sentiment_by_phase(
+            PhaseResults.from_phase_lists(sentiment_per_phase=sentiment), main_phases
+        )
+        self.assertEqual(list(sentiment_frame.columns), ['NEGATIVE', 'NEUTRAL', 'POSITIVE'])
+        self.assertEqual(sentiment_frame.loc['symptom_onset'].tolist(), [0.7, 0.0, 0.95])
+        self.assertTrue(sentiment_frame.loc['new_treatment'].isna().all())
+
+    def test_plot_formats_and_render_times(self):
+        """Test rendering in several formats, concurrently, with per-figure render times"""
+        with tempfile.TemporaryDirectory() as output_dir:
+            visualizer = ResultsVisualizer(output_dir=output_dir, plot_formats=['png', 'svg'], n_jobs=2)
+            visualizer.visualize_and_save_results(self.sample_sentiment, self.sample_topics, self.sample_completeness)
+            
+            for name in ['sentiment_analysis', 'topic_distribution', 'completeness_scores']:
+                for fmt in ['png', 'svg']:
+                    self.assertTrue((Path(output_dir) / f'{name}.{fmt}').exists())
+                self.assertGreater(visualizer.render_times[name], 0.0)
+
+    def test_no_plots(self):
+        """Test that an empty format list only saves the raw results"""
+        with tempfile.TemporaryDirectory() as output_dir:
+            visualizer = ResultsVisualizer(output_dir=output_dir, plot_formats=[])
+            visualizer.visualize_and_save_results(self.sample_sentiment, self.sample_topics, self.sample_completeness)
+            
+            self.assertEqual(sorted(os.listdir(output_dir)), ['analysis_results'])
+            self.assertEqual(visualizer.render_times, {})
+        
+        with self.assertRaises(ValueError):
+            ResultsVisualizer(output_dir=self.test_output_dir, plot_formats=['docx'])
@@ -0,0 +1,37 @@
+import unittest
+from src.sentence_splitter import split_sentences, keyword_spans
+from src.keyword_matcher import KeywordMatcher
+
+class TestSentenceSplitter(unittest.TestCase):
+    def setUp(self):
+        self.matcher = KeywordMatcher({
+            'decision': ['decide', 'option'],
+            'reevaluation': ['follow-up', 'review']
+        })
+
+    def test_split_sentences(self):
+        """Test splitting at sentence ends and line breaks, keeping abbreviations"""
+        text = "Saw Dr. Rossi today. It hurt!  Then what?\nNo punctuation here\n\n  Last one."
+        self.assertEqual(split_sentences(text), [
+            'Saw Dr. Rossi today.', 'It hurt!', 'Then what?', 'No punctuation here', 'Last one.'
+        ])
+        self.assertEqual(split_sentences(''), [])
+
+    def test_keyword_spans(self):
+        """Test that each group gets the sentences mentioning its keywords"""
+        text = "Started new medication. Follow-up in May. We will decide on surgery. Review after that."
+        spans = keyword_spans(text, ('decision', 'reevaluation'), self.matcher)
+        
+        self.assertEqual(spans, {
+            'decision': 'We will decide on surgery.',
+            'reevaluation': 'Follow-up in May. Review after that.'
+        })
+        # Single sentence: the whole text
+        self.assertEqual(keyword_spans("Review of the options", ('decision', 'reevaluation'), self.matcher), {
+            'decision': 'Review of the options',
+            'reevaluation': 'Review of the options'
+        })
+        self.assertEqual(keyword_spans("Nothing to see. At all.", ('decision',), self.matcher), {})
+
+if __name__ == '__main__':
+    unittest.main()
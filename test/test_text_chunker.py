@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.nlp_analyzer import NLPAnalyzer
+from src.text_chunker import TextChunker, aggregate_scores
+
+class TestTextChunker(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tokenizer = NLPAnalyzer().sentiment_analyzer.tokenizer
+        cls.chunker = TextChunker(cls.tokenizer, max_tokens=20, overlap=5)
+
+    def test_short_text_unchanged(self):
+        """Test that texts within the budget are not split"""
+        self.assertEqual(self.chunker.split("Patient felt worried"), ["Patient felt worried"])
+
+    def test_long_text_windows(self):
+        """Test that long texts are split into overlapping windows covering the whole text"""
+        text = " ".join(f"word{i}" for i in range(40))
+        windows = self.chunker.split(text)
+
+        self.assertGreater(len(windows), 1)
+        self.assertTrue(text.startswith(windows[0]))
+        self.assertTrue(text.endswith(windows[-1]))
+        for window in windows:
+            self.assertIn(window, text)
+        for first, second in zip(windows, windows[1:]):
+            # Consecutive windows share their boundary tokens
+            self.assertLess(text.index(second), text.index(first) + len(first))
+
+    def test_split_ids_slices_token_ids(self):
+        """Test that tokenized texts are split into the same windows, with their ids sliced out"""
+        text = " ".join(f"word{i}" for i in range(40))
+        token_ids = self.tokenizer(text, add_special_tokens=False)['input_ids']
+        windows = self.chunker.split_ids(text, token_ids)
+
+        self.assertEqual([window_text for window_text, _ in windows], self.chunker.split(text))
+        self.assertEqual(
+            [window_ids for _, window_ids in windows],
+            [token_ids[start:end] for start, end in self.chunker.token_windows(len(token_ids))]
+        )
+        self.assertEqual(self.chunker.split_ids("Patient felt worried", [1, 2, 3]), [("Patient felt worried", [1, 2, 3])])
+
+    def test_invalid_overlap(self):
+        """Test that the overlap must leave room for new tokens"""
+        with self.assertRaises(ValueError):
+            TextChunker(self.tokenizer, max_tokens=10, overlap=10)
+
+    def test_aggregate_scores(self):
+        """Test mean and max aggregation of window scores"""
+        windows = [{'POSITIVE': 0.2, 'NEGATIVE': 0.8}, {'POSITIVE': 0.6, 'NEGATIVE': 0.4}]
+        mean = aggregate_scores(windows, 'mean')
+        self.assertAlmostEqual(mean['POSITIVE'], 0.4)
+        self.assertAlmostEqual(mean['NEGATIVE'], 0.6)
+        self.assertEqual(aggregate_scores(windows, 'max'), {'POSITIVE': 0.6, 'NEGATIVE': 0.8})
+        with self.assertRaises(ValueError):
+            aggregate_scores(windows, 'median')
@@ -0,0 +1,107 @@
+import unittest
+import sys
+import os
+import subprocess
+import tempfile
+import textwrap
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.token_cache import TokenCache
+
+class TestTokenCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'token_cache')
+        self.cache = TokenCache(self.path)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_key_depends_on_tokenizer(self):
+        """Test that the same text under another tokenizer gets another key"""
+        key = TokenCache.make_key('text', 'model@714eb0f:Tokenizer')
+        self.assertEqual(len(key), 16)
+        self.assertEqual(key, TokenCache.make_key('text', 'model@714eb0f:Tokenizer'))
+        self.assertNotEqual(key, TokenCache.make_key('text', 'model@d7645e1:Tokenizer'))
+        self.assertNotEqual(key, TokenCache.make_key('other text', 'model@714eb0f:Tokenizer'))
+
+    def test_round_trip_and_stats(self):
+        """Test storing, retrieving and hit/miss counting, keys ending in zero bytes included"""
+        keys = [b'a' * 16, b'b' * 15 + b'\0', b'c' * 16]
+        self.cache.set_many({keys[0]: [101, 2023], keys[1]: [7]})
+        self.cache.set_many({keys[0]: [1, 2, 3]})
+        found = self.cache.get_many(keys)
+
+        self.assertEqual({key: ids.tolist() for key, ids in found.items()}, {keys[0]: [101, 2023], keys[1]: [7]})
+        self.assertEqual(self.cache.stats(), {'entries': 2, 'tokens': 3, 'hits': 2, 'misses': 1, 'hit_rate': 2 / 3})
+
+    def test_shared_between_instances(self):
+        """Test that entries persist across runs and appear in open instances"""
+        reader = TokenCache(self.path)
+        self.cache.set_many({b'k' * 16: [5, 6]})
+        self.assertEqual(reader.get_many([b'k' * 16])[b'k' * 16].tolist(), [5, 6])
+        reader.close()
+
+        self.cache.close()
+        reopened = TokenCache(self.path)
+        self.assertEqual(reopened.get_many([b'k' * 16])[b'k' * 16].tolist(), [5, 6])
+        reopened.close()
+
+    def test_size_limit(self):
+        """Test that a cache over its size limit starts over"""
+        self.cache.set_many({b'k' * 16: list(range(1000))})
+        self.cache.close()
+        self.cache = TokenCache(self.path, max_size_mb=0.001)
+        self.assertEqual(self.cache.get_many([b'k' * 16]), {})
+        self.assertEqual(self.cache.stats()['tokens'], 0)
+
+    def test_clear_seen_by_open_instances(self):
+        """Test that an instance drops its offsets once another one clears the cache"""
+        reader = TokenCache(self.path, owner=False)
+        self.cache.set_many({b'a' * 16: [1, 2, 3]})
+        view = reader.get_many([b'a' * 16])[b'a' * 16]
+
+        self.cache.clear()
+        self.cache.set_many({b'b' * 16: [7, 8, 9]})
+        self.assertEqual(reader.get_many([b'a' * 16]), {})
+        self.assertEqual(reader.get_many([b'b' * 16])[b'b' * 16].tolist(), [7, 8, 9])
+        # Views handed out before the clear keep their data
+        self.assertEqual(view.tolist(), [1, 2, 3])
+
+        with self.assertRaises(RuntimeError):
+            reader.clear()
+        reader.close()
+
+    def test_clear_while_another_process_reads(self):
+        """Test that a reader process survives a clear and is never served stale ids"""
+        self.cache.set_many({b'a' * 16: list(range(100, 110))})
+        code = textwrap.dedent(f'''
+            import sys
+            sys.path.insert(0, {os.path.dirname(os.path.dirname(os.path.abspath(__file__)))!r})
+            from src.token_cache import TokenCache
+            cache = TokenCache({self.path!r}, owner=False)
+            view = cache.get_many([b'a' * 16])[b'a' * 16]
+            print('ready', flush=True)
+            sys.stdin.readline()
+            # Cleared and refilled by the parent meanwhile
+            print(view.tolist() == list(range(100, 110)))
+            print(sorted(key[:1].decode() for key in cache.get_many([b'a' * 16, b'b' * 16])))
+            print(cache.get_many([b'b' * 16])[b'b' * 16].tolist())
+        ''')
+        reader = subprocess.Popen(
+            [sys.executable, '-c', code], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        self.assertEqual(reader.stdout.readline().strip(), 'ready')
+
+        # Over the size limit: a new owner starts the files over, then refills them
+        self.cache.close()
+        self.cache = TokenCache(self.path, max_size_mb=0)
+        self.cache.set_many({b'b' * 16: [1, 2]})
+        output, _ = reader.communicate('go\n', timeout=60)
+
+        self.assertEqual(reader.returncode, 0)
+        self.assertEqual(output.split('\n')[:3], ['True', "['b']", '[1, 2]'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.nlp_analyzer import NLPAnalyzer
+from src.topic_scorer import TopicScorer, topic_agreement, TOPIC_BACKENDS, MIN_TOP1_AGREEMENT, MIN_RANK_AGREEMENT
+from src.export_models import PARITY_TEXTS
+
+class TestTopicScorer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.analyzer = NLPAnalyzer(topic_backend='nli')
+        cls.texts = [
+            "Patient had severe headaches",
+            "Doctor prescribed new medication after several visits to the clinic",
+            "Feeling anxious, the patient could no longer work or sleep properly"
+        ]
+
+    def test_nli_parity_with_pipeline(self):
+        """Test that the single-pass NLI backend reproduces the pipeline multi-label scores"""
+        scored = self.analyzer.topic_scorer.score(self.texts)
+
+        for text, result in zip(self.texts, scored):
+            reference = self.analyzer.zero_shot_classifier(
+                text,
+                candidate_labels=self.analyzer.topics,
+                multi_label=True
+            )
+            reference_scores = dict(zip(reference['labels'], reference['scores']))
+
+            self.assertEqual(result['sequence'], text)
+            self.assertEqual(set(result['labels']), set(self.analyzer.topics))
+            for label, score in zip(result['labels'], result['scores']):
+                self.assertAlmostEqual(score, reference_scores[label], places=4)
+
+    def test_token_ids_input(self):
+        """Test that scoring pre-tokenized texts matches scoring the texts"""
+        tokenizer = self.analyzer.zero_shot_classifier.tokenizer
+        token_ids = tokenizer(self.texts, add_special_tokens=False)['input_ids']
+        scorer = self.analyzer.topic_scorer
+        for result, ids_result in zip(scorer.score(self.texts), scorer.score(self.texts, token_ids)):
+            self.assertEqual(ids_result['labels'], result['labels'])
+            for score, ids_score in zip(result['scores'], ids_result['scores']):
+                self.assertAlmostEqual(ids_score, score, places=5)
+
+    def test_agreement_with_pipeline(self):
+        """Test that every backend ranks the topics of sample phase texts as the pipeline does"""
+        reference = self.analyzer.zero_shot_classifier(
+            PARITY_TEXTS, candidate_labels=self.analyzer.topics, multi_label=True
+        )
+        for backend in TOPIC_BACKENDS:
+            scorer = TopicScorer(
+                self.analyzer.zero_shot_classifier.model,
+                self.analyzer.zero_shot_classifier.tokenizer,
+                self.analyzer.topics,
+                backend=backend
+            )
+            agreement = topic_agreement(reference, scorer.score(PARITY_TEXTS))
+            self.assertGreaterEqual(agreement['top1_agreement'], MIN_TOP1_AGREEMENT, backend)
+            self.assertGreaterEqual(agreement['rank_agreement'], MIN_RANK_AGREEMENT, backend)
+
+    def test_topic_agreement(self):
+        """Test top label and label pair agreement between two sets of topic scores"""
+        reference = [
+            {'labels': ['symptoms', 'diagnosis', 'treatment'], 'scores': [0.9, 0.5, 0.1]},
+            {'labels': ['treatment', 'symptoms', 'diagnosis'], 'scores': [0.8, 0.7, 0.2]}
+        ]
+        candidate = [
+            {'labels': ['symptoms', 'treatment', 'diagnosis'], 'scores': [0.6, 0.4, 0.3]},
+            {'labels': ['treatment', 'symptoms', 'diagnosis'], 'scores': [0.9, 0.2, 0.1]}
+        ]
+        self.assertEqual(topic_agreement(reference, reference), {'top1_agreement': 1.0, 'rank_agreement': 1.0})
+        # One of the three label pairs of the first text is swapped
+        self.assertEqual(topic_agreement(reference, candidate), {'top1_agreement': 1.0, 'rank_agreement': 5 / 6})
+
+    def test_unknown_backend(self):
+        """Test that unknown backends are rejected"""
+        with self.assertRaises(ValueError):
+            TopicScorer(None, None, ['symptoms'], backend='unknown')